@@ -0,0 +1,221 @@
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from config import OBJECTIVE_WEIGHTS
+from pool import CompiledPool, F_ENTROPY, F_MAIN, F_SYNERGY
+
+Schedule = List[List[List[int]]]  # 판 -> 파티 -> CompiledPool 인덱스
+
+
+@dataclass
+class ScheduleScore:
+    total: float
+    synergy: int          # 파티 시너지 점수 합
+    main_synergy: int     # 시너지를 받은 본캐 사멸 딜러 수
+    level_spread: float   # 판마다 (파티 평균 레벨 최대 - 최소)의 합
+    unfairness: int       # 유저별 시너지 받은 캐릭 수의 최대 - 최소
+
+
+def evaluate_schedule(pool: CompiledPool, schedule: Schedule,
+                      weights: Dict[str, float] = OBJECTIVE_WEIGHTS) -> ScheduleScore:
+    flags = pool.flags
+    synergy = 0
+    main_synergy = 0
+    level_spread = 0.0
+    owner_synergy = Counter()
+    entropy_owners = set()
+
+    for parties in schedule:
+        averages = []
+        for party in parties:
+            synergy += pool.party_score(tuple(sorted(party)))
+            has_synergy = any(flags[i] & F_SYNERGY for i in party)
+            for i in party:
+                if flags[i] & F_ENTROPY:
+                    entropy_owners.add(pool.owner[i])
+                    if has_synergy:
+                        owner_synergy[pool.owner[i]] += 1
+                        if flags[i] & F_MAIN:
+                            main_synergy += 1
+            averages.append(sum(pool.level[i] for i in party) / len(party))
+        level_spread += max(averages) - min(averages)
+
+    counts = [owner_synergy[o] for o in entropy_owners]
+    unfairness = max(counts) - min(counts) if counts else 0
+
+    total = (weights['synergy'] * synergy + weights['main_synergy'] * main_synergy
+             - weights['level_spread'] * level_spread - weights['unfairness'] * unfairness)
+    return ScheduleScore(total, synergy, main_synergy, level_spread, unfairness)
+
+
+def objective_upper_bound(pool: CompiledPool, total_rounds: int, max_players: int,
+                          weights: Dict[str, float] = OBJECTIVE_WEIGHTS) -> float:
+    """
+    목적 함수 상한: 감점 항목은 0, 시너지를 받을 수 있는 자리는 모두 점수가 높은 사멸 딜러가 채운다고 가정.
+    시너지 파티 수는 판 x 파티 수와 시너지 직업 캐릭터 수를 넘을 수 없다. 상한에 닿으면 최적이 보장되고, 못 닿으면 상한 대비 부족 비율(gap)로 보고한다
+    """
+    synergy_chars = sum(1 for f in pool.flags if f & F_SYNERGY)
+    synergy_parties = min(total_rounds * (max_players // 4), synergy_chars)
+    slots = min(total_rounds * max_players, synergy_parties * 4)
+    if slots == 0:
+        return 0.0
+    synergy = sum(sorted(pool.entropy_score, reverse=True)[:slots])
+    mains = sum(1 for f in pool.flags if f & F_ENTROPY and f & F_MAIN)
+    return weights['synergy'] * synergy + weights['main_synergy'] * min(mains, slots)
+
+
+class AnytimeSearch:
+    """
+    실행 가능한 매칭에서 시작해 시간 한도 안에서 계속 개선하는 지역 탐색 (담금질 기법).
+    언제 멈춰도 지금까지 찾은 가장 좋은 매칭을 돌려준다. upper_bound(objective_upper_bound)에 닿으면 더 나아질 수 없으므로 바로 멈춘다.
+    이동은 모두 규칙(판 내 유저 중복 없음, 캐릭터 1회 사용, 파티 규칙)을 지키는 것만 시도한다:
+    - 미사용 캐릭터로 교체 / 같은 판의 두 파티 간 교환 / 다른 판 캐릭터와 교환
+    """
+
+    def __init__(self, pool: CompiledPool, schedule: Schedule, time_limit: float,
+                 weights: Dict[str, float] = OBJECTIVE_WEIGHTS,
+                 should_stop: Optional[Callable[[], bool]] = None, seed: int = 0,
+                 on_improve: Optional[Callable[[float], None]] = None, upper_bound: Optional[float] = None):
+        self.pool = pool
+        self.schedule = [[list(party) for party in parties] for parties in schedule]
+        self.time_limit = time_limit
+        self.weights = weights
+        self.should_stop = should_stop
+        self.on_improve = on_improve   # 최고 점수가 갱신될 때마다 on_improve(점수)
+        self.upper_bound = upper_bound
+        self.rng = random.Random(seed)
+        self.iterations = 0
+
+        self.round_owners = [Counter(pool.owner[i] for party in parties for i in party)
+                             for parties in self.schedule]
+        used = {i for parties in self.schedule for party in parties for i in party}
+        self.unused = [i for i in range(len(pool)) if i not in used]
+
+    def run(self):
+        deadline = time.monotonic() + self.time_limit
+        current = evaluate_schedule(self.pool, self.schedule, self.weights)
+        best, best_schedule = current, [[list(p) for p in parties] for parties in self.schedule]
+        if self.on_improve:
+            self.on_improve(best.total)
+        # 판이 없으면(0판) 움직일 캐릭터가 없음
+        if not self.schedule or self._optimal(best):
+            return best_schedule, best
+        # 온도는 남은 시간 비율에 맞춰 낮춘다 (처음엔 나쁜 이동도 받아들이고, 끝으로 갈수록 개선만)
+        temperature0 = 10.0
+        remaining = 1.0
+
+        while True:
+            self.iterations += 1
+            if self.iterations & 63 == 0:
+                now = time.monotonic()
+                if now >= deadline or (self.should_stop and self.should_stop()):
+                    break
+                remaining = (deadline - now) / max(self.time_limit, 1e-9)
+
+            undo = self._random_move()
+            if undo is None:
+                continue
+            candidate = evaluate_schedule(self.pool, self.schedule, self.weights)
+            delta = candidate.total - current.total
+            temperature = max(temperature0 * remaining, 1e-3)
+            if delta >= 0 or self.rng.random() < math.exp(delta / temperature):
+                current = candidate
+                if current.total > best.total:
+                    best = current
+                    best_schedule = [[list(p) for p in parties] for parties in self.schedule]
+                    if self.on_improve:
+                        self.on_improve(best.total)
+                    if self._optimal(best):
+                        break
+            else:
+                undo()
+
+        return best_schedule, best
+
+    def _optimal(self, score: ScheduleScore) -> bool:
+        return self.upper_bound is not None and score.total >= self.upper_bound - 1e-9
+
+    # ---------- 이동 ----------
+
+    def _valid(self, party: List[int]) -> bool:
+        return self.pool.party_valid(tuple(sorted(party)))
+
+    def _random_move(self):
+        kind = self.rng.random()
+        if kind < 0.4 and self.unused:
+            return self._replace_move()
+        if kind < 0.7:
+            return self._swap_in_round()
+        return self._swap_rounds()
+
+    def _replace_move(self):
+        owner = self.pool.owner
+        r = self.rng.randrange(len(self.schedule))
+        party = self.rng.choice(self.schedule[r])
+        k = self.rng.randrange(len(party))
+        u = self.rng.randrange(len(self.unused))
+        x, c = party[k], self.unused[u]
+        if owner[c] != owner[x] and self.round_owners[r][owner[c]]:
+            return None
+
+        party[k] = c
+        if not self._valid(party):
+            party[k] = x
+            return None
+        self.unused[u] = x
+        self.round_owners[r][owner[x]] -= 1
+        self.round_owners[r][owner[c]] += 1
+
+        def undo():
+            party[k] = x
+            self.unused[u] = c
+            self.round_owners[r][owner[c]] -= 1
+            self.round_owners[r][owner[x]] += 1
+        return undo
+
+    def _swap_in_round(self):
+        parties = self.rng.choice(self.schedule)
+        if len(parties) < 2:
+            return None
+        p1, p2 = self.rng.sample(parties, 2)
+        k1, k2 = self.rng.randrange(4), self.rng.randrange(4)
+        p1[k1], p2[k2] = p2[k2], p1[k1]
+        if not (self._valid(p1) and self._valid(p2)):
+            p1[k1], p2[k2] = p2[k2], p1[k1]
+            return None
+
+        def undo():
+            p1[k1], p2[k2] = p2[k2], p1[k1]
+        return undo
+
+    def _swap_rounds(self):
+        if len(self.schedule) < 2:
+            return None
+        owner = self.pool.owner
+        r1, r2 = self.rng.sample(range(len(self.schedule)), 2)
+        p1, p2 = self.rng.choice(self.schedule[r1]), self.rng.choice(self.schedule[r2])
+        k1, k2 = self.rng.randrange(4), self.rng.randrange(4)
+        x, y = p1[k1], p2[k2]
+        if owner[x] != owner[y] and (self.round_owners[r1][owner[y]] or self.round_owners[r2][owner[x]]):
+            return None
+
+        p1[k1], p2[k2] = y, x
+        if not (self._valid(p1) and self._valid(p2)):
+            p1[k1], p2[k2] = x, y
+            return None
+        self._move_owner(r1, owner[x], owner[y])
+        self._move_owner(r2, owner[y], owner[x])
+
+        def undo():
+            p1[k1], p2[k2] = x, y
+            self._move_owner(r1, owner[y], owner[x])
+            self._move_owner(r2, owner[x], owner[y])
+        return undo
+
+    def _move_owner(self, r: int, old: int, new: int):
+        self.round_owners[r][old] -= 1
+        self.round_owners[r][new] += 1
@@ -1,18 +1,151 @@
-import requests
+import asyncio
 import os
-from dotenv import load_dotenv
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
-load_dotenv()
+import httpx
+
+# .env는 config가 import될 때 읽음 (API 키를 환경 변수에서 찾기 전에)
+from config import LOSTARK_API_RATE, LOSTARK_API_BURST, REFRESH_API_RESERVE
+from metrics import API_LATENCY, CACHE_REQUESTS, cache_hit
+from throttle import TokenBucket
 
 class LostArkAPI:
     BASE_URL = "https://developer-lostark.game.onstove.com"
-    HEADERS = {
-        'accept' : 'application/json',
-        'authorization' : f"bearer {os.getenv('LOSTARK_API_KEY')}"
-    }
-
-    @classmethod
-    def get_siblings(cls, character_name):
-        url = f"{cls.BASE_URL}/characters/{character_name}/siblings/"
-        response = requests.get(url, headers=cls.HEADERS)
-        return response.json() if response.status_code == 200 else None
\ No newline at end of file
+    CACHE_TTL = 600.0     # 형제 캐릭터 응답 캐시 유지 시간 (초)
+    CACHE_MAX_ENTRIES = 4096   # 캐시에 두는 최대 캐릭터명 수 (넘으면 가장 오래 안 쓴 것부터 버림)
+    MAX_RETRIES = 3       # 429/네트워크 오류 재시도 횟수
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 cache_ttl: float = CACHE_TTL, cache_size: int = CACHE_MAX_ENTRIES, max_connections: int = 10,
+                 budget: Optional[TokenBucket] = None, background_reserve: int = REFRESH_API_RESERVE):
+        # base_url을 바꾸면 로컬 스텁 서버로 테스트할 수 있음
+        self.base_url = base_url or os.getenv('LOSTARK_API_BASE_URL', self.BASE_URL)
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._client = httpx.AsyncClient(
+            base_url = self.base_url,
+            headers = {
+                'accept' : 'application/json',
+                'authorization' : f"bearer {api_key or os.getenv('LOSTARK_API_KEY')}"
+            },
+            timeout = httpx.Timeout(10.0, connect=5.0),
+            limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        # 캐릭터명 -> (만료 시각, 응답). 최근에 쓴 순서 (LRU)
+        self._cache: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+        # 같은 캐릭터명으로 동시에 들어온 요청은 하나의 HTTP 요청으로 합침
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # 레이트 리밋에 걸렸을 때 다음 요청을 보내도 되는 시각 (epoch 초)
+        self._blocked_until = 0.0
+        # 모든 요청(재시도 포함)이 같이 쓰는 요청 예산. 백그라운드 요청은 background_reserve개를 남겨 둠
+        self.budget = budget or TokenBucket(LOSTARK_API_RATE, LOSTARK_API_BURST)
+        self.background_reserve = background_reserve
+
+    async def get_siblings(self, character_name: str, background: bool = False) -> Optional[List[dict]]:
+        """background: 갱신 등 급하지 않은 요청. 요청 예산을 대화형 요청 몫만큼 남겨 두고 씀"""
+        hit = self._cache.get(character_name)
+        if hit is not None:
+            if hit[0] > time.monotonic():
+                self._cache.move_to_end(character_name)
+                cache_hit('api', True)
+                return hit[1]
+            del self._cache[character_name]
+
+        task = self._inflight.get(character_name)
+        if task is not None:
+            CACHE_REQUESTS.labels('api', 'coalesced').inc()
+        else:
+            cache_hit('api', False)
+            task = asyncio.ensure_future(self._fetch_siblings(character_name, background))
+            self._inflight[character_name] = task
+            task.add_done_callback(lambda _: self._inflight.pop(character_name, None))
+        # 한 호출자가 취소돼도 같이 기다리는 다른 호출자의 요청은 계속 진행
+        return await asyncio.shield(task)
+
+    async def _fetch_siblings(self, character_name: str, background: bool = False) -> Optional[List[dict]]:
+        url = f"/characters/{character_name}/siblings/"
+        for attempt in range(self.MAX_RETRIES + 1):
+            await self._wait_rate_limit(background)
+            start = time.perf_counter()
+            try:
+                response = await self._client.get(url)
+            except httpx.TransportError:
+                API_LATENCY.labels('error').observe(time.perf_counter() - start)
+                if attempt == self.MAX_RETRIES:
+                    return None
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            API_LATENCY.labels(str(response.status_code)).observe(time.perf_counter() - start)
+            self._update_rate_limit(response)
+            if response.status_code == 429 and attempt < self.MAX_RETRIES:
+                if self._blocked_until <= time.time():
+                    # 헤더로 대기 시간을 알 수 없으면 지수 백오프
+                    self._blocked_until = time.time() + 2 ** attempt
+                continue
+            if response.status_code != 200:
+                return None
+
+            try:
+                data = response.json()
+            except ValueError:
+                # 점검 페이지(HTML) 등 JSON이 아닌 200 응답은 서버 오류와 같이 취급
+                return None
+            if data:
+                self._store(data)
+            return data
+        return None
+
+    def _store(self, data: List[dict]):
+        # 형제 목록은 계정 단위라 목록에 있는 모든 캐릭터명으로 캐시해 같은 계정의 재조회를 막음
+        now = time.monotonic()
+        expires = now + self.cache_ttl
+        for char_data in data:
+            name = char_data.get('CharacterName')
+            if name:
+                self._cache[name] = (expires, data)
+                self._cache.move_to_end(name)
+        self._evict(now)
+
+    def _evict(self, now: float):
+        # 앞쪽(오래 안 쓴 것)부터 만료된 항목을 치우고, 그래도 넘치면 가장 오래 안 쓴 것부터 버림
+        while self._cache:
+            name, (expires, _) = next(iter(self._cache.items()))
+            if expires > now and len(self._cache) <= self.cache_size:
+                break
+            del self._cache[name]
+
+    async def _wait_rate_limit(self, background: bool = False):
+        delay = self._blocked_until - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        reserve = self.background_reserve if background else 0
+        while (delay := self.budget.take(reserve)) > 0:
+            await asyncio.sleep(delay)
+
+    def _update_rate_limit(self, response: httpx.Response):
+        """Retry-After / X-RateLimit-* 헤더로 다음 요청 가능 시각 갱신"""
+        headers = response.headers
+        retry_after = headers.get('Retry-After')
+        if response.status_code == 429 and retry_after:
+            try:
+                self._blocked_until = max(self._blocked_until, time.time() + float(retry_after))
+                return
+            except ValueError:
+                pass
+
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if reset and (response.status_code == 429 or remaining == '0'):
+            try:
+                self._blocked_until = max(self._blocked_until, float(reset))
+            except ValueError:
+                pass
+
+    def invalidate(self, character_name: str):
+        self._cache.pop(character_name, None)
+
+    async def aclose(self):
+        await self._client.aclose()
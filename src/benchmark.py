@@ -0,0 +1,270 @@
+"""
+매칭 성능 측정 스크립트.
+    python benchmark.py partition                      # 16인(베히모스) 최적 분할 최악 케이스 + 실제 로스터 solve 전체 시간
+    python benchmark.py optimizer --json out.json      # 레이드 x 판수 x 인원 시나리오 (결과를 JSON으로 저장)
+    python benchmark.py optimizer --compare base.json  # 이전 커밋에서 저장한 결과와 비교
+    python benchmark.py guilds --guilds 20             # 여러 길드가 동시에 /품앗이매칭 (큰 길드 1곳이 연속 요청)
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+from database import Database
+from models import Character
+from optimizer import RaidOptimizer
+from partition import best_partition
+from pool import CompiledPool
+from roster_gen import generate_roster
+from rules import RAID_DATA, RULES
+from service import OptimizationService, GuildQueueFull
+from solver import SearchBudget, SOLVED, BUDGET_EXHAUSTED
+
+# 16인 분할 한 번에 허용하는 지연 시간 (ms)
+PARTITION_LATENCY_TARGET_MS = 250.0
+
+# 시나리오 기본값
+MEMBER_COUNTS = [8, 16, 30]
+ROUNDS = [1, 2, 3, 4, 5]
+BENCH_BUDGET = SearchBudget(max_nodes=50_000, time_limit=5.0)
+# 비교 시 이 비율 이상 느려지면 회귀로 표시
+REGRESSION_RATIO = 1.5
+
+# 다중 길드 부하 시나리오: 큰 길드 1곳이 여러 명에게서 연속 요청, 나머지 작은 길드는 1건씩
+BIG_GUILD_MEMBERS = 30
+BIG_GUILD_REQUESTS = 6
+SMALL_GUILD_MEMBERS = 16
+LOAD_RAID = "4막 노말"
+LOAD_ROUNDS = 2
+
+# 규칙 파일의 시너지 직업과, 시너지가 아닌 사멸 직업
+SYNERGY_JOBS = list(RULES.synergy_jobs)
+ENTROPY_JOBS = [job for job in RULES.entropy_jobs if job not in RULES.synergy_jobs]
+
+
+def _partition_worst_case(n_supps: int, n_synergy: int) -> List[Character]:
+    """
+    분할 탐색이 가장 오래 걸리는 16인 공격대: 직업/역할 중복이 없어 거의 모든 4인 조합이 유효하고,
+    사멸 딜러가 많아 점수 상한이 느슨하다. 유저는 모두 다르다 (판 단위 규칙은 이미 통과한 상태)
+    """
+    job_roles = [(job, role) for role in ('서폿', '딜폿') for job in RULES.support_jobs]
+    job_roles += [(f"서폿{k}", '서폿') for k in range(16)]
+    supps = job_roles[:n_supps]
+
+    dps = [(job, '딜러') for job in SYNERGY_JOBS[:n_synergy]]
+    dps += [(job, '딜러') for job in ENTROPY_JOBS]
+    dps += [(f"딜러{k}", '딜러') for k in range(16)]
+    dps = dps[:16 - n_supps]
+
+    chars = []
+    for i, (job, role) in enumerate(supps + dps):
+        chars.append(Character(owner_id=i, name=f"char{i}", job=job, item_level=1700.0,
+                               user_set_role=role, is_main=False))
+    return chars
+
+
+def bench_partition(args) -> bool:
+    worst_ms = 0.0
+    for n_supps in range(4, 17):
+        for n_synergy in range(0, 3):
+            chars = _partition_worst_case(n_supps, n_synergy)
+            pool = CompiledPool(chars, pair_main=True)
+
+            start = time.perf_counter()
+            parties = best_partition(pool, range(len(chars)))
+            elapsed = (time.perf_counter() - start) * 1000
+            worst_ms = max(worst_ms, elapsed)
+
+            score = sum(pool.party_score(tuple(sorted(p))) for p in parties) if parties else -1
+            print(f"supps={n_supps:2d} synergy={n_synergy} score={score:4d} {elapsed:8.1f}ms")
+
+    ok = worst_ms <= PARTITION_LATENCY_TARGET_MS
+    print(f"최악 {worst_ms:.1f}ms / 목표 {PARTITION_LATENCY_TARGET_MS:.0f}ms -> {'통과' if ok else '초과'}")
+    return _bench_partition_end_to_end(args) and ok
+
+
+def _bench_partition_end_to_end(args) -> bool:
+    """
+    실제 로스터의 베히모스 solve() 전체 시간. 판마다 분할을 새로 하므로 판 수에 비례해 늘어난다.
+    분할 목표는 판 1개 기준이므로 판당 시간으로 비교하고, solve 전체 시간은 그대로 보고한다
+    """
+    members = MEMBER_COUNTS[-1]
+    worst_round_ms = 0.0
+    for rounds in ROUNDS:
+        times = []
+        for seed in range(args.seeds):
+            optimizer = RaidOptimizer(generate_roster(members, seed=seed), "베히모스", rounds, budget=BENCH_BUDGET)
+            start = time.perf_counter()
+            optimizer.solve()
+            times.append((time.perf_counter() - start) * 1000)
+        worst_round_ms = max(worst_round_ms, max(times) / rounds)
+        print(f"베히모스 {rounds}판/{members}명 solve 전체: 중앙값 {statistics.median(times):7.1f}ms "
+              f"최대 {max(times):7.1f}ms (판당 {max(times) / rounds:6.1f}ms)")
+
+    ok = worst_round_ms <= PARTITION_LATENCY_TARGET_MS
+    print(f"판당 최악 {worst_round_ms:.1f}ms / 목표 {PARTITION_LATENCY_TARGET_MS:.0f}ms -> {'통과' if ok else '초과'}")
+    return ok
+
+
+def run_scenario(raid_key: str, rounds: int, members: int, seeds: int) -> Dict:
+    """한 시나리오를 seed별로 돌려 시간/노드/메모리/성공률을 모은다"""
+    times, nodes, peaks, solved = [], [], [], 0
+    for seed in range(seeds):
+        roster = generate_roster(members, seed=seed)
+        optimizer = RaidOptimizer(roster, raid_key, rounds, budget=BENCH_BUDGET)
+
+        start = time.perf_counter()
+        optimizer.solve()
+        times.append((time.perf_counter() - start) * 1000)
+
+        # tracemalloc은 할당마다 기록해 몇 배 느려지므로, 메모리는 같은 입력으로 따로 한 번 더 돌려 잰다
+        tracemalloc.start()
+        RaidOptimizer(roster, raid_key, rounds, budget=BENCH_BUDGET).solve()
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+
+        nodes.append(optimizer.nodes_explored)
+        solved += optimizer.status == SOLVED
+
+    return {
+        'raid': raid_key, 'rounds': rounds, 'members': members, 'seeds': seeds,
+        'wall_ms_median': statistics.median(times), 'wall_ms_max': max(times),
+        'nodes_median': statistics.median(nodes), 'nodes_max': max(nodes),
+        'peak_kib_max': max(peaks),
+        'success_rate': solved / seeds,
+    }
+
+
+def _scenario_key(row: Dict) -> str:
+    return f"{row['raid']}/{row['rounds']}판/{row['members']}명"
+
+
+def bench_optimizer(args) -> bool:
+    raids = args.raid or list(RAID_DATA)
+    rows = []
+    print(f"{'시나리오':<24} {'중앙값ms':>9} {'최대ms':>9} {'노드':>8} {'메모리KiB':>10} {'성공률':>6}")
+    for raid_key in raids:
+        for rounds in ROUNDS:
+            for members in MEMBER_COUNTS:
+                row = run_scenario(raid_key, rounds, members, args.seeds)
+                rows.append(row)
+                print(f"{_scenario_key(row):<24} {row['wall_ms_median']:9.1f} {row['wall_ms_max']:9.1f} "
+                      f"{row['nodes_max']:8d} {row['peak_kib_max']:10.0f} {row['success_rate']:6.0%}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'budget': vars(BENCH_BUDGET), 'scenarios': rows}, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        return _compare(rows, args.compare)
+    return True
+
+
+def _compare(rows: List[Dict], path: str) -> bool:
+    """이전 결과와 비교해 느려졌거나 성공률이 떨어진 시나리오를 출력"""
+    with open(path, encoding='utf-8') as f:
+        base = {_scenario_key(row): row for row in json.load(f)['scenarios']}
+
+    ok = True
+    for row in rows:
+        old = base.get(_scenario_key(row))
+        if old is None:
+            continue
+        slower = row['wall_ms_median'] > max(old['wall_ms_median'], 1.0) * REGRESSION_RATIO
+        worse = row['success_rate'] < old['success_rate']
+        if slower or worse:
+            ok = False
+            print(f"⚠️ 회귀 {_scenario_key(row)}: {old['wall_ms_median']:.1f}ms -> {row['wall_ms_median']:.1f}ms, "
+                  f"성공률 {old['success_rate']:.0%} -> {row['success_rate']:.0%}")
+    print("✅ 회귀 없음" if ok else "❌ 회귀 발견")
+    return ok
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def _simulate_guilds(n_guilds: int, db: Database, service: OptimizationService) -> Dict[str, List]:
+    """길드 1이 큰 길드. 모든 길드가 거의 동시에 매칭을 요청 (명령어와 같은 DB 조회 -> service.submit 경로)"""
+    for g in range(n_guilds):
+        members = generate_roster(BIG_GUILD_MEMBERS if g == 0 else SMALL_GUILD_MEMBERS, seed=g)
+        for member in members:
+            await db.save_member(g + 1, member)
+
+    results = {'big': [], 'small': [], 'rejected': [], 'failed': []}
+
+    async def request(guild_id: int, user_id: int):
+        start = time.perf_counter()
+        members = await db.load_all_members(guild_id)
+        try:
+            result = await service.submit((guild_id, user_id), guild_id, members, LOAD_RAID, LOAD_ROUNDS)
+        except GuildQueueFull:
+            results['rejected'].append(guild_id)
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        results['big' if guild_id == 1 else 'small'].append(elapsed)
+        if result.status == BUDGET_EXHAUSTED and result.rounds is None:
+            results['failed'].append(guild_id)
+
+    tasks = [request(1, u) for u in range(BIG_GUILD_REQUESTS)]
+    tasks += [request(g + 1, 0) for g in range(1, n_guilds)]
+    await asyncio.gather(*tasks)
+    return results
+
+
+def bench_guilds(args) -> bool:
+    service = OptimizationService()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'load.db'))
+
+        async def main():
+            try:
+                return await _simulate_guilds(args.guilds, db, service)
+            finally:
+                await db.close()
+
+        start = time.perf_counter()
+        results = asyncio.run(main())
+        wall = time.perf_counter() - start
+        service.shutdown()
+
+    for kind, label in (('big', '큰'), ('small', '작은')):
+        if results[kind]:
+            print(f"{label} 길드 요청 {len(results[kind]):3d}건: p50 {_percentile(results[kind], 0.5):8.0f}ms "
+                  f"p95 {_percentile(results[kind], 0.95):8.0f}ms 최대 {max(results[kind]):8.0f}ms")
+    print(f"길드 {args.guilds}곳, 거절(길드 한도) {len(results['rejected'])}건, 시간 초과 {len(results['failed'])}건, "
+          f"전체 {wall:.1f}초")
+    # 작은 길드는 큰 길드의 연속 요청과 상관없이 모두 처리되어야 함
+    ok = not results['failed'] and all(g == 1 for g in results['rejected'])
+    print("✅ 모든 길드 처리" if ok else "❌ 처리되지 못한 길드 요청 있음")
+    return ok
+
+
+BENCHMARKS = {
+    'partition': bench_partition,
+    'optimizer': bench_optimizer,
+    'guilds': bench_guilds,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('names', nargs='*', help=f"실행할 벤치마크 {list(BENCHMARKS)} (생략하면 전부)")
+    parser.add_argument('--seeds', type=int, default=3, help="시나리오당 로스터 seed 수")
+    parser.add_argument('--raid', action='append', choices=list(RAID_DATA), help="특정 레이드만 (여러 번 지정 가능)")
+    parser.add_argument('--json', help="결과를 저장할 JSON 경로")
+    parser.add_argument('--compare', help="비교할 이전 결과 JSON 경로")
+    parser.add_argument('--guilds', type=int, default=8, help="guilds 벤치마크의 길드 수")
+    args = parser.parse_args()
+    unknown = set(args.names) - BENCHMARKS.keys()
+    if unknown:
+        parser.error(f"알 수 없는 벤치마크: {', '.join(sorted(unknown))}")
+
+    results = [BENCHMARKS[name](args) for name in (args.names or list(BENCHMARKS))]
+    sys.exit(0 if all(results) else 1)
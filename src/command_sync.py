@@ -0,0 +1,58 @@
+"""
+슬래시 명령어 트리 동기화. 전역 tree.sync()는 느리고 레이트 리밋이 있어서
+명령어 정의(이름, 설명, 인자, 선택지)의 해시가 지난 동기화 때와 달라졌을 때만 호출한다
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+import discord
+from discord import app_commands
+
+from config import COMMAND_SYNC_STATE, FORCE_COMMAND_SYNC
+
+
+def commands_hash(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """디스코드에 보내는 명령어 정의 그대로의 해시 (순서 무관)"""
+    payload = sorted((cmd.to_dict(tree) for cmd in tree.get_commands(guild=guild)), key=lambda c: c['name'])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def _load_state(path: str) -> Dict[str, str]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 명령어 동기화 기록을 읽지 못했습니다: {e!r}")
+        return {}
+
+
+def _save_state(path: str, state: Dict[str, str]):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+async def sync_commands(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None,
+                        state_path: str = COMMAND_SYNC_STATE, force: bool = FORCE_COMMAND_SYNC) -> bool:
+    """
+    정의가 바뀌었으면 동기화하고 True. guild를 주면 전역 명령어를 그 길드로 복사해 길드 단위로 동기화
+    (전역 동기화와 달리 바로 반영되어 개발할 때 씀)
+    """
+    if guild is not None:
+        tree.copy_global_to(guild=guild)
+    scope = f"guild:{guild.id}" if guild is not None else "global"
+    digest = commands_hash(tree, guild)
+
+    state = _load_state(state_path)
+    if not force and state.get(scope) == digest:
+        return False
+
+    await tree.sync(guild=guild)
+    state[scope] = digest
+    _save_state(state_path, state)
+    return True
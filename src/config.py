@@ -1,44 +1,100 @@
-from dataclasses import dataclass
+import os
 
-MIN_ITEM_LEVEL = 1640.0
+from dotenv import load_dotenv
+
+# 아래 설정들이 .env 값을 보도록 가장 먼저 읽음 (config는 모든 모듈이 제일 먼저 import함)
+load_dotenv()
 
 ROLE_EMOJIS ={
     'DPS_HITMASTER': '🏹', # 타대/비사멸 딜러
     'DPS_ENTROPY':'⚔️', # 사멸 딜러
     'SUPPORT': '✨'
 }
-# 사멸/비사멸 공유 직업: 브레이커, 가디언나이트, 데모닉
-ENTROPY_CLASS = ['디스트로이어', '워로드', '슬레이어', '스트라이커', 
-                 '배틀마스터', '인파이터', '창술사', '데빌헌터', 
-                 '블레이드','리퍼',]
-
-FLEXIBLE_ENTROPY_CLASS = ['브레이커', '가디언나이트']
-
-ENTROPY_SYNERGY_CLASS = ['워로드', '블레이드']
-
-@dataclass
-class RaidInfo:
-    name: str
-    required_level: float
-    max_players: int
-
-    @property
-    def required_supps(self) -> int:
-        # 인원수에 따른 서포터 수를 반환 (4인 1명, 8인 2명)
-        return self.max_players // 4
-    
-#관리데이터
-RAID_DATA = {
-    "세르카 나메": RaidInfo("세르카 나메", 1740.00, 4),
-    "세르카 하드": RaidInfo("세르카 하드", 1730.00, 4),
-    "세르카 노말": RaidInfo("세르카 노말", 1710.00, 4),
-    "종막 하드": RaidInfo("카제로스 하드", 1730.00, 8),
-    "종막 노말": RaidInfo("카제로스 노말", 1710.00, 8),
-    "4막 하드": RaidInfo("아르모체 하드", 1720.00, 8),
-    "4막 노말": RaidInfo("아르모체 노말", 1700.00, 8),
-    "3막 하드": RaidInfo("모르둠 하드", 1700.00, 8),
-    "3막 노말": RaidInfo("모르둠 노말", 1680.00, 8),
-    "2막 하드": RaidInfo("아브 하드", 1690.00, 8),
-    "2막 노말": RaidInfo("아브 노말", 1670.00, 8),
-    "베히모스": RaidInfo("베히모스", 1640.00, 16),    
-}
\ No newline at end of file
+# 레이드/직업군/파티 규칙 파일 (rules.py가 시작할 때 한 번 읽음)
+RULES_PATH = os.getenv('RULES_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json')
+
+# 매칭 탐색 한도 (노드 수 / 초). 넘으면 '탐색 한도 초과'로 종료
+SEARCH_MAX_NODES = 200_000
+SEARCH_TIME_LIMIT = 10.0
+# 한 번에 요청할 수 있는 최대 판수 (/품앗이매칭, /주간계획 입력 검사)
+MAX_ROUNDS = 50
+
+# 최적화 모드(anytime) 시간 한도와 목적 함수 가중치
+ANYTIME_TIME_LIMIT = 2.0
+OBJECTIVE_WEIGHTS = {
+    'synergy': 1.0,        # 파티 시너지 점수 합
+    'main_synergy': 5.0,   # 시너지를 받은 본캐 사멸 딜러 수
+    'level_spread': 0.2,   # 판마다 파티 평균 레벨 차이 (감점)
+    'unfairness': 5.0,     # 유저별 시너지 받은 캐릭 수의 최대-최소 차 (감점)
+}
+
+# 주간 계획: 캐릭터당 주간 클리어(골드 획득) 횟수, 전체 계획 시간 한도 (초)
+WEEKLY_CLEAR_LIMIT = 3
+PLANNER_TIME_LIMIT = 20.0
+
+# 매칭 작업 프로세스 풀 설정
+OPTIMIZER_WORKERS = 2
+OPTIMIZER_MAX_JOBS_PER_GUILD = 2      # 길드별 대기+실행 작업 수
+OPTIMIZER_MAX_RUNNING_PER_GUILD = 1   # 길드별로 동시에 차지할 수 있는 워커 수
+# 매칭 중 진행 상황 메시지를 고치는 최소 간격 (초). 디스코드 메시지 수정 레이트 리밋(채널당 5회/5초)보다 느리게
+PROGRESS_INTERVAL = 1.5
+JOB_TIMEOUT_MARGIN = 5.0   # 작업 마감 시간에 더하는 프로세스 왕복/대기 여유 (초)
+OPTIMIZER_JOB_TIMEOUT = SEARCH_TIME_LIMIT + ANYTIME_TIME_LIMIT + JOB_TIMEOUT_MARGIN
+
+# 아이템 레벨 일괄 갱신 (로아 API 분당 100회 제한 안에서 동작하도록)
+REFRESH_INTERVAL = 6 * 60 * 60   # 초
+REFRESH_CONCURRENCY = 4
+REFRESH_BATCH_SIZE = 20
+# 로아 API 요청 예산: 모든 요청이 하나의 토큰 버킷(초당 보충 개수, 최대 연속 횟수)을 같이 쓴다.
+# 갱신 같은 백그라운드 요청은 토큰을 REFRESH_API_RESERVE개 남겨 두고만 써서 /등록 같은 대화형 요청이 기다리지 않게 함
+LOSTARK_API_RATE = 100 / 60
+LOSTARK_API_BURST = 20
+REFRESH_API_RESERVE = 10
+
+# 여러 길드 운영: BOT_SHARDED=1이면 AutoShardedClient로 실행 (SHARD_COUNT를 비우면 디스코드 권장값)
+BOT_SHARDED = os.getenv('BOT_SHARDED', '0') == '1'
+SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+# 메모리에 로스터를 들고 있는 길드 수 (오래 안 쓴 길드부터 캐시에서 내림)
+ROSTER_CACHE_GUILDS = 256
+
+# 같은 요청(레이드, 판수, 참여자 로스터)의 매칭 결과 캐시. RESULT_CACHE_PATH를 주면 재시작해도 유지
+RESULT_CACHE_SIZE = 128
+RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH') or None
+
+# 지표 엔드포인트 (METRICS_PORT=0이면 끔)와 매칭 작업 프로파일링
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+METRICS_ADDR = os.getenv('METRICS_ADDR', '127.0.0.1')
+# 예: PROFILE_COMMANDS=품앗이매칭 -> 해당 명령어의 매칭 작업을 cProfile로 측정해 가장 느린 PROFILE_KEEP개를 저장
+PROFILE_COMMANDS = {name for name in os.getenv('PROFILE_COMMANDS', '').split(',') if name}
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_KEEP = 5
+
+# 길드 구분이 없던 예전 DB(v0)의 데이터를 옮길 길드 ID
+LEGACY_GUILD_ID = int(os.getenv('LEGACY_GUILD_ID', '0'))
+
+# 슬래시 명령어 동기화: 명령어 정의 해시가 COMMAND_SYNC_STATE에 저장된 값과 다를 때만 sync.
+# DEV_GUILD_ID를 주면 전역 대신 그 길드에만 동기화 (바로 반영됨, 개발용). FORCE_COMMAND_SYNC=1이면 항상 동기화
+DEV_GUILD_ID = int(os.getenv('DEV_GUILD_ID')) if os.getenv('DEV_GUILD_ID') else None
+COMMAND_SYNC_STATE = os.getenv('COMMAND_SYNC_STATE', 'command_sync.json')
+FORCE_COMMAND_SYNC = os.getenv('FORCE_COMMAND_SYNC', '0') == '1'
+
+# 로스터 변경 기록 압축: 주기 (초), 지난 스냅숏 이후 기록이 이만큼 쌓이면 새 스냅숏, 보관 기간 (이 기간 안의 기록은 다시 재생 가능)
+CHANGELOG_COMPACT_INTERVAL = 24 * 60 * 60
+CHANGELOG_COMPACT_MIN_CHANGES = 500
+CHANGELOG_RETENTION = 30 * 24 * 60 * 60
+
+# 상호작용 처리 제한. 명령어별 유저 토큰 버킷 (초당 보충 개수, 최대 연속 횟수)
+INTERACTION_RATE_LIMITS = {
+    '등록': (1 / 30, 2),
+    '품앗이매칭': (1 / 10, 3),
+    '역할설정': (2.0, 6),
+    '품앗이매칭:선택': (1 / 5, 3),
+}
+INTERACTION_CONCURRENCY = 8       # 동시에 처리하는 상호작용 수
+INTERACTION_API_CONCURRENCY = 2   # 로아 API를 기다리는 명령어(/등록)의 동시 처리 수. 위 자리와 따로 셈
+INTERACTION_QUEUE_SIZE = 32       # 전체 대기 수 (넘으면 바로 거절)
+INTERACTION_QUEUE_PER_USER = 2    # 유저별 대기 수
+INTERACTION_QUEUE_TIMEOUT = 2.0   # 최대 대기 시간 (초). 디스코드 3초 응답 제한 안에서 거절 메시지를 보낼 수 있도록
+
+# 역할/사멸 버튼 연타를 모아서 한 번에 저장하기까지 기다리는 시간 (초)
+ROLE_WRITE_DELAY = 1.5
@@ -1,71 +1,615 @@
+import asyncio
 import sqlite3
 import json
-from typing import List
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple, TypeVar
+from metrics import DB_QUERY_SECONDS, cache_hit
 from models import GuildMember, Character
+from config import (ROLE_WRITE_DELAY, LEGACY_GUILD_ID, ROSTER_CACHE_GUILDS, CHANGELOG_COMPACT_INTERVAL,
+                    CHANGELOG_COMPACT_MIN_CHANGES, CHANGELOG_RETENTION)
+
+T = TypeVar('T')
+
+# 연결마다 적용하는 설정: WAL이면 읽기와 쓰기가 서로 막지 않고, synchronous=NORMAL은 커밋마다 fsync하지 않음
+_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",   # KiB 단위 (약 16MB)
+]
+
+# users 1행 + characters n행을 한 번에 읽는 조회 (캐릭터가 없는 유저도 포함)
+_MEMBER_QUERY = """
+    SELECT u.discord_id, u.main_char, c.name, c.job, c.level, c.role, c.is_main, c.is_entropy
+    FROM users u LEFT JOIN characters c ON c.guild_id = u.guild_id AND c.owner_id = u.discord_id
+    WHERE u.guild_id = ?
+"""
+
+
+def _migrate_v1(conn: sqlite3.Connection):
+    """
+    v0(users/characters 두 테이블, 캐릭터명이 전역 PK) -> v1(길드 단위 복합 키).
+    기존 데이터는 LEGACY_GUILD_ID 길드로 옮긴다
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'users' in tables:
+        conn.execute("ALTER TABLE users RENAME TO users_v0")
+    if 'characters' in tables:
+        conn.execute("ALTER TABLE characters RENAME TO characters_v0")
+
+    conn.execute('''CREATE TABLE users
+                    (guild_id INTEGER NOT NULL, discord_id INTEGER NOT NULL, main_char TEXT,
+                    PRIMARY KEY (guild_id, discord_id)) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE characters
+                    (guild_id INTEGER NOT NULL, owner_id INTEGER NOT NULL, name TEXT NOT NULL,
+                    job TEXT, level REAL, role TEXT, is_main INTEGER, is_entropy INTEGER,
+                    PRIMARY KEY (guild_id, owner_id, name),
+                    FOREIGN KEY (guild_id, owner_id) REFERENCES users (guild_id, discord_id) ON DELETE CASCADE
+                    ) WITHOUT ROWID''')
+    # 캐릭터가 다른 유저에게 옮겨졌는지 이름으로 찾을 때 사용
+    conn.execute("CREATE INDEX idx_characters_guild_name ON characters (guild_id, name)")
+
+    if 'users' in tables:
+        conn.execute("INSERT INTO users SELECT ?, discord_id, main_char FROM users_v0", (LEGACY_GUILD_ID,))
+        conn.execute("DROP TABLE users_v0")
+    if 'characters' in tables:
+        # 유저 행이 없는 캐릭터는 외래 키를 만족하지 못하므로 버린다
+        conn.execute("""
+            INSERT INTO characters
+            SELECT ?, c.owner_id, c.name, c.job, c.level, c.role, c.is_main, c.is_entropy
+            FROM characters_v0 c JOIN users u ON u.guild_id = ? AND u.discord_id = c.owner_id
+        """, (LEGACY_GUILD_ID, LEGACY_GUILD_ID))
+        conn.execute("DROP TABLE characters_v0")
+
+
+def _take_characters(conn: sqlite3.Connection, guild_id: int, names: List[Tuple[str, int]]) -> List[Tuple[int, str]]:
+    """(캐릭터명, 새 소유자) 목록에서 다른 유저에게 있던 같은 이름의 캐릭터를 지우고, 지운 (이전 소유자, 캐릭터명)을 돌려줌"""
+    removed: List[Tuple[int, str]] = []
+    for name, owner_id in names:
+        owners = conn.execute("SELECT owner_id FROM characters WHERE guild_id = ? AND name = ? AND owner_id != ?",
+                              (guild_id, name, owner_id)).fetchall()
+        if owners:
+            removed.extend((row[0], name) for row in owners)
+            conn.execute("DELETE FROM characters WHERE guild_id = ? AND name = ? AND owner_id != ?",
+                         (guild_id, name, owner_id))
+    return removed
+
+
+def _migrate_v2(conn: sqlite3.Connection):
+    """
+    v1 -> v2: 로스터 변경 기록(추가만 하는 로그)과 압축용 스냅숏.
+    기존 로스터는 길드마다 version 0 스냅숏으로 남긴다 (그 이전 기록은 없음)
+    """
+    conn.execute('''CREATE TABLE roster_changes
+                    (version INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL,
+                    owner_id INTEGER NOT NULL, name TEXT, kind TEXT NOT NULL, data TEXT,
+                    source TEXT NOT NULL, created_at REAL NOT NULL)''')
+    conn.execute("CREATE INDEX idx_roster_changes_guild ON roster_changes (guild_id, version)")
+    conn.execute('''CREATE TABLE roster_snapshots
+                    (guild_id INTEGER NOT NULL, version INTEGER NOT NULL, data TEXT NOT NULL, created_at REAL NOT NULL,
+                    PRIMARY KEY (guild_id, version)) WITHOUT ROWID''')
+    for (guild_id,) in conn.execute("SELECT DISTINCT guild_id FROM users").fetchall():
+        _write_snapshot(conn, guild_id, 0)
+
+
+# ---------- 변경 기록 ----------
+
+# 기록 종류: 유저(대표 캐릭터) 변경 / 캐릭터 추가·변경 (data는 바뀐 열만) / 캐릭터 삭제 (다른 유저에게 옮겨짐)
+CHANGE_USER = 'user'
+CHANGE_CHARACTER = 'character'
+CHANGE_REMOVE = 'remove'
+# 기록을 남긴 경로
+SOURCE_REGISTER = 'register'
+SOURCE_BUTTON = 'button'
+SOURCE_REFRESH = 'refresh'
+
+_CHAR_COLUMNS = ('job', 'level', 'role', 'is_main', 'is_entropy')
+
+
+@dataclass
+class RosterChange:
+    version: int
+    guild_id: int
+    owner_id: int
+    name: Optional[str]
+    kind: str
+    data: Optional[Dict]
+    source: str
+    created_at: float
+
+
+def _log_changes(conn: sqlite3.Connection, guild_id: int, source: str,
+                 changes: List[Tuple[int, Optional[str], str, Optional[Dict]]]):
+    """(owner_id, 캐릭터명, 종류, 데이터) 목록을 기록. 로스터 쓰기와 같은 트랜잭션 안에서 호출"""
+    now = time.time()
+    conn.executemany(
+        "INSERT INTO roster_changes (guild_id, owner_id, name, kind, data, source, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(guild_id, owner_id, name, kind, json.dumps(data, ensure_ascii=False) if data is not None else None, source, now)
+         for owner_id, name, kind, data in changes]
+    )
+
+
+def _character_changes(conn: sqlite3.Connection, guild_id: int, rows: List[tuple],
+                       columns: Tuple[str, ...] = _CHAR_COLUMNS) -> List[tuple]:
+    """
+    characters에 쓸 행들을 지금 값과 비교해 바뀐 열만 기록용으로 (쓰기 전에 호출).
+    이미 있는 캐릭터는 columns 열만 덮어쓰는 경우 그 열만 비교
+    """
+    changes = []
+    for _, owner_id, name, *values in rows:
+        old = conn.execute(f"SELECT {', '.join(_CHAR_COLUMNS)} FROM characters "
+                           "WHERE guild_id = ? AND owner_id = ? AND name = ?", (guild_id, owner_id, name)).fetchone()
+        new = dict(zip(_CHAR_COLUMNS, values))
+        if old is not None:
+            new = {col: value for col, value, before in zip(_CHAR_COLUMNS, values, old)
+                   if col in columns and value != before}
+        if new:
+            changes.append((owner_id, name, CHANGE_CHARACTER, new))
+    return changes
+
+
+def _write_snapshot(conn: sqlite3.Connection, guild_id: int, version: int):
+    users = conn.execute("SELECT discord_id, main_char FROM users WHERE guild_id = ?", (guild_id,)).fetchall()
+    chars = conn.execute(f"SELECT owner_id, name, {', '.join(_CHAR_COLUMNS)} FROM characters WHERE guild_id = ?",
+                         (guild_id,)).fetchall()
+    conn.execute("INSERT OR REPLACE INTO roster_snapshots VALUES (?, ?, ?, ?)",
+                 (guild_id, version, json.dumps({'users': users, 'characters': chars}, ensure_ascii=False), time.time()))
+
+
+# 인덱스 i의 함수가 user_version i -> i+1로 올린다. 스키마를 바꿀 때는 함수를 뒤에 추가만 할 것
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _migrate_v1,
+    _migrate_v2,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('guild_bot.db')
-        self.create_tables()
-
-    def create_tables(self):
-        with self.conn:
-            self.conn.execute('''CREATE TABLE IF NOT EXISTS users
-                                (discord_id INTEGER PRIMARY KEY, main_char TEXT)''')
-            self.conn.execute('''CREATE TABLE IF NOT EXISTS characters
-                                (name TEXT PRIMARY KEY, owner_id INTEGER, job TEXT,
-                                level REAL, role TEXT, is_main INTEGER, is_entropy INTEGER)''')
-        
-    def save_member(self, member):
-        with self.conn:
-            self.conn.execute("INSERT OR REPLACE INTO users VALUES (?, ?)",
-                              (member.discord_id, member.main_char_name))
-            for char in member.characters.values():
-                is_entropy_val = 1 if getattr(char,'is_entropy', False) else 0
-                self.conn.execute("INSERT OR REPLACE INTO characters VALUES (?, ?, ?, ?, ?, ?, ?)",
-                                  (char.name, member.discord_id, char.job,
-                                   char.item_level, char.user_set_role, int(char.is_main), is_entropy_val))
-                
-    def load_all_members(self) -> List[GuildMember]:
-         members = []
-         with self.conn:
-            # 1. 모든 유저 가져오기
-            user_rows = self.conn.execute("SELECT discord_id, main_char FROM users").fetchall()
-
-            for u_id, main_char in user_rows:
-                member = GuildMember(discord_id=u_id, main_char_name=main_char)
-
-            # 2. 해당 유저의 캐릭터들 가져오기
-            char_rows = self.conn.execute(
-                "SELECT name, job, level, role, is_main, is_entropy FROM characters WHERE owner_id = ?",
-            (u_id,)).fetchall()
-
-            for name, job, level, role, is_main, is_entropy in char_rows:
-                char_obj = Character(
-                    name = name, job = job, item_level = level,
-                    user_set_role = role, is_main = bool(is_main)
-                )
-                char_obj.is_entropy = bool(is_entropy)
-                member.characters[name] = char_obj
-
-            member.append(member)
-         return members
-    
-    def update_character_role(self, discord_id: int, char_name: str, new_role: str):
-        with self.conn:
-            self.conn.execute("""
-                        UPDATE characters
-                        SET role = ?
-                        WHERE owner_id = ? AND name = ?
-                          """,(new_role, discord_id, char_name))
-    
-    def update_character_entropy(self, discord_id: int, char_name: str, is_entropy: bool):
-        with self.conn:
-            self.conn.execute(
-                """
-                UPDATE characters
-                SET is_entropy = ?
-                WHERE owner_id = ? AND name =?
-                """, 
-                (int(is_entropy), discord_id, char_name)
+    """
+    길드별 로스터 저장소. 모든 쿼리는 전용 DB 스레드 하나에서 실행해 디스크 대기가 이벤트 루프를 막지 않게 하고,
+    공개 메서드는 모두 코루틴이다. 로스터 캐시는 이벤트 루프 쪽에서만 읽고 고친다.
+    """
+
+    def __init__(self, path: str = 'guild_bot.db', cache_guilds: int = ROSTER_CACHE_GUILDS):
+        self.path = path
+        self.cache_guilds = cache_guilds
+        # 연결은 첫 쿼리 때 DB 스레드에서 연다 (import 시점에 파일을 열지 않음)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db')
+        # 프로세스 내 길드별 로스터 캐시 (guild_id -> discord_id -> GuildMember). 없는 길드는 다음 조회 때 DB에서 읽음
+        self._rosters: "OrderedDict[int, Dict[int, GuildMember]]" = OrderedDict()
+        # 길드별 쓰기 세대. 쓰기가 끝나 캐시를 고칠 때마다 올려서, 그 사이 읽은 로스터를 캐시에 넣지 않게 함
+        self._generations: Counter = Counter()
+        self._listeners: List[Callable[[int, Set[int]], None]] = []
+
+    # ---------- DB 스레드 ----------
+
+    async def _run(self, op: str, fn: Callable[..., T], *args) -> T:
+        """op: 지표에 남길 쿼리 이름"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, op, fn, args)
+
+    def _call(self, op, fn, args):
+        if self._conn is None:
+            self._conn = self._connect()
+        start = time.perf_counter()
+        try:
+            return fn(self._conn, *args)
+        finally:
+            DB_QUERY_SECONDS.labels(op).observe(time.perf_counter() - start)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        for pragma in _PRAGMAS:
+            conn.execute(pragma)
+        self._migrate(conn)
+        return conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"DB 스키마 버전({version})이 코드({SCHEMA_VERSION})보다 높습니다.")
+        for target in range(version, SCHEMA_VERSION):
+            with conn:
+                # DDL도 한 트랜잭션에 묶어 중간에 실패하면 이전 버전 그대로 남게 한다
+                conn.execute("BEGIN")
+                MIGRATIONS[target](conn)
+                conn.execute(f"PRAGMA user_version = {target + 1}")
+            print(f"✅ DB 스키마 v{target} -> v{target + 1} 마이그레이션 완료")
+
+    async def open(self):
+        """연결과 마이그레이션을 미리 해 둠 (안 하면 첫 쿼리 때 함)"""
+        await self._run('open', lambda conn: None)
+
+    async def close(self):
+        def _close(conn):
+            conn.close()
+        if self._conn is not None:
+            await self._run('close', _close)
+            self._conn = None
+        self._executor.shutdown(wait=True)
+
+    # ---------- 조회 ----------
+
+    async def _roster(self, guild_id: int) -> Dict[int, GuildMember]:
+        roster = self._rosters.get(guild_id)
+        cache_hit('roster', roster is not None)
+        while roster is None:
+            generation = self._generations[guild_id]
+            rows = await self._run('load_roster', lambda conn: conn.execute(_MEMBER_QUERY, (guild_id,)).fetchall())
+            # 기다리는 동안 다른 코루틴이 먼저 채웠으면 그쪽(이후 쓰기가 반영된 것)을 사용
+            roster = self._rosters.get(guild_id)
+            if roster is not None:
+                break
+            # 읽는 동안 끝난 쓰기는 고칠 캐시가 없어 그냥 지나갔으므로, 읽은 결과가 그보다 오래됐을 수 있음 -> 다시 읽음
+            if self._generations[guild_id] != generation:
+                continue
+            roster = self._rosters[guild_id] = self._read_members(rows)
+            if len(self._rosters) > self.cache_guilds:
+                self._rosters.popitem(last=False)
+        self._rosters.move_to_end(guild_id)
+        return roster
+
+    async def load_all_members(self, guild_id: int) -> List[GuildMember]:
+        """이 길드에 등록된 길드원만 돌려준다"""
+        return list((await self._roster(guild_id)).values())
+
+    async def get_member(self, guild_id: int, discord_id: int) -> Optional[GuildMember]:
+        return (await self._roster(guild_id)).get(discord_id)
+
+    async def guild_ids(self) -> List[int]:
+        rows = await self._run('guild_ids', lambda conn: conn.execute("SELECT DISTINCT guild_id FROM users").fetchall())
+        return [row[0] for row in rows]
+
+    def invalidate_cache(self, guild_id: Optional[int] = None):
+        if guild_id is None:
+            self._rosters.clear()
+            for gid in self._generations:
+                self._generations[gid] += 1
+        else:
+            self._rosters.pop(guild_id, None)
+            self._generations[guild_id] += 1
+
+    def _read_members(self, rows) -> Dict[int, GuildMember]:
+        # 조인 결과를 한 번 훑으면서 유저별로 묶는다
+        members: Dict[int, GuildMember] = {}
+        for u_id, main_char, name, job, level, role, is_main, is_entropy in rows:
+            member = members.get(u_id)
+            if member is None:
+                member = members[u_id] = GuildMember(discord_id=u_id, main_char_name=main_char)
+            if name is None:
+                continue
+            member.characters[name] = Character(
+                owner_id = u_id, name = name, job = job, item_level = level,
+                user_set_role = role, is_main = bool(is_main), is_entropy = bool(is_entropy)
             )
+        return members
+
+    # ---------- 쓰기 ----------
+
+    def add_write_listener(self, listener: Callable[[int, Set[int]], None]):
+        """쓰기가 끝날 때마다 (guild_id, 캐릭터가 바뀐 유저 ID 집합)으로 호출됨 (매칭 결과 캐시 무효화 등)"""
+        self._listeners.append(listener)
+
+    def _notify(self, guild_id: int, owner_ids: Set[int]):
+        # 모든 쓰기 경로가 DB 쓰기 직후 캐시를 고치기 전에 부름
+        self._generations[guild_id] += 1
+        for listener in self._listeners:
+            listener(guild_id, owner_ids)
+
+    async def save_member(self, guild_id: int, member: GuildMember):
+        names = list(member.characters)
+        rows = [(guild_id, member.discord_id, char.name, char.job, char.item_level, char.user_set_role,
+                 int(char.is_main), int(char.is_entropy)) for char in member.characters.values()]
+
+        def _save(conn):
+            with conn:
+                old = conn.execute("SELECT main_char FROM users WHERE guild_id = ? AND discord_id = ?",
+                                   (guild_id, member.discord_id)).fetchone()
+                # REPLACE는 기존 행을 지워 캐릭터까지 CASCADE 삭제되므로 UPSERT 사용
+                conn.execute("""INSERT INTO users VALUES (?, ?, ?)
+                                ON CONFLICT (guild_id, discord_id) DO UPDATE SET main_char = excluded.main_char""",
+                             (guild_id, member.discord_id, member.main_char_name))
+                changes = []
+                if old is None or old[0] != member.main_char_name:
+                    changes.append((member.discord_id, None, CHANGE_USER, {'main_char': member.main_char_name}))
+                # 캐릭터명은 길드 안에서 한 유저에게만 속함: 다른 유저에게 있던 같은 이름의 캐릭터는 이 유저로 옮김
+                removed = _take_characters(conn, guild_id, [(name, member.discord_id) for name in names])
+                changes += [(owner_id, name, CHANGE_REMOVE, None) for owner_id, name in removed]
+                changes += _character_changes(conn, guild_id, rows)
+                conn.executemany("INSERT OR REPLACE INTO characters VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                _log_changes(conn, guild_id, SOURCE_REGISTER, changes)
+            # API에 없어진 캐릭터는 DB에 남아 있으므로 이 유저만 다시 읽어 캐시에 반영
+            return {owner_id for owner_id, _ in removed}, conn.execute(_MEMBER_QUERY + " AND u.discord_id = ?",
+                                                                         (guild_id, member.discord_id)).fetchall()
+
+        moved_from, rows = await self._run('save_member', _save)
+        self._notify(guild_id, moved_from | {member.discord_id})
+        reloaded = self._read_members(rows)
+        roster = self._rosters.get(guild_id)
+        if roster is not None:
+            for other in roster.values():
+                if other.discord_id != member.discord_id:
+                    for name in names:
+                        other.characters.pop(name, None)
+            roster.update(reloaded)
+
+    async def upsert_characters(self, guild_id: int, chars: List[Character], source: str = SOURCE_REFRESH):
+        """
+        캐릭터 목록(char.owner_id 유저 소유)의 직업/아이템 레벨을 한 트랜잭션으로 저장하고 캐시에 반영.
+        이미 있는 캐릭터는 직업/레벨만 덮어써서, 갱신 도중 버튼으로 바꾼 역할/사멸 값을 되돌리지 않는다
+        (새 캐릭터는 chars의 값 그대로 추가)
+        """
+        if not chars:
+            return
+        rows = [(guild_id, char.owner_id, char.name, char.job, char.item_level, char.user_set_role,
+                 int(char.is_main), int(char.is_entropy)) for char in chars]
+
+        def _upsert(conn):
+            with conn:
+                removed = _take_characters(conn, guild_id, [(char.name, char.owner_id) for char in chars])
+                changes = [(owner_id, name, CHANGE_REMOVE, None) for owner_id, name in removed]
+                changes += _character_changes(conn, guild_id, rows, columns=('job', 'level'))
+                conn.executemany("""INSERT INTO characters VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                                    ON CONFLICT (guild_id, owner_id, name)
+                                    DO UPDATE SET job = excluded.job, level = excluded.level""", rows)
+                _log_changes(conn, guild_id, source, changes)
+            return {owner_id for owner_id, _ in removed}
+
+        moved_from = await self._run('upsert_characters', _upsert)
+        self._notify(guild_id, moved_from | {char.owner_id for char in chars})
+
+        roster = self._rosters.get(guild_id)
+        if roster is not None:
+            owners = {char.name: char.owner_id for char in chars}
+            for member in roster.values():
+                for name in owners.keys() & member.characters.keys():
+                    if owners[name] != member.discord_id:
+                        del member.characters[name]
+            for char in chars:
+                member = roster.get(char.owner_id)
+                if member is None:
+                    continue
+                # 캐시도 직업/레벨만 바꿔 그 사이 역할/사멸 변경을 유지
+                if member.update_character(char.name, job=char.job, item_level=char.item_level) is None:
+                    member.characters[char.name] = char
+
+    async def update_character_states(self, guild_id: int, rows: List[Tuple[int, str, str, bool]]):
+        """(owner_id, 캐릭터명, 역할, 사멸 여부) 목록을 한 번의 UPDATE 트랜잭션으로 저장하고 캐시에 반영"""
+        if not rows:
+            return
+
+        def _update(conn):
+            with conn:
+                changes = []
+                for discord_id, char_name, role, is_entropy in rows:
+                    old = conn.execute("SELECT role, is_entropy FROM characters WHERE guild_id = ? AND owner_id = ? AND name = ?",
+                                       (guild_id, discord_id, char_name)).fetchone()
+                    if old is None:
+                        continue
+                    diff = {col: value for col, value, before in
+                            zip(('role', 'is_entropy'), (role, int(is_entropy)), old) if value != before}
+                    if diff:
+                        changes.append((discord_id, char_name, CHANGE_CHARACTER, diff))
+                conn.executemany(
+                    """
+                    UPDATE characters
+                    SET role = ?, is_entropy = ?
+                    WHERE guild_id = ? AND owner_id = ? AND name = ?
+                    """,
+                    [(role, int(is_entropy), guild_id, discord_id, char_name)
+                     for discord_id, char_name, role, is_entropy in rows]
+                )
+                _log_changes(conn, guild_id, SOURCE_BUTTON, changes)
+
+        await self._run('update_character_states', _update)
+        self._notify(guild_id, {discord_id for discord_id, _, _, _ in rows})
+        # Character는 불변이므로 캐시의 유저 객체에 새 기록을 넣는다 (이미 시작된 매칭은 이전 기록을 그대로 봄)
+        roster = self._rosters.get(guild_id, {})
+        for discord_id, char_name, role, is_entropy in rows:
+            member = roster.get(discord_id)
+            if member is not None:
+                member.update_character(char_name, user_set_role=role, is_entropy=bool(is_entropy))
+
+
+    # ---------- 변경 기록 ----------
+
+    @staticmethod
+    def _to_change(row) -> RosterChange:
+        version, guild_id, owner_id, name, kind, data, source, created_at = row
+        return RosterChange(version, guild_id, owner_id, name, kind,
+                            json.loads(data) if data is not None else None, source, created_at)
+
+    async def latest_version(self) -> int:
+        """지금까지 남긴 마지막 변경 기록 번호 (전체 길드 공통, 압축해도 줄지 않음)"""
+        row = await self._run('latest_version', lambda conn: conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'roster_changes'").fetchone())
+        return row[0] if row else 0
+
+    async def changes_since(self, version: int, guild_id: Optional[int] = None) -> Optional[List[RosterChange]]:
+        """
+        version 이후의 변경 기록 (guild_id가 없으면 전체 길드). 그 사이 기록이 압축돼 지워졌으면 None
+        -> 받는 쪽은 전체를 다시 읽어야 함
+        """
+        def _since(conn):
+            # 압축은 길드의 가장 오래된 스냅숏 번호까지 기록을 지운다
+            floor = conn.execute(
+                "SELECT MAX(v) FROM (SELECT MIN(version) AS v FROM roster_snapshots"
+                + (" WHERE guild_id = ?" if guild_id is not None else "") + " GROUP BY guild_id)",
+                (guild_id,) if guild_id is not None else ()
+            ).fetchone()[0]
+            if floor is not None and version < floor:
+                return None
+            query = "SELECT * FROM roster_changes WHERE version > ?"
+            args = [version]
+            if guild_id is not None:
+                query += " AND guild_id = ?"
+                args.append(guild_id)
+            return conn.execute(query + " ORDER BY version", args).fetchall()
+
+        rows = await self._run('changes_since', _since)
+        return None if rows is None else [self._to_change(row) for row in rows]
+
+    async def history(self, guild_id: int, owner_id: Optional[int] = None, limit: int = 20) -> List[RosterChange]:
+        """최근 변경 기록부터 (owner_id를 주면 그 유저 것만)"""
+        query = "SELECT * FROM roster_changes WHERE guild_id = ?"
+        args = [guild_id]
+        if owner_id is not None:
+            query += " AND owner_id = ?"
+            args.append(owner_id)
+        rows = await self._run('history', lambda conn: conn.execute(
+            query + " ORDER BY version DESC LIMIT ?", args + [limit]).fetchall())
+        return [self._to_change(row) for row in rows]
+
+    async def roster_at(self, guild_id: int, version: int) -> Optional[Dict[int, GuildMember]]:
+        """
+        version 시점의 길드 로스터를 스냅숏 + 이후 기록으로 다시 만든다 (역할 변경 분쟁 확인 등).
+        압축으로 그 시점 이전 스냅숏이 없어졌으면 None
+        """
+        def _replay(conn):
+            snap = conn.execute("SELECT version, data FROM roster_snapshots WHERE guild_id = ? AND version <= ? "
+                                "ORDER BY version DESC LIMIT 1", (guild_id, version)).fetchone()
+            if snap is None:
+                # 스냅숏이 있는데 그보다 이전 시점이면 기록이 지워진 것. 스냅숏이 아예 없으면 빈 로스터에서 시작
+                if conn.execute("SELECT 1 FROM roster_snapshots WHERE guild_id = ? LIMIT 1", (guild_id,)).fetchone():
+                    return None
+                snap = (0, '{"users": [], "characters": []}')
+            changes = conn.execute("SELECT * FROM roster_changes WHERE guild_id = ? AND version > ? AND version <= ? "
+                                   "ORDER BY version", (guild_id, snap[0], version)).fetchall()
+            return json.loads(snap[1]), changes
+
+        replayed = await self._run('roster_at', _replay)
+        if replayed is None:
+            return None
+        base, changes = replayed
+        users = {discord_id: main_char for discord_id, main_char in base['users']}
+        chars = {(owner_id, name): dict(zip(_CHAR_COLUMNS, values)) for owner_id, name, *values in base['characters']}
+        for change in map(self._to_change, changes):
+            if change.kind == CHANGE_USER:
+                users[change.owner_id] = change.data['main_char']
+            elif change.kind == CHANGE_CHARACTER:
+                chars.setdefault((change.owner_id, change.name), dict.fromkeys(_CHAR_COLUMNS)).update(change.data)
+            elif change.kind == CHANGE_REMOVE:
+                chars.pop((change.owner_id, change.name), None)
+
+        # _MEMBER_QUERY와 같은 모양의 행으로 만들어 같은 방식으로 읽는다
+        rows = [(discord_id, main_char, None, None, None, None, None, None) for discord_id, main_char in users.items()]
+        rows += [(owner_id, users[owner_id], name, *(values[col] for col in _CHAR_COLUMNS))
+                 for (owner_id, name), values in chars.items() if owner_id in users]
+        return self._read_members(rows)
+
+    async def compact_changes(self, min_changes: int = CHANGELOG_COMPACT_MIN_CHANGES,
+                              retention: float = CHANGELOG_RETENTION) -> Tuple[int, int]:
+        """
+        길드마다 지난 스냅숏 이후 기록이 min_changes개 이상이면 지금 로스터를 스냅숏으로 남기고,
+        retention초가 지난 스냅숏(가장 최근 것 제외)과 남은 가장 오래된 스냅숏 이전의 기록을 지운다.
+        (새로 쓴 스냅숏 수, 지운 기록 수)를 돌려줌
+        """
+        def _compact(conn):
+            written = deleted = 0
+            cutoff = time.time() - retention
+            with conn:
+                guild_ids = [row[0] for row in conn.execute(
+                    "SELECT guild_id FROM roster_changes UNION SELECT guild_id FROM roster_snapshots").fetchall()]
+                for guild_id in guild_ids:
+                    last = conn.execute("SELECT COALESCE(MAX(version), 0) FROM roster_snapshots WHERE guild_id = ?",
+                                        (guild_id,)).fetchone()[0]
+                    pending, newest = conn.execute("SELECT COUNT(*), MAX(version) FROM roster_changes "
+                                                   "WHERE guild_id = ? AND version > ?", (guild_id, last)).fetchone()
+                    if pending >= min_changes:
+                        _write_snapshot(conn, guild_id, newest)
+                        written += 1
+                    conn.execute("DELETE FROM roster_snapshots WHERE guild_id = ? AND created_at < ? AND version < "
+                                 "(SELECT MAX(version) FROM roster_snapshots WHERE guild_id = ?)",
+                                 (guild_id, cutoff, guild_id))
+                    oldest = conn.execute("SELECT MIN(version) FROM roster_snapshots WHERE guild_id = ?",
+                                          (guild_id,)).fetchone()[0]
+                    if oldest is not None:
+                        deleted += conn.execute("DELETE FROM roster_changes WHERE guild_id = ? AND version <= ?",
+                                                (guild_id, oldest)).rowcount
+            return written, deleted
+
+        return await self._run('compact_changes', _compact)
+
+
+class ChangeLogCompactor:
+    """interval초마다 Database.compact_changes()를 실행하는 백그라운드 작업"""
+
+    def __init__(self, db: Database, interval: float = CHANGELOG_COMPACT_INTERVAL):
+        self.db = db
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                written, deleted = await self.db.compact_changes()
+                if written or deleted:
+                    print(f"🗜️ 변경 기록 압축: 스냅숏 {written}개, 지운 기록 {deleted}개")
+            except Exception as e:  # 한 번 실패해도 다음 주기는 계속 돌도록
+                print(f"❌ 변경 기록 압축 실패: {e!r}")
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class CharacterStateWriter:
+    """
+    역할/사멸 버튼 클릭을 바로 커밋하지 않고 delay초 동안 모았다가 한 번에 저장한다.
+    같은 캐릭터를 여러 번 누르면 마지막 상태만 저장됨
+    """
+
+    def __init__(self, db: Database, delay: float = ROLE_WRITE_DELAY):
+        self.db = db
+        self.delay = delay
+        self._pending: Dict[Tuple[int, int, str], Tuple[str, bool]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def submit(self, guild_id: int, discord_id: int, char: Character):
+        self._pending[(guild_id, discord_id, char.name)] = (char.user_set_role, char.is_entropy)
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        self._task = None
+        try:
+            await self.flush()
+        except Exception as e:  # 백그라운드 태스크라 여기서 남기지 않으면 아무도 못 봄
+            print(f"❌ 역할/사멸 저장 실패, {len(self._pending)}건은 {self.delay}초 뒤 다시 시도: {e!r}")
+            if self._pending and self._task is None:
+                self._task = asyncio.create_task(self._flush_later())
+
+    async def flush(self):
+        """모인 변경을 저장. 저장하지 못한 길드의 행은 대기열에 다시 넣고 마지막 예외를 올림"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        pending, self._pending = self._pending, {}
+        by_guild: Dict[int, List[Tuple[int, str, str, bool]]] = {}
+        for (guild_id, discord_id, name), (role, is_entropy) in pending.items():
+            by_guild.setdefault(guild_id, []).append((discord_id, name, role, is_entropy))
+        error = None
+        for guild_id, rows in by_guild.items():
+            try:
+                await self.db.update_character_states(guild_id, rows)
+            except Exception as e:
+                error = e
+                # 저장하는 동안 같은 캐릭터를 다시 눌렀으면 그 값이 더 새로움
+                for discord_id, name, role, is_entropy in rows:
+                    self._pending.setdefault((guild_id, discord_id, name), (role, is_entropy))
+        if error is not None:
+            raise error
@@ -0,0 +1,102 @@
+"""
+매칭 전 가능성 검사. 탐색을 돌리기 전에 개수 세기만으로 알 수 있는 필요조건을 NumPy로 확인해
+불가능한 요청은 바로 이유와 함께 거절하고, 이 조건들로 가능한 최대 판수를 알려준다.
+
+R판에 대한 필요조건 (N = 공격대 인원, P = 파티 수 = 필요 서폿 수):
+    - 유저-자리 매칭: 한 유저는 판마다 1캐릭만 -> sum(min(유저별 캐릭 수, R)) >= N*R
+    - 서폿 매칭: sum(min(유저별 서폿/딜폿 수, R)) >= P*R
+    - 직업 중복 (규칙 파일의 unique_job_role): 같은 (직업, 역할)은 파티마다 1명
+      -> sum(min((직업, 역할)별 캐릭 수, P*R)) >= N*R (서폿도 같은 방식)
+각 조건의 좌변은 R에 대해 오목하고 0에서 0이므로, 한 번 깨지면 더 많은 판수에서도 깨진다 (최대 판수가 잘 정의됨).
+모두 만족해도 본캐 짝궁 규칙 등 때문에 실제 탐색은 실패할 수 있다
+"""
+from dataclasses import dataclass, field
+from typing import List, Sequence
+
+import numpy as np
+
+from models import GuildMember
+from pool import F_SUPPORT, RosterSnapshot
+from rules import RAID_DATA, RULES, RaidInfo
+
+
+@dataclass
+class FeasibilityReport:
+    feasible: bool
+    max_rounds: int                                     # 필요조건을 모두 만족하는 최대 판수
+    reasons: List[str] = field(default_factory=list)    # 요청 판수가 불가능한 이유 (사용자에게 보여줌)
+
+
+def _counts(values: np.ndarray) -> np.ndarray:
+    return np.unique(values, return_counts=True)[1]
+
+
+def _capped_sum(counts: np.ndarray, caps: np.ndarray) -> np.ndarray:
+    """판수 후보마다 sum(min(counts, cap))"""
+    return np.minimum(counts[:, None], caps[None, :]).sum(axis=0)
+
+
+def analyze(snapshot: RosterSnapshot, raid: RaidInfo, total_rounds: int) -> FeasibilityReport:
+    if total_rounds < 1:
+        return FeasibilityReport(False, 0, [f"판수는 1 이상이어야 합니다. (입력: {total_rounds})"])
+
+    idx = snapshot.eligible(raid.required_level)
+    n, p = raid.max_players, raid.required_supps
+    owner = snapshot.owner[idx]
+    supp = (snapshot.flags[idx] & F_SUPPORT) != 0
+    job_role = snapshot.job_role[idx]
+
+    owner_counts, supp_counts = _counts(owner), _counts(owner[supp])
+    jr_counts, supp_jr_counts = _counts(job_role), _counts(job_role[supp])
+
+    def slots(rounds: np.ndarray):
+        owner_slots = _capped_sum(owner_counts, rounds)
+        supp_slots = _capped_sum(supp_counts, rounds)
+        if RULES.unique_job_role:
+            job_slots = _capped_sum(jr_counts, p * rounds)
+            supp_job_slots = _capped_sum(supp_jr_counts, p * rounds)
+        else:
+            job_slots, supp_job_slots = n * rounds, p * rounds
+        return owner_slots, supp_slots, job_slots, supp_job_slots
+
+    # 1..limit판을 한 번에 검사. 캐릭 수 // N 판을 넘으면 유저-자리 조건에서 반드시 깨지므로
+    # 요청 판수와 상관없이 배열은 캐릭 수 // N + 1 판까지만 만든다 (마지막 칸은 항상 불가능)
+    rounds = np.arange(1, len(idx) // n + 2)
+    owner_slots, supp_slots, job_slots, supp_job_slots = slots(rounds)
+    ok = ((owner_slots >= n * rounds) & (supp_slots >= p * rounds)
+          & (job_slots >= n * rounds) & (supp_job_slots >= p * rounds))
+    max_rounds = int(np.argmin(ok)) if not ok.all() else len(rounds)
+
+    if total_rounds <= max_rounds:
+        return FeasibilityReport(True, max_rounds)
+
+    # 이유는 요청 판수 기준으로 다시 계산 (판수 하나라 배열 크기와 무관)
+    owner_slots, supp_slots, job_slots, supp_job_slots = (int(a[0]) for a in slots(np.array([total_rounds])))
+    reasons = []
+    if len(owner_counts) < n:
+        reasons.append(f"레벨 {raid.required_level:.0f} 이상 캐릭터가 있는 유저가 {len(owner_counts)}명이라 "
+                       f"{n}인 공격대를 만들 수 없습니다.")
+    elif owner_slots < n * total_rounds:
+        reasons.append(f"유저마다 한 판에 1캐릭만 참여할 수 있어 {total_rounds}판에 필요한 {n * total_rounds}자리 중 "
+                       f"{owner_slots}자리만 채울 수 있습니다.")
+    if supp_slots < p * total_rounds:
+        reasons.append(f"서폿(서폿/딜폿)이 부족합니다: {total_rounds}판에 {p * total_rounds}명이 필요한데 "
+                       f"유저별 판당 1명 기준 {supp_slots}명만 가능합니다.")
+    # 캐릭터 수 자체는 충분한데 한 직업에 몰려서 모자라는 경우만
+    if ((job_slots < n * total_rounds <= len(idx))
+            or (supp_job_slots < p * total_rounds <= int(supp.sum()))):
+        crowded = [_job_role_name(snapshot, idx, job_role, jr) for jr, count in
+                   zip(*np.unique(job_role, return_counts=True)) if count > p * total_rounds]
+        detail = f" ({', '.join(crowded)})" if crowded else ""
+        reasons.append(f"같은 직업·역할은 파티마다 1명만 가능해 한 직업에 몰린 캐릭터{detail}는 "
+                       f"직업별로 {total_rounds}판에 {p * total_rounds}개까지만 쓸 수 있습니다.")
+    return FeasibilityReport(False, max_rounds, reasons)
+
+
+def _job_role_name(snapshot: RosterSnapshot, idx: np.ndarray, job_role: np.ndarray, jr: int) -> str:
+    char = snapshot.chars[int(idx[np.flatnonzero(job_role == jr)[0]])]
+    return f"{char.job}/{char.user_set_role}"
+
+
+def check_feasibility(members: Sequence[GuildMember], raid_key: str, total_rounds: int) -> FeasibilityReport:
+    return analyze(RosterSnapshot(members), RAID_DATA[raid_key], total_rounds)
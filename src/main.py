@@ -1,84 +1,273 @@
+import time
+_import_started = time.perf_counter()
+
+import asyncio
 import discord
 from discord import app_commands
-from optimizer import RAID_DATA
-from database import Database
 import os
-from dotenv import load_dotenv
-from api import LostArkAPI
-from database import GuildMember
+from typing import TYPE_CHECKING
+from config import BOT_SHARDED, SHARD_COUNT, DEV_GUILD_ID, MAX_ROUNDS
+from rules import RAID_DATA, RULES
+from command_sync import sync_commands
+from metrics import StartupTimer, instrument_command, stage, start_metrics_server
+from throttle import InteractionScheduler, throttled
+
+# 매칭/DB/API 모듈(numpy, httpx, 프로세스 풀 포함)은 setup_hook과 핸들러 안에서 import:
+# 게이트웨이 접속 전 import 시간을 줄이고, 이 파일을 다시 import하는 워커 프로세스도 가볍게
+if TYPE_CHECKING:
+    from api import LostArkAPI
+    from database import Database, CharacterStateWriter, ChangeLogCompactor
+    from refresh import RosterRefresher
+    from result_cache import ResultCache
+    from service import OptimizationService
+
 
+startup = StartupTimer(_import_started)
+startup.mark("import")
 
-load_dotenv()
-db = Database()
+# 길드가 많으면 AutoShardedClient로 게이트웨이 연결을 나눈다. 길드별 상태(로스터 캐시, 매칭 작업 한도)는 guild_id로 분리됨
+_BotBase = discord.AutoShardedClient if BOT_SHARDED else discord.Client
 
-class MyBot(discord.Client):
+class MyBot(_BotBase):
     def __init__(self):
-        super().__init__(intents=discord.Intents.all())
+        options = {'shard_count': SHARD_COUNT} if BOT_SHARDED and SHARD_COUNT else {}
+        super().__init__(intents=discord.Intents.all(), **options)
         self.tree = app_commands.CommandTree(self)
+        # DB/API/매칭 서비스는 setup_hook에서 만든다 (import만 하는 워커 프로세스나 도구에서는 만들지 않음)
+        # 영구 버튼 콜백에서는 interaction.client로 접근
+        self.db: "Database" = None
+        self.role_writer: "CharacterStateWriter" = None
+        self.result_cache: "ResultCache" = None
+        self.optimizer_service: "OptimizationService" = None
+        self.lostark_api: "LostArkAPI" = None
+        self.roster_refresher: "RosterRefresher" = None
+        self.changelog_compactor: "ChangeLogCompactor" = None
+        # 유저별 요청 빈도/중복 제한과 공정 대기열 (콜백의 @throttled가 사용)
+        self.scheduler = InteractionScheduler()
 
     async def setup_hook(self):
-        # 명령어 동기화
-        await self.tree.sync()
-        print("✅ 슬래시 명령어 동기화 완료")
+        startup.mark("login")
+
+        with startup.phase("db"):
+            from database import Database, CharacterStateWriter, ChangeLogCompactor
+            self.db = Database()
+            await self.db.open()
+            self.role_writer = CharacterStateWriter(self.db)
+
+        with startup.phase("services"):
+            from api import LostArkAPI
+            from refresh import RosterRefresher
+            from result_cache import ResultCache
+            from service import OptimizationService
+            from views import RoleButton, EntropyButton
+            self.result_cache = ResultCache()
+            # 꺼져 있던 동안 바뀐 유저의 결과는 변경 기록으로 골라 버림
+            await self.result_cache.catch_up(self.db)
+            # 캐릭터가 바뀐 유저가 포함된 매칭 결과는 버림
+            self.db.add_write_listener(self.result_cache.invalidate_owners)
+            self.optimizer_service = OptimizationService(result_cache=self.result_cache)
+            self.lostark_api = LostArkAPI()
+            self.roster_refresher = RosterRefresher(self.db, self.lostark_api)
+            self.changelog_compactor = ChangeLogCompactor(self.db)
+            # 역할 설정 버튼은 custom_id로 다시 만들어지므로 재시작 후에도 동작
+            self.add_dynamic_items(RoleButton, EntropyButton)
+
+        # 명령어 정의가 바뀐 경우에만 동기화 (DEV_GUILD_ID가 있으면 그 길드에만)
+        with startup.phase("sync") as notes:
+            guild = discord.Object(id=DEV_GUILD_ID) if DEV_GUILD_ID else None
+            synced = await sync_commands(self.tree, guild)
+            notes.append(("동기화함" if synced else "변경 없음") + (f", 길드 {DEV_GUILD_ID}" if guild else ""))
+
+        # 아이템 레벨 주기적 갱신 시작
+        self.roster_refresher.start()
+        self.changelog_compactor.start()
+
+        # 로컬 /metrics 엔드포인트
+        start_metrics_server()
+
+    async def on_ready(self):
+        # 재연결 때도 불리므로 처음 한 번만 기록
+        if not any(name == "gateway" for name, _, _ in startup.phases):
+            startup.mark("gateway")
+            print(startup.report())
+
+    async def close(self):
+        # setup_hook 전에 실패한 경우(로그인 실패 등) 만들어진 것만 정리
+        if self.roster_refresher is not None:
+            self.roster_refresher.stop()
+        if self.changelog_compactor is not None:
+            self.changelog_compactor.stop()
+        if self.role_writer is not None:
+            await self.role_writer.flush()
+        if self.result_cache is not None:
+            self.result_cache.save(await self.db.latest_version())
+        if self.optimizer_service is not None:
+            self.optimizer_service.shutdown()
+        if self.lostark_api is not None:
+            await self.lostark_api.aclose()
+        if self.db is not None:
+            await self.db.close()
+        await super().close()
 
 bot = MyBot()
 
 
 @bot.tree.command(name="품앗이매칭", description="참여 인원을 선택하여 레이드 파티를 구성합니다.")
+@app_commands.guild_only()
 @app_commands.choices(raid=[
     app_commands.Choice(name = v.name, value = k) for k, v in RAID_DATA.items()
 ])
 @app_commands.describe(판수 = "진행할 총 판수를 입력하세요 (예: 3)")
+@instrument_command("품앗이매칭")
+@throttled("품앗이매칭", dedup=True)
+
+async def match(interaction: discord.Interaction, raid: app_commands.Choice[str],
+                판수: app_commands.Range[int, 1, MAX_ROUNDS]):
+    # 디스코드가 범위를 검사하지만 직접 호출(시뮬레이션 등)에 대비해 한 번 더
+    if not 1 <= 판수 <= MAX_ROUNDS:
+        await interaction.response.send_message(f"❌ 판수는 1 이상 {MAX_ROUNDS} 이하여야 합니다.", ephemeral=True)
+        return
 
-async def match(interaction: discord.Interaction, raid: app_commands.Choice[str], 판수: int):
     # 드롭다운은 선택하는 사람에게만 보이고 채널을 더럽히지 않도록 ephemaral = True 추천
     # 하지만 결과는 모두가 봐야 하므로 일단 defer만 한다.
     
     await interaction.response.defer(ephemeral=True)
     
     # 1. [중요] DB에서 저장된 모든 맴버 로드
-    all_members = db.load_all_members()
+    with stage("품앗이매칭", "load_members"):
+        all_members = await bot.db.load_all_members(interaction.guild_id)
 
     if not all_members:
         await interaction.followup.send("❌ 등록된 길드원이 없습니다. /등록을 먼저 해주세요.")
         return
     
     # 참여자 선택을 위한 View 생성
-    # view.py MemberSelectView 클래스를 정의해야 한다.
     from views import MemberSelectView
-    view = MemberSelectView(all_members, raid, 판수, db)
+    view = MemberSelectView(all_members, raid, 판수, bot.db, bot.optimizer_service)
     
-    await interaction.followup.send(
-        f"✅ **{raid.name} ({판수}판)** 매칭 참여자를 선택해주세요.",
-        view = view
-    )
+    with stage("품앗이매칭", "send"):
+        await interaction.followup.send(view.prompt, view = view)
 
   
 
 @bot.tree.command(name="등록", description = "내 캐릭터 정보를 등록합니다.")
+@app_commands.guild_only()
+@instrument_command("등록")
+@throttled("등록", dedup=True, pool='api')
 
 async def register(interaction: discord.Interaction, 대표캐릭명: str):
     await interaction.response.defer() # API 호출 시간이 걸리므로 응답 대기
 
-    api_data = LostArkAPI.get_siblings(대표캐릭명)
-    print(f"DEBUG API DATA: {api_data}")
+    # API 응답 시간/상태 코드는 lostark_api_seconds 지표로 확인
+    with stage("등록", "api"):
+        api_data = await bot.lostark_api.get_siblings(대표캐릭명)
 
     if not api_data:
         await interaction.followup.send("❌ 캐릭터 정보를 가져오지 못했습니다. 닉네임을 확인하세요.")
         return
     
+    from models import GuildMember
+    from views import RoleSetupView
     member = GuildMember.from_api_json(interaction.user.id, 대표캐릭명, api_data)
 
-    db.save_member(member) # DB 저장
+    with stage("등록", "save"):
+        await bot.db.save_member(interaction.guild_id, member) # DB 저장
 
-    tier_4_chars = [c for c in member.characters.values() if c.item_level >= 1640]
+    tier_4_chars = [c for c in member.characters.values() if c.item_level >= RULES.min_item_level]
 
-    from views import RoleSetupView
-    view = RoleSetupView(member, db)
+    view = RoleSetupView(member)
     
-    await interaction.followup.send(
-        f"✅ {대표캐릭명}님의 캐릭터 {len(tier_4_chars)}개가 매칭 대상으로 등록되었습니다.\n 아래 버튼을 눌러 역할을 설정하세요!",
-        view=view
+    with stage("등록", "send"):
+        await interaction.followup.send(
+            f"✅ {대표캐릭명}님의 캐릭터 {len(tier_4_chars)}개가 매칭 대상으로 등록되었습니다.\n 아래 버튼을 눌러 역할을 설정하세요!",
+            view=view
+        )
+
+@bot.tree.command(name="주간계획", description="등록된 길드원 전체로 이번 주 여러 레이드의 파티를 한 번에 구성합니다.")
+@app_commands.guild_only()
+@app_commands.describe(레이드 = "레이드와 판수를 쉼표로 구분해 입력하세요 (예: 종막 하드=2, 4막 노말=3)")
+@instrument_command("주간계획")
+
+async def weekly_plan(interaction: discord.Interaction, 레이드: str):
+    from planner import parse_raid_rounds
+    from service import GuildQueueFull
+    from views import batch_embeds, build_plan_embeds
+    try:
+        raid_rounds = parse_raid_rounds(레이드)
+    except ValueError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+
+    await interaction.response.defer()
+
+    with stage("주간계획", "load_members"):
+        all_members = await bot.db.load_all_members(interaction.guild_id)
+    if not all_members:
+        await interaction.followup.send("❌ 등록된 길드원이 없습니다. /등록을 먼저 해주세요.")
+        return
+
+    # 같은 유저가 다시 요청하면 이전 계획 작업은 취소
+    try:
+        with stage("주간계획", "plan"):
+            plan = await bot.optimizer_service.submit_plan((interaction.guild_id, interaction.user.id, 'plan'),
+                                                           interaction.guild_id, all_members, raid_rounds)
+    except GuildQueueFull:
+        await interaction.followup.send("⏳ 이 서버에서 진행 중인 매칭이 너무 많습니다. 잠시 후 다시 시도해주세요.")
+        return
+    except asyncio.TimeoutError:
+        await interaction.followup.send("⏱️ 계획 작성 시간이 초과되었습니다. 레이드 수를 줄여 다시 시도해주세요.")
+        return
+    if plan is None:
+        # 같은 유저가 다시 요청해 이 작업이 취소됨. 응답 없이 두면 '생각 중...'으로 남음
+        await interaction.followup.send("⏹️ 새 요청으로 이전 계획 작업이 취소되었습니다.")
+        return
+
+    # 메시지 하나에 임베드 10개, 합계 6000자까지
+    with stage("주간계획", "send"):
+        for embeds in batch_embeds(build_plan_embeds(plan)):
+            await interaction.followup.send(embeds=embeds)
+
+
+@bot.tree.command(name="변경기록", description="길드 로스터의 최근 변경 기록을 확인합니다.")
+@app_commands.guild_only()
+@app_commands.describe(길드원 = "이 길드원의 기록만 봅니다")
+@instrument_command("변경기록")
+
+async def change_history(interaction: discord.Interaction, 길드원: discord.Member = None):
+    with stage("변경기록", "load"):
+        changes = await bot.db.history(interaction.guild_id, 길드원.id if 길드원 else None)
+    if not changes:
+        await interaction.response.send_message("기록된 변경이 없습니다.", ephemeral=True)
+        return
+
+    # 최근 것부터, 메시지 2000자 제한 안에서
+    from views import format_change
+    lines, size = [], 0
+    for change in changes:
+        line = format_change(change)
+        if size + len(line) + 1 > 1900:
+            break
+        lines.append(line)
+        size += len(line) + 1
+    await interaction.response.send_message("📜 최근 변경 기록\n" + "\n".join(lines), ephemeral=True)
+
+
+@bot.tree.command(name="갱신현황", description="길드원 아이템 레벨 자동 갱신 진행 상황을 확인합니다.")
+
+async def refresh_status(interaction: discord.Interaction):
+    stats = bot.roster_refresher.stats
+    if not stats.started_at:
+        await interaction.response.send_message("아직 갱신이 실행되지 않았습니다.", ephemeral=True)
+        return
+
+    state = "진행 중" if stats.running else "완료"
+    await interaction.response.send_message(
+        f"🔄 로스터 갱신 {state}: {stats.done_users + stats.failed_users}/{stats.total_users}명 "
+        f"(실패 {stats.failed_users}명, 변경 {stats.changed_chars}캐릭)\n"
+        f"소요 {stats.elapsed:.1f}초 (API 대기 {stats.api_seconds:.1f}초, DB 저장 {stats.db_seconds:.2f}초)",
+        ephemeral=True
     )
 
-bot.run(os.getenv('DISCORD_TOKEN'))
\ No newline at end of file
+# 매칭 워커 프로세스(spawn)가 이 파일을 다시 import해도 봇이 또 뜨지 않도록 보호
+if __name__ == "__main__":
+    bot.run(os.getenv('DISCORD_TOKEN'))
\ No newline at end of file
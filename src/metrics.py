@@ -0,0 +1,174 @@
+"""
+Prometheus 지표와 계측 도우미. 봇 프로세스 안에서만 기록한다 (매칭 워커 프로세스의 결과는 서비스가 받아서 기록).
+    METRICS_PORT 로컬 포트의 /metrics 로 노출, PROFILE_COMMANDS에 명령어 이름을 넣으면 매칭 작업을 cProfile로 측정
+"""
+import functools
+import heapq
+import marshal
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from config import METRICS_ADDR, METRICS_PORT, PROFILE_COMMANDS, PROFILE_DIR, PROFILE_KEEP
+
+COMMAND_LATENCY = Histogram(
+    'bot_command_seconds', "슬래시 명령어/컴포넌트 콜백 처리 시간", ['command', 'outcome'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30),
+)
+COMMAND_STAGE = Histogram(
+    'bot_command_stage_seconds', "명령어 처리 단계별 시간 (로스터 조회, 매칭, 임베드 생성, 디스코드 전송)", ['command', 'stage'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20),
+)
+OPTIMIZER_SECONDS = Histogram(
+    'optimizer_wall_seconds', "매칭 작업 시간 (대기열 포함)", ['raid', 'status'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 20),
+)
+OPTIMIZER_NODES = Histogram(
+    'optimizer_nodes_explored', "제약 탐색 노드 수", ['raid'],
+    buckets=(10, 100, 1_000, 5_000, 10_000, 50_000, 100_000, 200_000),
+)
+DB_QUERY_SECONDS = Histogram(
+    'db_query_seconds', "DB 스레드에서 실행한 쿼리 시간", ['op'],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+API_LATENCY = Histogram(
+    'lostark_api_seconds', "로스트아크 API 응답 시간", ['status'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+REFRESH_SECONDS = Histogram(
+    'roster_refresh_seconds', "로스터 아이템 레벨 일괄 갱신 한 번의 시간",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+REFRESH_CHANGED = Counter(
+    'roster_refresh_changed_characters_total', "로스터 갱신으로 저장한 (직업/레벨이 바뀌었거나 새로 생긴) 캐릭터 수",
+)
+REFRESH_FAILED = Counter(
+    'roster_refresh_failed_users_total', "로스터 갱신 중 API 조회에 실패한 유저 수",
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', "캐시 조회 결과", ['cache', 'result'],
+)
+INTERACTION_REJECTED = Counter(
+    'bot_interactions_rejected_total', "요청 제한으로 거절한 상호작용 (rate: 빈도 초과, duplicate: 처리 중 중복, busy: 대기열 가득 참)",
+    ['command', 'reason'],
+)
+
+STARTUP_PHASE = Gauge(
+    'bot_startup_phase_seconds', "마지막 시작 때 단계별 소요 시간 (import, 로그인, DB, 서비스, 명령어 동기화, 게이트웨이)", ['phase'],
+)
+
+
+def start_metrics_server(port: int = METRICS_PORT, addr: str = METRICS_ADDR) -> bool:
+    """port가 0이면 끔"""
+    if not port:
+        return False
+    start_http_server(port, addr=addr)
+    print(f"📈 지표 엔드포인트: http://{addr}:{port}/metrics")
+    return True
+
+
+def cache_hit(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+@contextmanager
+def stage(command: str, name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        COMMAND_STAGE.labels(command, name).observe(time.perf_counter() - start)
+
+
+def instrument_command(name: str):
+    """명령어 콜백 전체 처리 시간 기록 (예외가 나면 outcome=error)"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = 'error'
+            try:
+                result = await func(*args, **kwargs)
+                outcome = 'ok'
+                return result
+            finally:
+                COMMAND_LATENCY.labels(name, outcome).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class StartupTimer:
+    """
+    시작 단계별 시간 기록. phase()로 감싼 구간은 그 구간만, mark()는 직전 기록 이후 흐른 시간을 잰다.
+    report()는 전체 시간과 단계별 시간을 한 줄로
+    """
+
+    def __init__(self, started_at: Optional[float] = None):
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self._last = self.started_at
+        self.phases: List[Tuple[str, float, str]] = []   # (단계, 초, 메모)
+
+    def _record(self, name: str, seconds: float, note: str = ""):
+        self.phases.append((name, seconds, note))
+        STARTUP_PHASE.labels(name).set(seconds)
+
+    def mark(self, name: str, note: str = ""):
+        now = time.perf_counter()
+        self._record(name, now - self._last, note)
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        notes: List[str] = []   # 구간 안에서 notes.append("변경 없음")처럼 메모를 남길 수 있음
+        try:
+            yield notes
+        finally:
+            self._last = time.perf_counter()
+            self._record(name, self._last - start, ", ".join(notes))
+
+    def report(self) -> str:
+        parts = " · ".join(f"{name} {seconds:.2f}초" + (f" ({note})" if note else "")
+                           for name, seconds, note in self.phases)
+        return f"⏱️ 시작 완료 {time.perf_counter() - self.started_at:.2f}초: {parts}"
+
+
+def profiling_enabled(command: str) -> bool:
+    return command in PROFILE_COMMANDS
+
+
+class SlowRunProfiles:
+    """
+    cProfile로 측정한 매칭 작업 중 가장 느린 keep개만 PROFILE_DIR에 .prof 파일로 남긴다.
+    (python -m pstats 파일명 / snakeviz 등으로 확인)
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._heap: List[Tuple[float, str]] = []   # (시간, 파일 경로) 최소 힙
+
+    def record(self, elapsed: float, label: str, stats: Optional[Dict]) -> Optional[str]:
+        if stats is None:
+            return None
+        if len(self._heap) >= self.keep and elapsed <= self._heap[0][0]:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{label}_{elapsed * 1000:.0f}ms_{int(time.time())}.prof")
+        with open(path, 'wb') as f:
+            marshal.dump(stats, f)   # pstats.Stats가 읽는 형식
+        heapq.heappush(self._heap, (elapsed, path))
+        if len(self._heap) > self.keep:
+            _, fastest = heapq.heappop(self._heap)
+            try:
+                os.remove(fastest)
+            except OSError:
+                pass
+        return path
+
+
+slow_profiles = SlowRunProfiles()
@@ -1,8 +1,16 @@
-from dataclasses import dataclass, field
-from typing import List, Dict
+import sys
+from dataclasses import dataclass, field, replace
+from typing import List, Dict, Optional
 
-@dataclass
+from rules import RULES
+
+@dataclass(frozen=True, slots=True)
 class Character:
+    """
+    캐릭터 한 개의 불변 기록. 역할/사멸/레벨이 바뀌면 replace()로 새 객체를 만들어 GuildMember에 다시 넣는다.
+    (캐시된 로스터를 여러 매칭이 같이 읽어도 안전하도록 매칭 중에 값을 붙이거나 고치지 않음)
+    """
+    owner_id: int          # 소유자 디스코드 유저 ID
     name: str
     job: str
     item_level: float
@@ -13,24 +21,37 @@ class Character:
     사용자가 설정한 역할: DPS, Support, Hybrid
     초기값은 API 기반으로 추측하되, 사용자가 수정한 값을 우선시함.
     """
+
+    def __post_init__(self):
+        # 직업명/역할은 종류가 몇 개 안 되므로 intern해서 모든 캐릭터가 같은 문자열 객체를 공유 (DB/API에서 읽은 값은 매번 새 객체)
+        if isinstance(self.job, str):
+            object.__setattr__(self, 'job', sys.intern(self.job))
+        object.__setattr__(self, 'user_set_role', sys.intern(self.user_set_role))
+
     @classmethod
     def determine_default_role(cls, job: str) -> str:
         """
         직업명을 보고 기본 역할을 추측한다.
         """
-        support_jobs = ['바드', '도화가', '홀라나이트', '발키리']
-        return '서폿' if job in support_jobs else '딜러'
+        return RULES.default_role(job)
 
-@dataclass
+@dataclass(slots=True)
 class GuildMember:
     discord_id: int
     main_char_name: str
     # 캐릭터 이름을 Key로, Character 객체를 Value로
     characters: Dict[str, Character] = field(default_factory=dict)
 
+    def update_character(self, char_name: str, **changes) -> Optional[Character]:
+        """캐릭터 기록을 바꾼 값으로 새로 만들어 교체하고 돌려줌 (없는 캐릭터면 None)"""
+        char = self.characters.get(char_name)
+        if char is None:
+            return None
+        char = self.characters[char_name] = replace(char, **changes)
+        return char
+
     def update_role(self, char_name:str, new_role: str):
-        if char_name in self.characters:
-            self.characters[char_name].user_set_role = new_role
+        self.update_character(char_name, user_set_role=new_role)
 
     @classmethod
     def from_api_json(cls, discord_id: int, main_char_name: str, api_data: List[dict]):
@@ -66,6 +87,7 @@ class GuildMember:
 
             # Character 객체 생성 및 추가
             member.characters[name] = Character(
+                owner_id = discord_id,
                 name = name,
                 job = job,
                 item_level = level,
@@ -1,119 +1,105 @@
-import itertools
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Sequence
 from models import Character, GuildMember
-from config import RAID_DATA, ENTROPY_CLASS, ENTROPY_SYNERGY_CLASS
+from anytime import AnytimeSearch, ScheduleScore, objective_upper_bound
+from config import SEARCH_MAX_NODES, SEARCH_TIME_LIMIT, ANYTIME_TIME_LIMIT
+from partition import best_partition
+from feasibility import FeasibilityReport, analyze
+from pool import CompiledPool, RosterSnapshot
+from rules import RAID_DATA, RULES
+from solver import ConstraintSolver, SearchBudget, INFEASIBLE
+
+def upper_bound_gap(upper_bound: float, total: float) -> Optional[float]:
+    """
+    상한 대비 부족 비율 [0, 1]. 0이면 상한에 닿은 것이므로 최적이 보장된다.
+    감점 항목 때문에 점수가 음수가 될 수 있어 1로 자르며, 0이 아닌 값은 최적해와의 차이가 아니라 느슨한 상한과의 차이다
+    """
+    if upper_bound > 0:
+        return min(1.0, max(0.0, (upper_bound - total) / upper_bound))
+    return 0.0 if total >= upper_bound else None
+
 
 class RaidOptimizer:
-    def __init__(self, members: List[GuildMember], raid_key: str, total_rounds: int):
+    def __init__(self, members: List[GuildMember], raid_key: str, total_rounds: int,
+                 budget: Optional[SearchBudget] = None,
+                 should_stop: Optional[Callable[[], bool]] = None,
+                 on_progress: Optional[Callable[[int, Optional[float]], None]] = None):
         self.members = members
         self.raid = RAID_DATA[raid_key]
         self.total_rounds = total_rounds
+        self.budget = budget or SearchBudget(SEARCH_MAX_NODES, SEARCH_TIME_LIMIT)
+        self.should_stop = should_stop
+        # 진행 상황 알림 on_progress(채운 판 수, 지금까지 최고 점수 또는 None)
+        self.on_progress = on_progress
+        self.compiled: Optional[CompiledPool] = None
+        # 마지막 solve() 결과 상태 (solver.SOLVED / INFEASIBLE / BUDGET_EXHAUSTED / CANCELLED)
+        self.status = None
+        self.nodes_explored = 0
+        # solve_best() 결과: 목적 함수 점수, 상한, 상한 대비 부족 비율 (upper_bound_gap)
+        self.score: Optional[ScheduleScore] = None
+        self.upper_bound: Optional[float] = None
+        self.gap: Optional[float] = None
+        # 탐색 전 가능성 검사 결과 (불가능하면 탐색 없이 INFEASIBLE)
+        self.feasibility: Optional[FeasibilityReport] = None
 
     def solve(self):
         """전체 라운드 매칭을 시도하는 메인 함수"""
-        pool = self._prepare_character_pool()
-        return self._backtrack_rounds(pool, 0, [])
-
-    def _prepare_character_pool(self) -> List[Character]:
-        pool = []
-        for m in self.members:
-            for char in m.characters.values():
-                if char.item_level >= self.raid.required_level:
-                    char.owner_id = m.discord_id  # 매칭용 owner_id 주입
-                    pool.append(char)
-        return pool
-
-    def _backtrack_rounds(self, pool: List[Character], current_round: int, result_so_far: List):
-        if current_round == self.total_rounds:
-            return result_so_far
-
-        # 이번 라운드에 참여할 max_players 명을 뽑는 조합 탐색
-        for combo in itertools.combinations(pool, self.raid.max_players):
-            # 8인/16인 등을 파티(4인 단위)로 최적 분할 시도
-            raid_structure = self._optimize_raid_structure(list(combo))
-            
-            if raid_structure:
-                remaining_pool = [c for c in pool if c not in combo]
-                res = self._backtrack_rounds(remaining_pool, current_round + 1, result_so_far + [raid_structure])
-                if res: return res
-        return None
+        rounds = self._solve_indices()
+        return self._to_characters(rounds) if rounds is not None else None
+
+    def solve_best(self, time_limit: float = ANYTIME_TIME_LIMIT):
+        """
+        최적화 모드: 먼저 규칙을 만족하는 매칭을 찾고, time_limit 초 동안 목적 함수(시너지, 본캐 시너지,
+        파티 간 레벨 차이, 유저별 시너지 공평성)를 개선한다. 시간이 다 되면 지금까지 가장 좋은 매칭을 반환
+        """
+        rounds = self._solve_indices()
+        if rounds is None:
+            return None
+
+        on_improve = (lambda score: self.on_progress(self.total_rounds, score)) if self.on_progress else None
+        self.upper_bound = objective_upper_bound(self.compiled, self.total_rounds, self.raid.max_players)
+        search = AnytimeSearch(self.compiled, rounds, time_limit, should_stop=self.should_stop,
+                               on_improve=on_improve, upper_bound=self.upper_bound)
+        best_rounds, self.score = search.run()
+        self.gap = upper_bound_gap(self.upper_bound, self.score.total)
+        return self._to_characters(best_rounds)
+
+    def _solve_indices(self) -> Optional[List[List[List[int]]]]:
+        # 레벨 필터는 로스터 배열에서 한 번에, 캐릭터 객체는 고치지 않음 (owner_id는 Character에 들어 있음)
+        snapshot = RosterSnapshot(self.members)
+        self.feasibility = analyze(snapshot, self.raid, self.total_rounds)
+        if not self.feasibility.feasible:
+            self.status = INFEASIBLE
+            self.nodes_explored = 0
+            return None
+        order = ConstraintSolver.order_pool(snapshot, snapshot.eligible(self.raid.required_level))
+        # 규칙 3(본캐 짝궁)은 5인 이상 참여 시에만 적용
+        self.compiled = CompiledPool.from_snapshot(snapshot, order, pair_main=RULES.pair_main(len(self.members)))
+        solver = ConstraintSolver(self.compiled, self.raid.max_players, self.total_rounds,
+                                  budget=self.budget, should_stop=self.should_stop,
+                                  on_round=(lambda r: self.on_progress(r, None)) if self.on_progress else None)
+        rounds = solver.solve()
+        self.status = solver.status
+        self.nodes_explored = solver.nodes
+        if rounds is None:
+            return None
+        return [self._finalize_round(parties) for parties in rounds]
+
+    def _to_characters(self, rounds: List[List[List[int]]]) -> List[List[List[Character]]]:
+        chars = self.compiled.chars
+        return [[[chars[i] for i in party] for party in parties] for parties in rounds]
+
+    def _finalize_round(self, parties: List[List[int]]) -> List[List[int]]:
+        # 탐색기가 만든 파티는 이미 규칙을 만족함. 같은 인원으로 시너지가 최대인 분할을 다시 고른다
+        return self._optimize_raid_structure([i for party in parties for i in party]) or parties
+
+    def _optimize_raid_structure(self, idxs: Sequence[int]) -> Optional[List[List[int]]]:
+        """선택된 인원(CompiledPool 인덱스)을 규칙에 맞게 4인 파티들로 쪼개고 시너지를 최적화함"""
+        pool = self.compiled
+        idxs = tuple(sorted(idxs))
 
-    def _optimize_raid_structure(self, chars: List[Character]) -> Optional[List[List[Character]]]:
-        """선택된 인원을 규칙에 맞게 4인 파티들로 쪼개고 시너지를 최적화함"""
         # 규칙 1: 동일 유저 중복 불가 (공격대 전체 기준)
-        owner_ids = [c.owner_id for c in chars]
+        owner_ids = [pool.owner[i] for i in idxs]
         if len(owner_ids) != len(set(owner_ids)): return None
 
-        # 4인 레이드일 경우
-        if self.raid.max_players == 4:
-            return [chars] if self._is_valid_party(chars) else None
-
-        # 8인 레이드일 경우 (최적 시너지 분할 탐색)
-        elif self.raid.max_players == 8:
-            best_split = None
-            max_score = -1
-            
-            for combo in itertools.combinations(chars, 4):
-                p1 = list(combo)
-                p2 = [c for c in chars if c not in combo]
-                
-                if self._is_valid_party(p1) and self._is_valid_party(p2):
-                    score = self._calculate_synergy_score(p1) + self._calculate_synergy_score(p2)
-                    if score > max_score:
-                        max_score = score
-                        best_split = [p1, p2]
-            return best_split
-
-        # 16인(베히모스) 등은 연산량 관계상 단순 분배 (그리디)
-        else:
-            return self._simple_split(chars)
-
-    def _is_valid_party(self, party: List[Character]) -> bool:
-        # 규칙 2: 최소 서폿 1명 (딜폿 포함)
-        if not any(c.user_set_role in ['서폿', '딜폿'] for c in party): return False
-
-        # 규칙 4: 직업 중복 체크 (직업명 + 역할 튜플로 딜러/서폿 발키리 허용)
-        job_roles = [(c.job, c.user_set_role) for c in party]
-        if len(job_roles) != len(set(job_roles)): return False
-
-        # 규칙 3: 본캐 서폿-딜러 짝궁 (5인 이상 시)
-        if len(self.members) >= 5:
-            main_supps = [c for c in party if c.is_main and c.user_set_role in ['서폿', '딜폿']]
-            main_dps = [c for c in party if c.is_main and c.user_set_role == '딜러']
-            if main_supps and not main_dps: return False
-
-        return True
-
-    def _calculate_synergy_score(self, party: List[Character]) -> int:
-        """사멸 시너지(워로드, 블레이드) 배정 점수 계산"""
-        score = 0
-        has_synergy = any(c.job in ENTROPY_SYNERGY_CLASS for c in party)
-        entropy_dps = [c for c in party if self._is_entropy_candidate(c)]
-        
-        if has_synergy:
-            score += len(entropy_dps) * 10  # 사멸 딜러당 10점
-            # 규칙 5: 본캐 사멸 딜러에게 시너지 몰아주기 가점
-            score += sum(5 for c in entropy_dps if c.is_main)
-            
-        return score
-
-    def _is_entropy_candidate(self, char: Character) -> bool:
-        # DB 저장된 is_entropy 값 우선, 없으면 config의 고정 직업군 확인
-        if getattr(char, 'is_entropy', False): return True
-        return char.job in ENTROPY_CLASS and char.user_set_role in ["딜러", "딜폿"]
-
-    def _simple_split(self, chars: List[Character]):
-        # 16인용 간단 분할 로직 (서폿 우선 분배)
-        supps = [c for c in chars if c.user_set_role in ['서폿', '딜폿']]
-        dps = [c for c in chars if c.user_set_role not in ['서폿', '딜폿']]
-        
-        if len(supps) < self.raid.required_supps: return None
-        
-        parties = [[] for _ in range(self.raid.max_players // 4)]
-        for i, s in enumerate(supps[:len(parties)]):
-            parties[i].append(s)
-        
-        all_dps = supps[len(parties):] + dps
-        for i, d in enumerate(all_dps):
-            parties[i % len(parties)].append(d)
-        return parties
\ No newline at end of file
+        # 4인/8인/16인 모두 규칙을 만족하면서 시너지 합이 최대인 파티 분할을 찾는다
+        return best_partition(pool, idxs)
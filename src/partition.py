@@ -0,0 +1,76 @@
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pool import CompiledPool, F_SYNERGY
+
+
+def best_partition(pool: CompiledPool, idxs: Sequence[int]) -> Optional[List[List[int]]]:
+    """
+    공격대 인원(4의 배수)을 4인 파티들로 나누는 최적 분할.
+    모든 파티가 규칙(pool.party_valid)을 만족하면서 시너지 점수 합(pool.party_score)이 최대인 분할을 찾는다.
+
+    남은 인원의 비트마스크를 상태로 하는 DP:
+    - 파티 순서는 의미가 없으므로 '남은 인원 중 가장 앞 순번'을 항상 다음 파티에 넣어 대칭을 제거
+    - 16인 기준 상태 수는 C(16,4)+C(16,8)+C(16,12) 이하, 무효 파티는 아예 전개하지 않음
+    - 남은 인원이 낼 수 있는 점수 상한으로 가지치기하고, 상한에 닿으면 더 보지 않음
+    """
+    idxs = tuple(sorted(idxs))
+    n = len(idxs)
+    if n == 0 or n % 4:
+        return None
+
+    # 남은 인원이 낼 수 있는 점수 상한: 시너지 직업이 없으면 0, 있으면 멤버 사멸 점수 합 (branch and bound)
+    member_score = [pool.entropy_score[i] for i in idxs]
+    synergy_mask = sum(1 << b for b in range(n) if pool.flags[idxs[b]] & F_SYNERGY)
+    bound_cache: Dict[int, int] = {}
+
+    def upper_bound(mask: int) -> int:
+        ub = bound_cache.get(mask)
+        if ub is None:
+            ub = bound_cache[mask] = (sum(member_score[b] for b in range(n) if mask >> b & 1)
+                                      if mask & synergy_mask else 0)
+        return ub
+
+    # 분할 안에서 쓰는 로컬 비트(0..n-1)로 만든 유효 파티 마스크 -> 점수. 무효 파티는 없음
+    party_value: Dict[int, int] = {}
+    for local in combinations(range(n), 4):
+        key = tuple(idxs[b] for b in local)
+        if pool.party_valid(key):
+            party_value[1 << local[0] | 1 << local[1] | 1 << local[2] | 1 << local[3]] = pool.party_score(key)
+
+    # memo[남은 마스크] = (최고 점수, 이번에 뽑은 파티 마스크). 불가능하면 점수 -1
+    memo: Dict[int, Tuple[int, int]] = {0: (0, 0)}
+
+    def solve(rem: int) -> int:
+        hit = memo.get(rem)
+        if hit is not None:
+            return hit[0]
+
+        bits = [1 << b for b in range(n) if rem >> b & 1]
+        lowest = bits[0]
+        limit = upper_bound(rem)
+        best, best_party = -1, 0
+        for a, b, c in combinations(bits[1:], 3):
+            party = lowest | a | b | c
+            value = party_value.get(party)
+            if value is None or value + upper_bound(rem ^ party) <= best:
+                continue
+            sub = solve(rem ^ party)
+            if sub >= 0 and value + sub > best:
+                best, best_party = value + sub, party
+                if best == limit:
+                    break
+        memo[rem] = (best, best_party)
+        return best
+
+    full = (1 << n) - 1
+    if solve(full) < 0:
+        return None
+
+    parties = []
+    rem = full
+    while rem:
+        party = memo[rem][1]
+        parties.append([idxs[b] for b in range(n) if party >> b & 1])
+        rem &= ~party
+    return parties
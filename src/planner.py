@@ -0,0 +1,275 @@
+"""
+주간 레이드 계획: 여러 레이드(RAID_DATA 키, 판수)를 한 번에 놓고 길드 전체 캐릭터를 배정한다.
+1) 최소 비용 유량으로 "어떤 캐릭터가 어떤 레이드에 가는지"를 한 번에 정한다
+   - 캐릭터당 주간 클리어 횟수 제한, 같은 레이드의 난이도는 하나만 (예: 종막 하드/노말 중 하나)
+   - 레이드별 서폿/딜러 자리 수, 유저당 판 수만큼만 배정
+   - 높은 레이드 자리일수록 가치가 커서, 높은 레벨 캐릭터가 낮은 레이드에 쓰이지 않는다
+2) 레이드마다 기존 RaidOptimizer로 실제 파티를 만든다. 유량 모델이 다루지 않는 파티 규칙(직업 중복, 본캐 짝궁 등)
+   때문에 실패하면, 아직 주간 횟수가 남은 캐릭터를 더 넣어 다시 푸는 지역 보정으로 넘어간다
+"""
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from config import WEEKLY_CLEAR_LIMIT, PLANNER_TIME_LIMIT, SEARCH_MAX_NODES, MAX_ROUNDS
+from models import Character, GuildMember
+from optimizer import RaidOptimizer
+from rules import RAID_DATA, RULES
+from solver import SearchBudget, SOLVED, CANCELLED
+
+CharKey = Tuple[int, str]  # (소유자 discord_id, 캐릭터명)
+
+
+def raid_group(raid_key: str) -> str:
+    """같은 레이드의 난이도끼리 묶는 키 (예: '종막 하드', '종막 노말' -> '종막')"""
+    return raid_key.split()[0]
+
+
+class MinCostFlow:
+    """
+    음수 비용을 허용하는 최소 비용 유량 (SPFA로 최단 경로를 찾아 한 경로씩 보냄).
+    그래프가 작아서(캐릭터 수 x 레이드 수 정도) 순수 파이썬으로 충분하다
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        # 간선: [도착, 용량, 비용, 역간선 인덱스]
+        self.graph: List[List[list]] = [[] for _ in range(n)]
+
+    def add_edge(self, u: int, v: int, cap: int, cost: int) -> Tuple[int, int]:
+        self.graph[u].append([v, cap, cost, len(self.graph[v])])
+        self.graph[v].append([u, 0, -cost, len(self.graph[u]) - 1])
+        return u, len(self.graph[u]) - 1
+
+    def flow_on(self, edge: Tuple[int, int]) -> int:
+        u, i = edge
+        v, _, _, rev = self.graph[u][i]
+        return self.graph[v][rev][1]
+
+    def run(self, s: int, t: int, deadline: Optional[float] = None) -> Tuple[int, int]:
+        """비용이 줄어드는 동안 유량을 보낸다. deadline이 지나면 그때까지 보낸 유량으로 멈춤"""
+        total_flow = total_cost = 0
+        graph = self.graph
+        while deadline is None or time.monotonic() < deadline:
+            dist = [None] * self.n
+            prev: List[Optional[Tuple[int, int]]] = [None] * self.n
+            in_queue = [False] * self.n
+            dist[s] = 0
+            queue = deque([s])
+            while queue:
+                u = queue.popleft()
+                in_queue[u] = False
+                for i, (v, cap, cost, _) in enumerate(graph[u]):
+                    if cap > 0 and (dist[v] is None or dist[u] + cost < dist[v]):
+                        dist[v] = dist[u] + cost
+                        prev[v] = (u, i)
+                        if not in_queue[v]:
+                            in_queue[v] = True
+                            queue.append(v)
+
+            # 더 보내도 비용이 줄지 않으면 종료
+            if dist[t] is None or dist[t] >= 0:
+                break
+
+            push = None
+            v = t
+            while v != s:
+                u, i = prev[v]
+                push = graph[u][i][1] if push is None else min(push, graph[u][i][1])
+                v = u
+            v = t
+            while v != s:
+                u, i = prev[v]
+                edge = graph[u][i]
+                edge[1] -= push
+                graph[v][edge[3]][1] += push
+                v = u
+            total_flow += push
+            total_cost += push * dist[t]
+        return total_flow, total_cost
+
+
+@dataclass
+class WeeklyPlan:
+    # 레이드 키 -> 판 -> 파티 -> 캐릭터 (못 짠 레이드는 None)
+    raids: Dict[str, Optional[List[List[List[Character]]]]]
+    status: Dict[str, str]
+    # 캐릭터별 배정된 레이드 (discord_id, 캐릭터명) -> [레이드 키]
+    bookings: Dict[CharKey, List[str]] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+
+class WeeklyPlanner:
+    # 자리를 채우는 것이 레이드 선택보다 항상 우선하도록 하는 비용 (레벨 차이보다 충분히 큼)
+    FILL_BONUS = 1_000_000
+
+    def __init__(self, members: List[GuildMember], raid_rounds: Dict[str, int],
+                 time_limit: float = PLANNER_TIME_LIMIT, clear_limit: int = WEEKLY_CLEAR_LIMIT,
+                 should_stop: Optional[Callable[[], bool]] = None):
+        self.members = members
+        # 높은 레이드부터 파티를 짜서, 보정 단계에서도 높은 레벨 캐릭터가 먼저 높은 레이드에 쓰이게 함
+        self.raid_rounds = dict(sorted(raid_rounds.items(), key=lambda kv: -RAID_DATA[kv[0]].required_level))
+        self.time_limit = time_limit
+        self.clear_limit = clear_limit
+        self.should_stop = should_stop
+        self.chars: Dict[CharKey, Character] = {
+            (m.discord_id, name): char for m in members for name, char in m.characters.items()
+        }
+        self.mains = {m.discord_id: m.main_char_name for m in members}
+
+    def _eligible(self, char: Character, raid_key: str) -> bool:
+        return char.item_level >= RAID_DATA[raid_key].required_level
+
+    def _value(self, char: Character, raid_key: str) -> int:
+        """
+        캐릭터를 이 레이드에 보내는 가치 (0.01 레벨 단위 정수). 높은 레이드일수록 크고,
+        입장 레벨을 크게 넘는 캐릭터일수록 작게 해 높은 레벨 캐릭터는 높은 레이드에 남겨 둔다
+        """
+        required = RAID_DATA[raid_key].required_level
+        return int(required * 100) - int((char.item_level - required) * 10)
+
+    def _possible(self, raid_key: str) -> bool:
+        # 입장 가능한 캐릭터를 가진 유저 수가 공격대 인원보다 적으면 애초에 불가능 (자리를 잡아먹지 않게 제외)
+        owners = {owner for (owner, _), char in self.chars.items() if self._eligible(char, raid_key)}
+        return len(owners) >= RAID_DATA[raid_key].max_players
+
+    # ---------- 1단계: 유량으로 배정 ----------
+
+    def assign(self, deadline: Optional[float] = None) -> Dict[str, Set[CharKey]]:
+        raid_rounds = {raid_key: rounds for raid_key, rounds in self.raid_rounds.items() if self._possible(raid_key)}
+        nodes: Dict[tuple, int] = {}
+
+        def node(key: tuple) -> int:
+            return nodes.setdefault(key, len(nodes))
+
+        S, T = node(('S',)), node(('T',))
+        edges: List[Tuple[Tuple[int, int], CharKey, str]] = []
+        pending: List[Tuple[int, int, int, int]] = []
+        owner_rounds: Dict[Tuple[int, str, str], int] = {}
+
+        for raid_key, rounds in raid_rounds.items():
+            raid = RAID_DATA[raid_key]
+            supps = rounds * raid.required_supps
+            # 서폿은 필수 자리(판당 파티 수)를 먼저 채우고, 남으면 나머지 자리로 넘어갈 수 있다
+            pending.append((node(('supp', raid_key)), T, supps, -self.FILL_BONUS))
+            pending.append((node(('supp', raid_key)), node(('rest', raid_key)), rounds * raid.max_players, 0))
+            pending.append((node(('dps', raid_key)), node(('rest', raid_key)), rounds * raid.max_players, 0))
+            pending.append((node(('rest', raid_key)), T, rounds * raid.max_players - supps, -self.FILL_BONUS))
+
+        for (owner, name), char in self.chars.items():
+            raids = [r for r in raid_rounds if self._eligible(char, r)]
+            if not raids:
+                continue
+            c = node(('char', owner, name))
+            pending.append((S, c, self.clear_limit, 0))
+            role = 'supp' if RULES.is_support_role(char.user_set_role) else 'dps'
+            for group in {raid_group(r) for r in raids}:
+                g = node(('group', owner, name, group))
+                pending.append((c, g, 1, 0))
+                for raid_key in raids:
+                    if raid_group(raid_key) != group:
+                        continue
+                    # 유저 한 명은 판마다 캐릭터 1개: 한 레이드에 (역할별) 판 수만큼만
+                    o = node(('owner', owner, raid_key, role))
+                    owner_rounds[(owner, raid_key, role)] = raid_rounds[raid_key]
+                    edges.append((len(pending), (owner, name), raid_key))
+                    pending.append((g, o, 1, -self._value(char, raid_key)))
+
+        for (owner, raid_key, role), rounds in owner_rounds.items():
+            pending.append((node(('owner', owner, raid_key, role)), node((role, raid_key)), rounds, 0))
+
+        flow = MinCostFlow(len(nodes))
+        handles = [flow.add_edge(u, v, cap, cost) for u, v, cap, cost in pending]
+        flow.run(S, T, deadline)
+
+        assigned: Dict[str, Set[CharKey]] = {raid_key: set() for raid_key in self.raid_rounds}
+        for idx, char_key, raid_key in edges:
+            if flow.flow_on(handles[idx]):
+                assigned[raid_key].add(char_key)
+        return assigned
+
+    # ---------- 2단계: 레이드별 파티 구성 ----------
+
+    def _members_for(self, char_keys: Set[CharKey]) -> List[GuildMember]:
+        members: Dict[int, GuildMember] = {}
+        for owner, name in char_keys:
+            member = members.get(owner)
+            if member is None:
+                member = members[owner] = GuildMember(discord_id=owner, main_char_name=self.mains[owner])
+            member.characters[name] = self.chars[(owner, name)]
+        return list(members.values())
+
+    def _remaining(self, raid_key: str, bookings: Dict[CharKey, List[str]]) -> Set[CharKey]:
+        """주간 횟수가 남았고 같은 레이드(다른 난이도 포함)에 아직 안 간 캐릭터"""
+        group = raid_group(raid_key)
+        return {
+            key for key, char in self.chars.items()
+            if self._eligible(char, raid_key)
+            and len(bookings.get(key, ())) < self.clear_limit
+            and all(raid_group(r) != group for r in bookings.get(key, ()))
+        }
+
+    def plan(self) -> WeeklyPlan:
+        start = time.monotonic()
+        deadline = start + self.time_limit
+        # 배정에는 시간의 1/4까지만 쓰고 나머지는 파티 구성에
+        assigned = self.assign(deadline=start + self.time_limit / 4)
+
+        bookings: Dict[CharKey, List[str]] = {}
+        raids: Dict[str, Optional[List[List[List[Character]]]]] = {}
+        status: Dict[str, str] = {}
+        remaining_raids = len(self.raid_rounds)
+
+        for raid_key, rounds in self.raid_rounds.items():
+            if self.should_stop and self.should_stop():
+                raids[raid_key], status[raid_key] = None, CANCELLED
+                continue
+            time_left = max(deadline - time.monotonic(), 0.0) / remaining_raids
+            remaining_raids -= 1
+
+            available = self._remaining(raid_key, bookings)
+            candidates = [assigned[raid_key] & available]
+            # 지역 보정: 유량 배정만으로 파티 규칙을 못 맞추면 남은 캐릭터 전체로 다시 시도
+            if available != candidates[0]:
+                candidates.append(available)
+
+            result, result_status = None, None
+            for i, pool in enumerate(candidates):
+                budget = SearchBudget(SEARCH_MAX_NODES, time_left / (len(candidates) - i))
+                optimizer = RaidOptimizer(self._members_for(pool), raid_key, rounds,
+                                          budget=budget, should_stop=self.should_stop)
+                started = time.monotonic()
+                result, result_status = optimizer.solve(), optimizer.status
+                time_left -= time.monotonic() - started
+                if result is not None:
+                    break
+
+            raids[raid_key], status[raid_key] = result, result_status
+            for parties in result or ():
+                for party in parties:
+                    for char in party:
+                        bookings.setdefault((char.owner_id, char.name), []).append(raid_key)
+
+        return WeeklyPlan(raids, status, bookings, time.monotonic() - start)
+
+
+def parse_raid_rounds(text: str) -> Dict[str, int]:
+    """'종막 하드=2, 4막 노말=3' 형식을 {레이드 키: 판수}로. 잘못된 항목은 ValueError"""
+    raid_rounds: Dict[str, int] = {}
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        raid_key, _, rounds = item.partition('=')
+        raid_key = raid_key.strip()
+        if raid_key not in RAID_DATA:
+            raise ValueError(f"알 수 없는 레이드: {raid_key}")
+        try:
+            raid_rounds[raid_key] = int(rounds)
+        except ValueError:
+            raise ValueError(f"판수가 숫자가 아닙니다: {item.strip()}")
+        if not 1 <= raid_rounds[raid_key] <= MAX_ROUNDS:
+            raise ValueError(f"판수는 1 이상 {MAX_ROUNDS} 이하여야 합니다: {item.strip()}")
+    if not raid_rounds:
+        raise ValueError("레이드를 하나 이상 입력하세요")
+    return raid_rounds
@@ -0,0 +1,135 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from models import Character, GuildMember
+# 플래그 정의는 rules에 있고, 매칭 모듈들은 여기서 가져다 씀
+from rules import RULES, F_SUPPORT, F_MAIN, F_ENTROPY, F_SYNERGY, F_MAIN_DPS, F_MAIN_SUPP
+
+# RosterSnapshot.role 값
+ROLE_CODES = {'딜러': 0, '서폿': 1, '딜폿': 2}
+
+
+def char_flags(c: Character) -> int:
+    return RULES.char_flags(c.job, c.user_set_role, c.is_main, c.is_entropy)
+
+
+def is_entropy_candidate(char: Character) -> bool:
+    return bool(char_flags(char) & F_ENTROPY)
+
+
+class RosterSnapshot:
+    """
+    매칭 참여자 로스터의 열(column) 형태 사본. 캐릭터를 한 번만 훑어 소유자/레벨/역할 코드/플래그/(직업, 역할) ID를
+    NumPy 배열로 만들어 두고, 레이드 레벨 필터는 배열 비교 한 번으로 한다. CompiledPool은 여기서 고른 인덱스로 만든다
+    """
+    __slots__ = ('chars', 'owner', 'level', 'role', 'flags', 'job_role')
+
+    def __init__(self, members: Sequence[GuildMember]):
+        chars = [c for m in members for c in m.characters.values()]
+        n = len(chars)
+        jr_ids: Dict[Tuple[str, str], int] = {}
+        self.chars: List[Character] = chars
+        self.owner = np.fromiter((c.owner_id for c in chars), dtype=np.int64, count=n)
+        self.level = np.fromiter((c.item_level for c in chars), dtype=np.float64, count=n)
+        self.role = np.fromiter((ROLE_CODES.get(c.user_set_role, 0) for c in chars), dtype=np.int8, count=n)
+        self.flags = np.fromiter((char_flags(c) for c in chars), dtype=np.uint8, count=n)
+        self.job_role = np.fromiter((jr_ids.setdefault((c.job, c.user_set_role), len(jr_ids)) for c in chars),
+                                    dtype=np.int32, count=n)
+
+    def __len__(self):
+        return len(self.chars)
+
+    def eligible(self, required_level: float) -> np.ndarray:
+        """레벨 조건을 만족하는 캐릭터 인덱스 (로스터 순서 유지)"""
+        return np.flatnonzero(self.level >= required_level)
+
+
+class CompiledPool:
+    """
+    매칭 후보 캐릭터를 작은 정수 인덱스로 바꾸고, 파티 규칙 검사에 필요한 값을 미리 계산해 둔 표.
+    파티 유효성/시너지 점수는 정렬된 인덱스 튜플을 key로 메모해 한 번의 solve() 동안 모든 판에서 재사용한다.
+    """
+
+    def __init__(self, chars: Sequence[Character], pair_main: bool):
+        chars = list(chars)
+        jr_ids: Dict[Tuple[str, str], int] = {}
+        self._build(chars, pair_main,
+                    owner=[c.owner_id for c in chars],
+                    flags=[char_flags(c) for c in chars],
+                    job_role=[jr_ids.setdefault((c.job, c.user_set_role), len(jr_ids)) for c in chars],
+                    level=[c.item_level for c in chars])
+
+    @classmethod
+    def from_snapshot(cls, snapshot: RosterSnapshot, indices: Sequence[int], pair_main: bool) -> "CompiledPool":
+        """snapshot의 indices 캐릭터로 풀을 만든다 (순서대로 0, 1, 2... 인덱스가 됨). 캐릭터 속성은 다시 읽지 않음"""
+        idx = np.asarray(indices, dtype=np.intp)
+        pool = cls.__new__(cls)
+        pool._build([snapshot.chars[i] for i in idx.tolist()], pair_main,
+                    owner=snapshot.owner[idx].tolist(),
+                    flags=snapshot.flags[idx].tolist(),
+                    job_role=snapshot.job_role[idx].tolist(),
+                    level=snapshot.level[idx].tolist())
+        return pool
+
+    def _build(self, chars: List[Character], pair_main: bool, owner: List[int], flags: List[int],
+               job_role: List[int], level: List[float]):
+        self.chars: List[Character] = chars
+        # 규칙 3(본캐 서폿-딜러 짝궁)은 참여 인원이 규칙 파일의 pair_main_min_members 이상일 때만 적용
+        self.pair_main = pair_main
+
+        self.owner: List[int] = owner
+        self.flags: List[int] = flags
+        # (직업, 역할)을 이 풀 안에서 0부터 다시 매긴 정수 (비트 마스크를 작게 유지)
+        jr_ids: Dict[int, int] = {}
+        self.jr_id: List[int] = [jr_ids.setdefault(jr, len(jr_ids)) for jr in job_role]
+        # 파티 내 직업 중복 검사용 (규칙에서 중복을 허용하면 모두 0이라 검사가 항상 통과)
+        self.jr_bit: List[int] = [1 << jr if RULES.unique_job_role else 0 for jr in self.jr_id]
+        # 사멸 딜러 점수 + 본캐 가점 (시너지 직업이 파티에 있을 때만 적용)
+        self.entropy_score: List[int] = [RULES.entropy_value(f) for f in flags]
+        self.level: List[float] = level
+
+        self._valid_memo: Dict[Tuple[int, ...], bool] = {}
+        self._score_memo: Dict[Tuple[int, ...], int] = {}
+
+    def __len__(self):
+        return len(self.chars)
+
+    def party_valid(self, key: Tuple[int, ...]) -> bool:
+        """key: 정렬된 파티 인덱스 튜플"""
+        res = self._valid_memo.get(key)
+        if res is None:
+            res = self._valid_memo[key] = self._check_party(key)
+        return res
+
+    def party_score(self, key: Tuple[int, ...]) -> int:
+        """key: 정렬된 파티 인덱스 튜플"""
+        res = self._score_memo.get(key)
+        if res is None:
+            res = self._score_memo[key] = self._score_party(key)
+        return res
+
+    def _check_party(self, key: Tuple[int, ...]) -> bool:
+        flags = self.flags
+        jr_bit = self.jr_bit
+        union = 0
+        jr_mask = 0
+        for i in key:
+            union |= flags[i]
+            # 규칙 4: 직업 중복 체크 (직업명 + 역할로 딜러/서폿 발키리 허용)
+            if jr_mask & jr_bit[i]: return False
+            jr_mask |= jr_bit[i]
+
+        # 규칙 2: 최소 서폿 1명 (딜폿 포함)
+        if not union & F_SUPPORT: return False
+        # 규칙 3: 본캐 서폿-딜러 짝궁
+        if self.pair_main and union & F_MAIN_SUPP and not union & F_MAIN_DPS: return False
+        return True
+
+    def _score_party(self, key: Tuple[int, ...]) -> int:
+        """사멸 시너지(워로드, 블레이드) 배정 점수 계산"""
+        flags = self.flags
+        if not any(flags[i] & F_SYNERGY for i in key):
+            return 0
+        # 규칙 5: 본캐 사멸 딜러에게 시너지 몰아주기 가점 (entropy_score에 반영)
+        return sum(self.entropy_score[i] for i in key)
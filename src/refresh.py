@@ -0,0 +1,141 @@
+import asyncio
+import time
+from dataclasses import dataclass, field, replace
+from typing import List, Optional
+
+from api import LostArkAPI
+from config import REFRESH_INTERVAL, REFRESH_CONCURRENCY, REFRESH_BATCH_SIZE
+from database import Database
+from metrics import REFRESH_CHANGED, REFRESH_FAILED, REFRESH_SECONDS
+from models import Character, GuildMember
+
+
+@dataclass
+class RefreshStats:
+    """갱신 진행 상황/시간 지표 (한 번의 run() 기준)"""
+    total_users: int = 0
+    done_users: int = 0
+    failed_users: int = 0
+    changed_chars: int = 0
+    started_at: float = 0.0
+    finished_at: float = 0.0
+    api_seconds: float = 0.0     # API 응답 대기 시간 합
+    db_seconds: float = 0.0      # 배치 저장 시간 합
+    failed_names: List[str] = field(default_factory=list)
+
+    @property
+    def running(self) -> bool:
+        return self.started_at > 0 and self.finished_at == 0
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at or time.monotonic()
+        return end - self.started_at if self.started_at else 0.0
+
+
+def diff_member(member: GuildMember, api_data: List[dict]) -> List[Character]:
+    """
+    API 응답과 저장된 캐릭터를 비교해 직업/아이템 레벨이 바뀐(또는 새로 생긴) 캐릭터만 돌려준다.
+    저장할 때는 이미 있는 캐릭터의 직업/레벨만 덮어쓰므로 (upsert_characters) 그 사이 바뀐 역할/사멸 값은 유지된다.
+    """
+    fresh = GuildMember.from_api_json(member.discord_id, member.main_char_name, api_data)
+    changed = []
+    for name, new in fresh.characters.items():
+        old = member.characters.get(name)
+        if old is None:
+            changed.append(new)
+        elif old.item_level != new.item_level or old.job != new.job:
+            changed.append(replace(old, job = new.job, item_level = new.item_level))
+    return changed
+
+
+class RosterRefresher:
+    """
+    길드별 users.main_char 기준으로 형제 캐릭터를 다시 조회해 아이템 레벨을 갱신하는 백그라운드 작업.
+    - API 동시 요청 수를 세마포어로 제한 (레이트 리밋 백오프는 LostArkAPI가 처리)
+    - 요청은 background로 보내 LostArkAPI의 요청 예산을 대화형 요청 몫만큼 남겨 둠
+    - batch_size 명 단위로 바뀐 행만 한 트랜잭션에 저장
+    """
+
+    def __init__(self, db: Database, api: LostArkAPI,
+                 concurrency: int = REFRESH_CONCURRENCY, batch_size: int = REFRESH_BATCH_SIZE):
+        self.db = db
+        self.api = api
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.stats = RefreshStats()
+        self._task: Optional[asyncio.Task] = None
+        self._running: Optional[asyncio.Task] = None
+
+    async def run(self) -> RefreshStats:
+        # 이미 돌고 있으면 겹쳐 실행하지 않고 그 결과를 기다림 (기다리던 쪽이 취소돼도 갱신은 계속)
+        if self._running is None or self._running.done():
+            self._running = asyncio.ensure_future(self._refresh())
+        return await asyncio.shield(self._running)
+
+    async def _refresh(self) -> RefreshStats:
+        rosters = {guild_id: await self.db.load_all_members(guild_id) for guild_id in await self.db.guild_ids()}
+        stats = self.stats = RefreshStats(total_users=sum(len(members) for members in rosters.values()),
+                                          started_at=time.monotonic())
+        sem = asyncio.Semaphore(self.concurrency)
+
+        for guild_id, members in rosters.items():
+            for start in range(0, len(members), self.batch_size):
+                batch = members[start:start + self.batch_size]
+                results = await asyncio.gather(*(self._fetch(sem, m) for m in batch))
+
+                rows: List[Character] = []
+                for changed in results:
+                    if changed is not None:
+                        rows.extend(changed)
+
+                db_start = time.monotonic()
+                await self.db.upsert_characters(guild_id, rows)
+                stats.db_seconds += time.monotonic() - db_start
+                stats.changed_chars += len(rows)
+                REFRESH_CHANGED.inc(len(rows))
+
+        stats.finished_at = time.monotonic()
+        REFRESH_SECONDS.observe(stats.elapsed)
+        print(f"✅ 로스터 갱신 완료: {stats.done_users}/{stats.total_users}명, "
+              f"변경 {stats.changed_chars}캐릭, 실패 {stats.failed_users}명, {stats.elapsed:.1f}초")
+        return stats
+
+    async def _fetch(self, sem: asyncio.Semaphore, member: GuildMember) -> Optional[List[Character]]:
+        stats = self.stats
+        async with sem:
+            # 갱신 목적이므로 캐시된 응답은 버리고 새로 조회
+            self.api.invalidate(member.main_char_name)
+            api_start = time.monotonic()
+            api_data = await self.api.get_siblings(member.main_char_name, background=True)
+            stats.api_seconds += time.monotonic() - api_start
+
+        if not api_data:
+            stats.failed_users += 1
+            REFRESH_FAILED.inc()
+            stats.failed_names.append(member.main_char_name)
+            return None
+        stats.done_users += 1
+        return diff_member(member, api_data)
+
+    def start(self, interval: float = REFRESH_INTERVAL):
+        """interval 초마다 run()을 반복하는 백그라운드 태스크 시작"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(interval))
+
+    async def _loop(self, interval: float):
+        # 재시작할 때마다 바로 전체를 다시 조회하지 않도록 한 주기 기다린 뒤 시작
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.run()
+            except Exception as e:  # 한 번 실패해도 다음 주기는 계속 돌도록
+                print(f"❌ 로스터 갱신 실패: {e!r}")
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._running is not None:
+            self._running.cancel()
+            self._running = None
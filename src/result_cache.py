@@ -0,0 +1,114 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import RESULT_CACHE_SIZE, RESULT_CACHE_PATH
+from models import GuildMember
+
+# (guild_id, raid_key, total_rounds, anytime, 로스터 지문)
+CacheKey = Tuple[int, str, int, bool, str]
+
+
+def roster_fingerprint(members: Iterable[GuildMember]) -> str:
+    """
+    매칭 결과에 영향을 주는 값(유저 ID, 캐릭터명/직업/레벨/역할/본캐/사멸)만으로 만든 지문.
+    참여자 순서나 캐릭터 dict 순서가 달라도 같은 값이 나온다
+    """
+    h = hashlib.sha256()
+    for member in sorted(members, key=lambda m: m.discord_id):
+        h.update(f"u{member.discord_id}\n".encode())
+        for char in sorted(member.characters.values(), key=lambda c: c.name):
+            h.update(f"{char.name}\t{char.job}\t{char.item_level!r}\t{char.user_set_role}\t"
+                     f"{int(char.is_main)}\t{int(char.is_entropy)}\n".encode())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    같은 참여자/레이드/판수로 다시 요청하면 매칭을 다시 돌리지 않고 이전 결과를 돌려주는 LRU 캐시.
+    DB에서 캐릭터가 바뀐 유저가 포함된 결과는 Database 쓰기 알림(invalidate_owners)으로 지운다.
+    path를 주면 종료 시 변경 기록 번호와 함께 저장하고, 시작할 때 다시 읽은 뒤 catch_up()으로
+    꺼져 있던 동안의 변경만 반영한다
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, path: Optional[str] = RESULT_CACHE_PATH):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries: "OrderedDict[CacheKey, object]" = OrderedDict()
+        self._owners: Dict[CacheKey, Set[int]] = {}
+        self.version = 0    # 마지막으로 반영한 DB 변경 기록 번호
+        if path:
+            self.load()
+
+    @staticmethod
+    def make_key(guild_id: int, raid_key: str, total_rounds: int, anytime: bool,
+                 members: List[GuildMember]) -> CacheKey:
+        return guild_id, raid_key, total_rounds, anytime, roster_fingerprint(members)
+
+    def get(self, key: CacheKey):
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: CacheKey, result, owner_ids: Iterable[int]):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        self._owners[key] = set(owner_ids)
+        while len(self._entries) > self.max_entries:
+            old, _ = self._entries.popitem(last=False)
+            self._owners.pop(old, None)
+
+    def invalidate_owners(self, guild_id: int, owner_ids: Set[int]):
+        """이 길드에서 owner_ids 유저의 캐릭터가 포함된 결과를 모두 지움"""
+        stale = [key for key, owners in self._owners.items() if key[0] == guild_id and owners & owner_ids]
+        for key in stale:
+            del self._entries[key]
+            del self._owners[key]
+
+    def clear(self):
+        self._entries.clear()
+        self._owners.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def catch_up(self, db):
+        """저장된 시점 이후의 DB 변경 기록으로 결과를 지운다. 기록이 이미 압축돼 없으면 전부 버림"""
+        changes = await db.changes_since(self.version)
+        if changes is None:
+            self.clear()
+        else:
+            owners: Dict[int, Set[int]] = {}
+            for change in changes:
+                owners.setdefault(change.guild_id, set()).add(change.owner_id)
+            for guild_id, owner_ids in owners.items():
+                self.invalidate_owners(guild_id, owner_ids)
+        self.version = await db.latest_version()
+
+    def save(self, version: Optional[int] = None):
+        if not self.path:
+            return
+        if version is not None:
+            self.version = version
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump({'version': self.version,
+                         'entries': [(key, result, self._owners[key]) for key, result in self._entries.items()]}, f)
+        os.replace(tmp, self.path)
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+            # 변경 기록 번호가 없는 예전 형식은 어떤 변경이 빠졌는지 알 수 없으므로 버림
+            version, entries = data['version'], data['entries']
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, TypeError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"⚠️ 매칭 결과 캐시를 읽지 못했습니다: {e!r}")
+            return
+        self.version = version
+        for key, result, owners in entries:
+            self.put(key, result, owners)
@@ -0,0 +1,68 @@
+"""
+벤치마크/부하 테스트용 가상 길드 로스터 생성기. seed가 같으면 항상 같은 로스터를 만든다.
+"""
+import random
+from typing import List, Optional
+
+from models import Character, GuildMember
+from rules import RAID_DATA, RULES
+
+# 사멸이 아닌(타대) 딜러 직업
+HITMASTER_CLASS = ['소서리스', '아르카나', '서머너', '블래스터', '호크아이', '건슬링어',
+                   '스카우터', '기상술사', '소울이터', '데모닉', '환수사']
+
+# 직업군 비율: 실제 길드처럼 서폿이 부족한 편
+CLASS_WEIGHTS = [
+    (list(RULES.support_jobs), 0.25),
+    (list(RULES.entropy_jobs), 0.40),
+    (list(RULES.flexible_entropy_jobs), 0.07),
+    (HITMASTER_CLASS, 0.28),
+]
+
+RAID_LEVELS = sorted({raid.required_level for raid in RAID_DATA.values()})
+
+
+def _pick_job(rng: random.Random) -> str:
+    groups, weights = zip(*CLASS_WEIGHTS)
+    return rng.choice(rng.choices(groups, weights)[0])
+
+
+def _pick_level(rng: random.Random, is_main: bool) -> float:
+    # 레이드 입장 레벨 근처에 몰리도록: 임의의 입장 레벨 + 작은 편차 (본캐는 상위 입장 레벨 쪽)
+    levels = RAID_LEVELS[len(RAID_LEVELS) // 2:] if is_main else RAID_LEVELS
+    return round(rng.choice(levels) + rng.gauss(3.0, 8.0), 2)
+
+
+def generate_roster(n_members: int, seed: int = 0, chars_per_member: Optional[int] = None,
+                    support_ratio: Optional[float] = None) -> List[GuildMember]:
+    """
+    n_members 명의 길드원을 만든다. 한 명당 캐릭터 수는 기본 2~6개.
+    support_ratio를 주면 직업군 비율 대신 그 비율로 서폿을 만든다.
+    """
+    rng = random.Random(seed)
+    members = []
+    for u in range(n_members):
+        discord_id = 100_000 + u
+        count = chars_per_member or rng.randint(2, 6)
+        main_name = f"길드원{u}본캐"
+        member = GuildMember(discord_id=discord_id, main_char_name=main_name)
+
+        for k in range(count):
+            is_main = k == 0
+            name = main_name if is_main else f"길드원{u}부캐{k}"
+            if support_ratio is not None:
+                job = rng.choice(RULES.support_jobs) if rng.random() < support_ratio else rng.choice(RULES.entropy_jobs + tuple(HITMASTER_CLASS))
+            else:
+                job = _pick_job(rng)
+
+            role = Character.determine_default_role(job)
+            # 서폿 직업 일부는 딜폿으로 운용
+            if role == '서폿' and rng.random() < 0.1:
+                role = '딜폿'
+            member.characters[name] = Character(
+                owner_id = discord_id, name = name, job = job, item_level = _pick_level(rng, is_main),
+                user_set_role = role, is_main = is_main,
+                is_entropy = RULES.has_entropy_choice(job) and rng.random() < 0.5
+            )
+        members.append(member)
+    return members
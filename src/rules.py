@@ -0,0 +1,148 @@
+"""
+레이드/직업/파티 규칙. RULES_PATH의 JSON 파일(기본 rules.json)을 프로세스마다 import 시점에 한 번 읽어
+(직업, 역할) -> 비트 플래그 표로 컴파일한다. 매칭(pool, solver, anytime)과 views는 모두 이 표만 본다.
+새 레이드 추가나 직업군/시너지 점수 변경은 rules.json만 고치면 된다 (재시작 필요).
+
+규칙 파일에서 바꿀 수 없는 것: 파티 인원 4명, 파티마다 서폿 1명 이상 (탐색 구조가 이 두 가지를 전제로 함)
+"""
+import json
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from config import RULES_PATH
+
+# 캐릭터별 비트 플래그
+F_SUPPORT = 1 << 0    # 서폿/딜폿
+F_MAIN = 1 << 1       # 본캐
+F_ENTROPY = 1 << 2    # 사멸 딜러 후보
+F_SYNERGY = 1 << 3    # 사멸 시너지 직업 (워로드, 블레이드)
+F_MAIN_DPS = 1 << 4   # 본캐 딜러
+F_MAIN_SUPP = 1 << 5  # 본캐 서폿/딜폿
+
+PARTY_SIZE = 4
+
+
+@dataclass
+class RaidInfo:
+    name: str
+    required_level: float
+    max_players: int
+
+    @property
+    def required_supps(self) -> int:
+        # 인원수에 따른 서포터 수를 반환 (4인 1명, 8인 2명)
+        return self.max_players // PARTY_SIZE
+
+
+class RuleSet:
+    """규칙 파일 내용을 검사하고 조회용 표로 바꿔 둔 것. 만든 뒤에는 읽기만 함"""
+
+    def __init__(self, data: dict):
+        try:
+            self.min_item_level = float(data['min_item_level'])
+
+            roles = data['roles']
+            self.support_roles: FrozenSet[str] = frozenset(r for r, info in roles.items() if info['support'])
+            self.dps_roles: FrozenSet[str] = frozenset(r for r, info in roles.items() if not info['support'])
+            self.role_cycle: Dict[str, str] = {r: info['next'] for r, info in roles.items()}
+            self.default_support_role: str = data['default_roles']['support']
+            self.default_dps_role: str = data['default_roles']['dps']
+
+            classes = data['classes']
+            # 순서가 필요한 곳(가상 로스터 생성)이 있어 튜플로 보관
+            self.support_jobs: Tuple[str, ...] = tuple(classes['support'])
+            self.entropy_jobs: Tuple[str, ...] = tuple(classes['entropy'])
+            self.flexible_entropy_jobs: Tuple[str, ...] = tuple(classes['flexible_entropy'])
+            self.synergy_jobs: Tuple[str, ...] = tuple(classes['entropy_synergy'])
+            self.auto_entropy_jobs: Tuple[str, ...] = tuple(classes['auto_entropy'])
+            self.entropy_roles: FrozenSet[str] = frozenset(data['entropy_roles'])
+
+            party = data['party']
+            self.unique_job_role: bool = bool(party['unique_job_role'])
+            self.pair_main_min_members: Optional[int] = party['pair_main_min_members']
+
+            synergy = data['synergy']
+            self.entropy_score = int(synergy['entropy'])
+            self.main_entropy_bonus = int(synergy['main_entropy_bonus'])
+
+            self.raids: Dict[str, RaidInfo] = {
+                key: RaidInfo(raid['name'], float(raid['required_level']), int(raid['max_players']))
+                for key, raid in data['raids'].items()
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"규칙 파일 형식이 잘못되었습니다: {e!r}") from e
+
+        for role, next_role in self.role_cycle.items():
+            if next_role not in roles:
+                raise ValueError(f"규칙 파일: 역할 '{role}'의 다음 역할 '{next_role}'이 정의되지 않았습니다.")
+        if not {self.default_support_role, self.default_dps_role} | self.entropy_roles <= roles.keys():
+            raise ValueError("규칙 파일: default_roles/entropy_roles에 정의되지 않은 역할이 있습니다.")
+        for key, raid in self.raids.items():
+            if raid.max_players <= 0 or raid.max_players % PARTY_SIZE:
+                raise ValueError(f"규칙 파일: 레이드 '{key}'의 인원은 {PARTY_SIZE}의 배수여야 합니다.")
+
+        # (직업, 역할) -> (기본 플래그, 본캐일 때 더할 플래그). 규칙 파일에 없는 직업은 처음 볼 때 채움
+        self._job_role_flags: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        jobs = set(self.support_jobs + self.entropy_jobs + self.flexible_entropy_jobs
+                   + self.synergy_jobs + self.auto_entropy_jobs)
+        for job in jobs:
+            for role in roles:
+                self._compile(job, role)
+
+    def _compile(self, job: str, role: str) -> Tuple[int, int]:
+        base = 0
+        if role in self.support_roles: base |= F_SUPPORT
+        if job in self.entropy_jobs and role in self.entropy_roles: base |= F_ENTROPY
+        if job in self.synergy_jobs: base |= F_SYNERGY
+        main = F_MAIN
+        if role in self.dps_roles: main |= F_MAIN_DPS
+        if base & F_SUPPORT: main |= F_MAIN_SUPP
+        entry = self._job_role_flags[(job, role)] = (base, main)
+        return entry
+
+    def char_flags(self, job: str, role: str, is_main: bool, is_entropy: bool) -> int:
+        entry = self._job_role_flags.get((job, role))
+        if entry is None:
+            entry = self._compile(job, role)
+        flags, main = entry
+        # DB 저장된 is_entropy 값(사용자가 고른 사멸) 우선
+        if is_entropy: flags |= F_ENTROPY
+        if is_main: flags |= main
+        return flags
+
+    def is_support_role(self, role: str) -> bool:
+        return role in self.support_roles
+
+    def default_role(self, job: str) -> str:
+        return self.default_support_role if job in self.support_jobs else self.default_dps_role
+
+    def next_role(self, job: str, role: str) -> Tuple[str, Optional[bool]]:
+        """역할 버튼 한 번 누른 결과 (다음 역할, 바뀌는 사멸 값 또는 그대로면 None)"""
+        next_role = self.role_cycle.get(role, self.default_dps_role)
+        # 홀리나이트처럼 딜러로 쓰면 무조건 사멸인 직업
+        if job in self.auto_entropy_jobs:
+            return next_role, next_role in self.entropy_roles
+        return next_role, None
+
+    def has_entropy_choice(self, job: str) -> bool:
+        """사멸/비사멸을 직접 고르는 직업 (브레이커, 가디언나이트)"""
+        return job in self.flexible_entropy_jobs
+
+    def pair_main(self, n_members: int) -> bool:
+        """본캐 서폿-딜러 짝궁 규칙을 적용할 참여 인원인지"""
+        return self.pair_main_min_members is not None and n_members >= self.pair_main_min_members
+
+    def entropy_value(self, flags: int) -> int:
+        """시너지 직업이 있는 파티에서 이 캐릭터가 얻는 점수"""
+        if not flags & F_ENTROPY:
+            return 0
+        return self.entropy_score + (self.main_entropy_bonus if flags & F_MAIN else 0)
+
+
+def load_rules(path: str = RULES_PATH) -> RuleSet:
+    with open(path, encoding='utf-8') as f:
+        return RuleSet(json.load(f))
+
+
+RULES = load_rules()
+RAID_DATA: Dict[str, RaidInfo] = RULES.raids
@@ -0,0 +1,339 @@
+import asyncio
+import cProfile
+import multiprocessing
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+from config import (OPTIMIZER_WORKERS, OPTIMIZER_MAX_JOBS_PER_GUILD, OPTIMIZER_MAX_RUNNING_PER_GUILD,
+                    OPTIMIZER_JOB_TIMEOUT, PLANNER_TIME_LIMIT, JOB_TIMEOUT_MARGIN, PROGRESS_INTERVAL)
+from metrics import OPTIMIZER_NODES, OPTIMIZER_SECONDS, cache_hit, slow_profiles
+from feasibility import check_feasibility
+from models import GuildMember
+from optimizer import RaidOptimizer
+from planner import WeeklyPlan, WeeklyPlanner
+from result_cache import ResultCache
+from solver import BUDGET_EXHAUSTED, CANCELLED, INFEASIBLE, SOLVED
+
+
+@dataclass
+class OptimizeResult:
+    rounds: Optional[List]
+    status: str
+    nodes: int = 0
+    score: Optional[float] = None      # 최적화 모드 목적 함수 점수
+    gap: Optional[float] = None        # 상한 대비 부족 비율 (0이면 최적 보장)
+    elapsed: float = 0.0
+    profile: Optional[Dict] = None     # cProfile 통계 (profile=True로 제출했을 때만)
+    cached: bool = False               # 결과 캐시에서 꺼낸 결과
+    # INFEASIBLE일 때 가능성 검사가 찾은 이유와 가능한 최대 판수 (탐색까지 해서 실패한 경우는 비어 있음)
+    reasons: List[str] = field(default_factory=list)
+    max_rounds: Optional[int] = None
+
+
+@dataclass
+class JobProgress:
+    rounds_done: int                   # 규칙을 만족하게 채운 판 수
+    total_rounds: int
+    best_score: Optional[float]        # 최적화 단계의 지금까지 최고 점수 (탐색 단계면 None)
+    elapsed: float
+
+
+class _ProgressReporter:
+    """
+    워커 프로세스 쪽: 진행 상황을 Manager dict에 쓴다. 쓰기마다 프로세스 간 왕복이 있어서
+    점수 갱신은 min_interval마다 한 번만 쓰고, 판 수가 늘어난 경우(최대 판수만큼)는 바로 쓴다
+    """
+
+    def __init__(self, shared, min_interval: float):
+        self.shared = shared
+        self.min_interval = min_interval
+        self._rounds = 0
+        self._last_write = 0.0
+
+    def __call__(self, rounds_done: int, score: Optional[float]):
+        now = time.monotonic()
+        if rounds_done == self._rounds and now - self._last_write < self.min_interval:
+            return
+        self._rounds = rounds_done
+        self._last_write = now
+        self.shared.update(rounds=rounds_done, score=score)
+
+
+class GuildQueueFull(Exception):
+    """길드별 동시 매칭 작업 한도를 넘었을 때"""
+    pass
+
+
+def _run_job(cancel_event, members: List[GuildMember], raid_key: str, total_rounds: int,
+             anytime: bool, profile: bool = False, progress=None) -> OptimizeResult:
+    # 워커 프로세스에서 실행됨 (pickle 가능한 최상위 함수여야 함)
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+    start = time.monotonic()
+    on_progress = _ProgressReporter(progress, PROGRESS_INTERVAL / 2) if progress is not None else None
+    optimizer = RaidOptimizer(members, raid_key, total_rounds, should_stop=cancel_event.is_set,
+                              on_progress=on_progress)
+    rounds = optimizer.solve_best() if anytime else optimizer.solve()
+    elapsed = time.monotonic() - start
+
+    stats = None
+    if profiler:
+        profiler.disable()
+        profiler.create_stats()
+        stats = profiler.stats
+    score = optimizer.score.total if optimizer.score else None
+    return OptimizeResult(rounds, optimizer.status, optimizer.nodes_explored,
+                          score, optimizer.gap, elapsed, stats)
+
+
+def _run_plan(cancel_event, members: List[GuildMember], raid_rounds: Dict[str, int],
+              time_limit: float) -> WeeklyPlan:
+    return WeeklyPlanner(members, raid_rounds, time_limit, should_stop=cancel_event.is_set).plan()
+
+
+class _Job:
+    def __init__(self, guild_id: int, fn: Callable, args: tuple, owner: Optional[Hashable], loop):
+        self.guild_id = guild_id
+        self.cancel_event = None   # Manager Event. 만드는 데 프로세스 간 왕복이 있어 _execute가 스레드에서 채움
+        self.fn = fn               # 워커에서 fn(cancel_event, *args)로 실행
+        self.args = args
+        self.owner = owner         # cancel(job_key, owner)로 이 제출자의 작업만 취소할 때 비교
+        self.cancelled = False
+        self.future: asyncio.Future = loop.create_future()     # submit()이 기다리는 결과
+        self.started: asyncio.Future = loop.create_future()    # 워커에 배정되면 완료 (마감 시간은 이때부터)
+        self.running: Optional[asyncio.Future] = None          # 워커에서 실행 중인 작업 (대기 중이면 None)
+
+    def cancel(self):
+        self.cancelled = True
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        self.future.cancel()
+        self.started.cancel()
+
+
+class OptimizationService:
+    """
+    RaidOptimizer 작업을 프로세스 풀에서 돌려 이벤트 루프(하트비트, 다른 명령어)를 막지 않게 한다.
+    - job_key 단위로 작업을 추적: 같은 key로 다시 제출하면 이전 작업은 취소
+    - 길드별 대기+실행 작업 수 제한, 길드별 동시 실행(워커 점유) 수 제한
+    - 빈 워커는 길드를 돌아가며 배정해 큰 길드가 워커를 독차지하지 못하게 함
+    - 작업마다 마감 시간(timeout)을 두고, 넘으면 워커에 취소 신호를 보냄. 시간은 워커에 배정된 때부터 잰다
+    """
+
+    def __init__(self, max_workers: int = OPTIMIZER_WORKERS,
+                 max_jobs_per_guild: int = OPTIMIZER_MAX_JOBS_PER_GUILD,
+                 max_running_per_guild: int = OPTIMIZER_MAX_RUNNING_PER_GUILD,
+                 job_timeout: float = OPTIMIZER_JOB_TIMEOUT,
+                 result_cache: Optional[ResultCache] = None):
+        self.max_workers = max_workers
+        self.max_jobs_per_guild = max_jobs_per_guild
+        self.max_running_per_guild = max_running_per_guild
+        self.job_timeout = job_timeout
+        self.result_cache = result_cache
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._jobs: Dict[Hashable, _Job] = {}
+        # 길드별 대기열. 꺼낼 때 길드를 맨 뒤로 보내 라운드 로빈
+        self._waiting: "OrderedDict[int, Deque[_Job]]" = OrderedDict()
+        self._running: Counter = Counter()   # 길드별 실행 중인 작업 수
+
+    def _ensure_pool(self):
+        # 프로세스 생성은 무거우므로 첫 작업 때 만든다.
+        # fork하면 이벤트 루프, DB 스레드/연결, HTTP 소켓, 지표 서버 스레드까지 복제되므로 항상 spawn
+        if self._pool is None:
+            context = multiprocessing.get_context('spawn')
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            self._manager = context.Manager()
+
+    def guild_job_count(self, guild_id: int) -> int:
+        return sum(1 for job in self._jobs.values() if job.guild_id == guild_id)
+
+    async def submit(self, job_key: Hashable, guild_id: int, members: List[GuildMember],
+                     raid_key: str, total_rounds: int, anytime: bool = True,
+                     profile: bool = False,
+                     on_progress: Optional[Callable[[JobProgress], Awaitable[None]]] = None,
+                     owner: Optional[Hashable] = None) -> OptimizeResult:
+        """
+        on_progress를 주면 작업 중 진행 상황이 바뀔 때 PROGRESS_INTERVAL 이상 간격으로 호출.
+        owner: 제출한 쪽 (선택 창 등). cancel(job_key, owner)는 이 owner가 제출한 작업일 때만 취소
+        """
+        # 같은 요청자가 다시 제출하면 이전 작업은 취소
+        self.cancel(job_key)
+
+        # 개수만 세서 불가능한 요청은 워커에 보내지 않고 바로 이유와 함께 돌려줌 (수 ms)
+        report = check_feasibility(members, raid_key, total_rounds)
+        if not report.feasible:
+            return OptimizeResult(None, INFEASIBLE, reasons=report.reasons, max_rounds=report.max_rounds)
+
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = ResultCache.make_key(guild_id, raid_key, total_rounds, anytime, members)
+            cached = self.result_cache.get(cache_key)
+            cache_hit('result', cached is not None)
+            if cached is not None:
+                return replace(cached, cached=True)
+
+        start = time.monotonic()
+        progress, watcher = None, None
+        if on_progress is not None:
+            self._ensure_pool()
+            progress = await asyncio.to_thread(self._manager.dict)
+            watcher = asyncio.create_task(self._watch_progress(progress, total_rounds, on_progress, start))
+        try:
+            result = await self._execute(job_key, guild_id, _run_job,
+                                         (members, raid_key, total_rounds, anytime, profile, progress),
+                                         self.job_timeout, owner)
+        except asyncio.TimeoutError:
+            OPTIMIZER_SECONDS.labels(raid_key, BUDGET_EXHAUSTED).observe(time.monotonic() - start)
+            return OptimizeResult(None, BUDGET_EXHAUSTED)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+        OPTIMIZER_SECONDS.labels(raid_key, result.status if result else CANCELLED).observe(time.monotonic() - start)
+        if result is None:
+            return OptimizeResult(None, CANCELLED)
+
+        OPTIMIZER_NODES.labels(raid_key).observe(result.nodes)
+        if result.profile is not None:
+            slow_profiles.record(result.elapsed, f"{raid_key}_{total_rounds}판", result.profile)
+            result.profile = None
+        # 다시 돌려도 같은 결론인 결과만 캐시 (시간/노드 한도 초과는 제외)
+        if cache_key is not None and result.status in (SOLVED, INFEASIBLE):
+            self.result_cache.put(cache_key, result, (m.discord_id for m in members))
+        return result
+
+    async def _watch_progress(self, shared, total_rounds: int,
+                              on_progress: Callable[[JobProgress], Awaitable[None]], start: float):
+        """워커가 쓴 진행 상황을 주기적으로 읽어, 바뀌었을 때만 on_progress 호출 (submit이 끝나면 취소됨)"""
+        last = None
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            try:
+                # Manager 프로세스와의 왕복이 이벤트 루프를 막지 않도록 스레드에서 읽음
+                snapshot = await asyncio.to_thread(shared.copy)
+            except (OSError, EOFError):
+                return   # shutdown()으로 Manager가 내려감
+            state = (snapshot.get('rounds', 0), snapshot.get('score'))
+            if state == last:
+                continue
+            last = state
+            await on_progress(JobProgress(state[0], total_rounds, state[1], time.monotonic() - start))
+
+    async def submit_plan(self, job_key: Hashable, guild_id: int, members: List[GuildMember],
+                          raid_rounds: Dict[str, int],
+                          time_limit: float = PLANNER_TIME_LIMIT) -> Optional[WeeklyPlan]:
+        """주간 계획 작업. 취소되면 None, 마감 시간을 넘기면 asyncio.TimeoutError"""
+        self.cancel(job_key)
+        return await self._execute(job_key, guild_id, _run_plan, (members, raid_rounds, time_limit),
+                                   time_limit + JOB_TIMEOUT_MARGIN)
+
+    async def _execute(self, job_key: Hashable, guild_id: int, fn: Callable, args: tuple, timeout: float,
+                       owner: Optional[Hashable] = None):
+        """
+        작업을 길드 대기열에 넣고 결과를 기다린다. cancel()로 취소되면 None,
+        워커에 배정된 뒤 timeout을 넘기면 워커에 취소 신호를 보내고 asyncio.TimeoutError
+        """
+        if self.guild_job_count(guild_id) >= self.max_jobs_per_guild:
+            raise GuildQueueFull()
+
+        self._ensure_pool()
+        job = _Job(guild_id, fn, args, owner, asyncio.get_running_loop())
+        # 길드 한도와 cancel()에 바로 잡히도록 먼저 등록하고, 취소 신호용 Event는 스레드에서 만듦
+        self._jobs[job_key] = job
+
+        try:
+            job.cancel_event = await asyncio.to_thread(self._manager.Event)
+            if job.cancelled:
+                return None
+            self._waiting.setdefault(guild_id, deque()).append(job)
+            self._dispatch()
+            # 대기열에서 기다린 시간은 마감 시간에 넣지 않는다
+            await asyncio.shield(job.started)
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout=timeout)
+        except asyncio.TimeoutError:
+            job.cancel()
+            raise
+        except asyncio.CancelledError:
+            # cancel()로 취소된 경우. 호출한 코루틴 자체가 취소된 경우는 그대로 전파
+            if job.cancelled:
+                return None
+            job.cancel()
+            raise
+        finally:
+            if self._jobs.get(job_key) is job:
+                del self._jobs[job_key]
+            if job.running is None:
+                # 대기열에서 바로 빠진 경우 (취소/시간 초과)
+                self._discard_waiting(job)
+
+    def _dispatch(self):
+        """빈 워커에 대기 작업을 길드 라운드 로빈으로 배정"""
+        while sum(self._running.values()) < self.max_workers:
+            guild_id = next((g for g in self._waiting if self._running[g] < self.max_running_per_guild), None)
+            if guild_id is None:
+                return
+            queue = self._waiting.pop(guild_id)
+            job = queue.popleft()
+            if queue:
+                self._waiting[guild_id] = queue  # 다음 차례는 다른 길드부터
+            self._start(job)
+
+    def _start(self, job: _Job):
+        pool = self._pool
+        job.running = asyncio.get_running_loop().run_in_executor(pool, job.fn, job.cancel_event, *job.args)
+        job.started.set_result(None)
+        self._running[job.guild_id] += 1
+        job.running.add_done_callback(lambda f: self._finished(job, f, pool))
+
+    def _finished(self, job: _Job, running: asyncio.Future, pool: ProcessPoolExecutor):
+        if not job.future.done():
+            if running.cancelled():
+                job.future.cancel()
+            elif running.exception() is not None:
+                job.future.set_exception(running.exception())
+            else:
+                job.future.set_result(running.result())
+        elif not running.cancelled():
+            # 취소돼 아무도 기다리지 않는 작업의 예외 (shutdown 중 연결 끊김 등)는 여기서 버림
+            running.exception()
+
+        # shutdown() 이후 끝난 이전 풀의 작업은 집계하지 않음
+        if pool is not self._pool:
+            return
+        self._running[job.guild_id] -= 1
+        if not self._running[job.guild_id]:
+            del self._running[job.guild_id]
+        self._dispatch()
+
+    def _discard_waiting(self, job: _Job):
+        queue = self._waiting.get(job.guild_id)
+        if queue is not None and job in queue:
+            queue.remove(job)
+            if not queue:
+                del self._waiting[job.guild_id]
+
+    def cancel(self, job_key: Hashable, owner: Optional[Hashable] = None) -> bool:
+        """owner를 주면 그 owner가 제출한 작업일 때만 취소 (같은 key로 새로 제출된 작업은 그대로 둠)"""
+        job = self._jobs.get(job_key)
+        if job is None or (owner is not None and job.owner is not owner):
+            return False
+        del self._jobs[job_key]
+        job.cancel()
+        # 실행 중인 작업은 워커가 취소 신호를 보고 끝낼 때까지 워커 자리를 차지한다
+        self._discard_waiting(job)
+        return True
+
+    def shutdown(self):
+        for key in list(self._jobs):
+            self.cancel(key)
+        self._waiting.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
+            self._pool = None
+            self._manager = None
+        self._running.clear()
@@ -0,0 +1,466 @@
+"""
+디스코드/로아 API 없이 봇 핸들러(main.py 명령어, RoleSetupView 버튼, MemberSelectView 선택)를 그대로 실행하는 부하 시뮬레이션.
+    python simulate.py                                   # 가상 로스터 200명이 동시에 /등록 -> 역할 버튼 + /품앗이매칭
+    python simulate.py --users 400 --matches 300 --ramp 5
+    python simulate.py --payloads recorded.json          # 저장해 둔 형제 캐릭터 응답으로 재생
+    python simulate.py --save-payloads recorded.json     # 가상 응답을 파일로 저장 (같은 부하를 다시 재생할 때)
+    python simulate.py --api-rate 100 --json out.json    # 로아 API 분당 100회 제한 흉내, 결과 JSON 저장
+
+- 가짜 Interaction: response(defer/send_message/edit_message), followup.send, edit_original_response, channel.send만 흉내.
+  호출마다 --discord-latency 만큼 기다리고, 첫 응답이 3초를 넘으면 '응답 지연'으로 센다
+- 스텁 API 서버: /characters/{이름}/siblings/ 에 기록된 응답을 돌려줌 (LostArkAPI의 base_url을 이 서버로)
+- 핸들러별 처리 시간 p50/p99/최대와, 그 핸들러가 실행 중일 때의 이벤트 루프 지연 p50/p99/최대를 출력
+- 예외, 3초 넘은 첫 응답, 조합 없음 외의 ❌ 응답이 있으면 실패 (종료 코드 1)
+
+payloads 파일 형식: {"대표 캐릭터명": [get_siblings 응답 그대로], ...}
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import discord
+from aiohttp import web
+from discord import app_commands
+from discord.ui.select import selected_values
+
+import main
+from api import LostArkAPI
+from database import Database, CharacterStateWriter
+from result_cache import ResultCache
+from roster_gen import generate_roster
+from rules import RAID_DATA
+from service import OptimizationService
+from views import MemberSelectView, RoleButton, RoleSetupView
+
+# 디스코드가 상호작용에 첫 응답을 요구하는 시간 (초)
+INTERACTION_DEADLINE = 3.0
+LAG_INTERVAL = 0.01
+# 무작위로 고른 참여자/판수로는 조합이 없을 수 있음: 봇이 제대로 답한 것이므로 실패로 세지 않음
+INFEASIBLE_PREFIX = "❌ 조건에 맞는 조합을 찾을 수 없습니다."
+
+
+# ---------- 가짜 디스코드 ----------
+
+_ids = itertools.count(1)
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeChannel", content: Optional[str] = None, **kwargs):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.embeds = kwargs.get('embeds') or ([kwargs['embed']] if kwargs.get('embed') else [])
+        self.view: Optional[discord.ui.View] = kwargs.get('view')
+
+    async def edit(self, **kwargs):
+        await self.channel.roundtrip()
+        self.__dict__.update({k: v for k, v in kwargs.items() if k in ('content', 'view')})
+        return self
+
+
+class FakeChannel:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.messages: List[FakeMessage] = []
+
+    async def roundtrip(self):
+        await asyncio.sleep(self.latency)
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        await self.roundtrip()
+        message = FakeMessage(self, content, **kwargs)
+        self.messages.append(message)
+        return message
+
+
+class FakeResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+        self._done = False
+        self.acked_after: Optional[float] = None   # 첫 응답까지 걸린 시간
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        if self._done:
+            raise discord.InteractionResponded(self._interaction)
+        self._done = True
+        self.acked_after = time.perf_counter() - self._interaction.created_at
+        await self._interaction.channel.roundtrip()
+        message = FakeMessage(self._interaction.channel, content, **kwargs)
+        self._interaction.sent.append(message)
+        return message
+
+    async def defer(self, ephemeral: bool = False, thinking: bool = False):
+        await self._respond()
+
+    async def send_message(self, content: Optional[str] = None, **kwargs):
+        await self._respond(content, **kwargs)
+
+    async def edit_message(self, **kwargs):
+        await self._respond(**kwargs)
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        if not self._interaction.response.is_done():
+            raise RuntimeError("응답(defer) 전에 followup을 보냄")
+        message = await self._interaction.channel.send(content, **kwargs)
+        self._interaction.sent.append(message)
+        return message
+
+
+class FakeInteraction:
+    """핸들러가 쓰는 속성만 있는 discord.Interaction 대역"""
+
+    def __init__(self, client: discord.Client, guild_id: int, user_id: int, channel: FakeChannel,
+                 message: Optional[FakeMessage] = None):
+        self.client = client
+        self.guild_id = guild_id
+        self.user = FakeUser(user_id)
+        self.channel = channel
+        self.message = message
+        self.created_at = time.perf_counter()
+        self.sent: List[FakeMessage] = []
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def edit_original_response(self, **kwargs):
+        await self.channel.roundtrip()
+
+    def texts(self) -> List[str]:
+        return [m.content for m in self.sent if m.content]
+
+
+# ---------- 스텁 로아 API ----------
+
+def synthesize_payloads(n_users: int, seed: int) -> Dict[str, List[dict]]:
+    """가상 로스터를 get_siblings 응답 형식으로 (레벨은 API처럼 "1,712.50" 문자열)"""
+    payloads = {}
+    for member in generate_roster(n_users, seed=seed):
+        payloads[member.main_char_name] = [
+            {'ServerName': '루페온', 'CharacterName': c.name, 'CharacterLevel': 70,
+             'CharacterClassName': c.job, 'ItemAvgLevel': f"{c.item_level:,.2f}"}
+            for c in member.characters.values()
+        ]
+    return payloads
+
+
+class StubAPIServer:
+    """기록된 응답을 돌려주는 로컬 HTTP 서버. rate_per_minute를 주면 넘는 요청에 429 + Retry-After"""
+
+    def __init__(self, payloads: Dict[str, List[dict]], latency: float, rate_per_minute: Optional[int] = None):
+        # 형제 목록의 어느 캐릭터명으로 조회해도 같은 응답
+        self.by_name = {c['CharacterName']: data for data in payloads.values() for c in data}
+        self.latency = latency
+        self.rate_per_minute = rate_per_minute
+        self.requests = Counter()
+        self._window = (0.0, 0)
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def _siblings(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.latency)
+        if self.rate_per_minute:
+            start, count = self._window
+            now = time.time()
+            if now - start >= 60:
+                start, count = now, 0
+            if count >= self.rate_per_minute:
+                self.requests[429] += 1
+                return web.json_response(None, status=429, headers={'Retry-After': f"{start + 60 - now:.1f}"})
+            self._window = (start, count + 1)
+        data = self.by_name.get(request.match_info['name'])
+        self.requests[200 if data else 404] += 1
+        return web.json_response(data) if data else web.json_response(None, status=404)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/characters/{name}/siblings/', self._siblings)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '127.0.0.1', 0).start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+# ---------- 측정 ----------
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class HandlerStats:
+    """핸들러별 처리 시간/결과와, 핸들러가 실행 중일 때 잰 이벤트 루프 지연"""
+
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.lag: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Dict[str, Counter] = defaultdict(Counter)
+        self._active = Counter()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._watch_lag())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _watch_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            before = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            lag = max(0.0, loop.time() - before - LAG_INTERVAL)
+            self.lag['전체'].append(lag)
+            for name, n in self._active.items():
+                if n:
+                    self.lag[name].append(lag)
+
+    @contextmanager
+    def track(self, name: str):
+        self._active[name] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latency[name].append(time.perf_counter() - start)
+            self._active[name] -= 1
+
+    async def run(self, name: str, interaction: FakeInteraction, handler):
+        """
+        handler()를 실행하고 결과 분류: ok / rejected(⏳ 요청 제한) / infeasible(조합 없음) / budget(⏱️ 탐색 한도 초과)
+        / failed(그 밖의 ❌) / error(예외) / late(3초 넘은 첫 응답)
+        """
+        outcome = 'ok'
+        with self.track(name):
+            try:
+                await handler()
+            except Exception as e:
+                outcome = 'error'
+                self.outcomes[name][f"error:{type(e).__name__}"] += 1
+        texts = interaction.texts()
+        if outcome == 'ok':
+            if any(t.startswith("⏳") for t in texts):
+                outcome = 'rejected'
+            elif any(t.startswith("❌") and not t.startswith(INFEASIBLE_PREFIX) for t in texts):
+                outcome = 'failed'
+            elif any(t.startswith(INFEASIBLE_PREFIX) for t in texts):
+                outcome = 'infeasible'
+            elif any(t.startswith("⏱️") for t in texts):
+                outcome = 'budget'
+        self.outcomes[name][outcome] += 1
+        acked = interaction.response.acked_after
+        if acked is None or acked > INTERACTION_DEADLINE:
+            self.outcomes[name]['late'] += 1
+
+    def report(self) -> List[Dict]:
+        rows = []
+        for name in list(self.latency) + ['전체']:
+            lat = [s * 1000 for s in self.latency.get(name, [])]
+            lag = [s * 1000 for s in self.lag.get(name, [])]
+            rows.append({
+                'handler': name, 'count': len(lat), 'outcomes': dict(self.outcomes.get(name, {})),
+                'p50_ms': _percentile(lat, 0.5) if lat else None, 'p99_ms': _percentile(lat, 0.99) if lat else None,
+                'max_ms': max(lat) if lat else None,
+                'lag_p50_ms': _percentile(lag, 0.5) if lag else None, 'lag_p99_ms': _percentile(lag, 0.99) if lag else None,
+                'lag_max_ms': max(lag) if lag else None,
+            })
+        return rows
+
+
+# ---------- 시나리오 ----------
+
+class Scenario:
+    def __init__(self, args, payloads: Dict[str, List[dict]]):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.stats = HandlerStats()
+        self.channel = FakeChannel(args.discord_latency)
+        # 유저 i: 대표 캐릭터 = payloads의 i번째 키, 길드 = i % guilds + 1
+        self.users = [(100_000 + i, i % args.guilds + 1, name) for i, name in enumerate(payloads)]
+        self.registrations: Dict[int, FakeMessage] = {}
+
+    async def _at(self, delay: float, coro):
+        await asyncio.sleep(delay)
+        await coro
+
+    def _spread(self) -> float:
+        return self.rng.uniform(0, self.args.ramp)
+
+    async def register(self, user_id: int, guild_id: int, name: str):
+        interaction = FakeInteraction(main.bot, guild_id, user_id, self.channel)
+        await self.stats.run('등록', interaction, lambda: main.register.callback(interaction, name))
+        views = [m for m in interaction.sent if isinstance(m.view, RoleSetupView)]
+        if views:
+            self.registrations[user_id] = views[-1]
+
+    async def press_roles(self, user_id: int, guild_id: int):
+        """등록 메시지의 역할 버튼을 연타 (같은 버튼 여러 번 포함)"""
+        message = self.registrations.get(user_id)
+        if message is None:
+            return
+        buttons = [item for item in message.view.children if isinstance(item, RoleButton)]
+        for _ in range(self.args.presses):
+            button = self.rng.choice(buttons)
+            interaction = FakeInteraction(main.bot, guild_id, user_id, self.channel, message=message)
+
+            async def press():
+                if await button.interaction_check(interaction):
+                    await button.callback(interaction)
+
+            await self.stats.run('역할설정', interaction, press)
+            await asyncio.sleep(self.rng.expovariate(1 / self.args.press_gap))
+
+    async def match(self, user_id: int, guild_id: int):
+        raid_key = self.rng.choice(self.args.raid or list(RAID_DATA))
+        raid = RAID_DATA[raid_key]
+        rounds = self.rng.randint(1, 3)
+        interaction = FakeInteraction(main.bot, guild_id, user_id, self.channel)
+        choice = app_commands.Choice(name=raid.name, value=raid_key)
+        await self.stats.run('품앗이매칭', interaction, lambda: main.match.callback(interaction, choice, rounds))
+
+        prompts = [m for m in interaction.sent if isinstance(m.view, MemberSelectView)]
+        if not prompts:
+            return
+        message = prompts[-1]
+        view: MemberSelectView = message.view
+        # 사람이 고르는 시간 뒤에 참여자 선택
+        await asyncio.sleep(self.rng.uniform(0.1, 1.0))
+        options = [o.value for o in view.select.options]
+        picked = self.rng.sample(options, min(len(options), self.rng.randint(raid.max_players, raid.max_players * 2)))
+        selection = FakeInteraction(main.bot, guild_id, user_id, self.channel, message=message)
+
+        async def select():
+            # 선택 값은 discord.py가 상호작용마다 contextvar로 넘김 (이 태스크 안에서만 보임)
+            selected_values.set({view.select.custom_id: picked})
+            await view.select_callback(selection)
+
+        await self.stats.run('품앗이매칭:선택', selection, select)
+        view.stop()
+
+    async def run(self) -> float:
+        self.stats.start()
+        start = time.perf_counter()
+        try:
+            # 1단계: 전원 등록 (ramp초 동안 흩어서 도착)
+            await asyncio.gather(*(self._at(self._spread(), self.register(u, g, name)) for u, g, name in self.users))
+            # 2단계: 역할 버튼 연타와 매칭 요청이 섞여서
+            tasks = [self._at(self._spread(), self.press_roles(u, g))
+                     for u, g, _ in self.rng.sample(self.users, min(len(self.users), self.args.role_users))]
+            tasks += [self._at(self._spread(), self.match(u, g))
+                      for u, g, _ in (self.rng.choice(self.users) for _ in range(self.args.matches))]
+            await asyncio.gather(*tasks)
+        finally:
+            self.stats.stop()
+        return time.perf_counter() - start
+
+
+async def simulate(args, payloads: Dict[str, List[dict]]) -> Dict:
+    server = StubAPIServer(payloads, args.api_latency, args.api_rate)
+    await server.start()
+    bot = main.bot
+    with tempfile.TemporaryDirectory() as tmp:
+        # setup_hook의 서비스 구성과 같게 (로그인/명령어 동기화/지표 서버 제외)
+        bot.db = Database(os.path.join(tmp, 'simulate.db'))
+        await bot.db.open()
+        bot.role_writer = CharacterStateWriter(bot.db)
+        bot.result_cache = ResultCache(path=None)
+        bot.db.add_write_listener(bot.result_cache.invalidate_owners)
+        bot.optimizer_service = OptimizationService(result_cache=bot.result_cache)
+        bot.lostark_api = LostArkAPI(base_url=server.url, api_key='simulate')
+        if args.no_throttle:
+            bot.scheduler = None
+        try:
+            scenario = Scenario(args, payloads)
+            wall = await scenario.run()
+            await bot.role_writer.flush()
+        finally:
+            bot.optimizer_service.shutdown()
+            await bot.lostark_api.aclose()
+            await bot.db.close()
+            await server.stop()
+    return {'wall_seconds': wall, 'api_requests': dict(server.requests), 'handlers': scenario.stats.report()}
+
+
+def _fmt(value: Optional[float]) -> str:
+    return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def print_report(result: Dict) -> bool:
+    print(f"{'핸들러':<14} {'건수':>5} {'p50ms':>8} {'p99ms':>8} {'최대ms':>8} {'지연p50':>8} {'지연p99':>8} {'지연최대':>8}  결과")
+    totals: Counter = Counter()
+    for row in result['handlers']:
+        outcomes = row['outcomes']
+        totals.update({('error' if k.startswith('error') else k): v for k, v in outcomes.items()})
+        detail = ", ".join(f"{k} {v}" for k, v in sorted(outcomes.items()))
+        print(f"{row['handler']:<14} {row['count']:5d} {_fmt(row['p50_ms'])} {_fmt(row['p99_ms'])} {_fmt(row['max_ms'])} "
+              f"{_fmt(row['lag_p50_ms'])} {_fmt(row['lag_p99_ms'])} {_fmt(row['lag_max_ms'])}  {detail}")
+    api = ", ".join(f"{status} {n}건" for status, n in sorted(result['api_requests'].items()))
+    print(f"전체 {result['wall_seconds']:.1f}초, 스텁 API 요청: {api or '없음'}")
+    # 예외, 3초 넘은 응답, 조합 없음 외의 ❌ 응답이 하나라도 있으면 실패
+    ok = not (totals['error'] or totals['late'] or totals['failed'])
+    counts = ", ".join(f"{k} {totals[k]}" for k in ('error', 'late', 'failed', 'budget', 'rejected', 'infeasible'))
+    print(("✅ 예외/응답 지연/실패 응답 없음" if ok else "❌ 예외, 3초 넘은 응답 또는 실패 응답 있음") + f" ({counts})")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200, help="등록할 유저 수 (--payloads가 없을 때 가상 로스터 크기)")
+    parser.add_argument('--guilds', type=int, default=4, help="유저를 나눌 길드 수")
+    parser.add_argument('--matches', type=int, default=200, help="/품앗이매칭 요청 수")
+    parser.add_argument('--role-users', type=int, default=100, help="역할 버튼을 누르는 유저 수")
+    parser.add_argument('--presses', type=int, default=5, help="유저당 역할 버튼 클릭 수")
+    parser.add_argument('--press-gap', type=float, default=0.2, help="버튼 클릭 평균 간격 (초)")
+    parser.add_argument('--ramp', type=float, default=3.0, help="각 단계 요청이 도착하는 시간 폭 (초)")
+    parser.add_argument('--raid', action='append', choices=list(RAID_DATA), help="매칭할 레이드 (여러 번 지정 가능)")
+    parser.add_argument('--discord-latency', type=float, default=0.05, help="가짜 디스코드 API 왕복 시간 (초)")
+    parser.add_argument('--api-latency', type=float, default=0.1, help="스텁 로아 API 응답 시간 (초)")
+    parser.add_argument('--api-rate', type=int, help="스텁 로아 API 분당 요청 한도 (넘으면 429)")
+    parser.add_argument('--no-throttle', action='store_true', help="상호작용 빈도/중복 제한 끄기")
+    parser.add_argument('--payloads', help="기록된 get_siblings 응답 JSON")
+    parser.add_argument('--save-payloads', help="사용한 응답을 저장할 경로")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="결과를 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    if args.payloads:
+        with open(args.payloads, encoding='utf-8') as f:
+            payloads = json.load(f)
+    else:
+        payloads = synthesize_payloads(args.users, args.seed)
+    if args.save_payloads:
+        with open(args.save_payloads, 'w', encoding='utf-8') as f:
+            json.dump(payloads, f, ensure_ascii=False)
+
+    result = asyncio.run(simulate(args, payloads))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    sys.exit(0 if print_report(result) else 1)
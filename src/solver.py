@@ -0,0 +1,295 @@
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+from pool import CompiledPool, RosterSnapshot, F_SUPPORT, F_MAIN_DPS, F_MAIN_SUPP
+
+# 탐색 결과 상태
+SOLVED = "solved"
+INFEASIBLE = "infeasible"
+BUDGET_EXHAUSTED = "budget_exhausted"
+CANCELLED = "cancelled"
+
+
+@dataclass
+class SearchBudget:
+    max_nodes: int
+    time_limit: float  # 초 단위
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+class _RoundState:
+    """한 판을 구성하는 동안의 파티별 상태 (탐색 중 추가/제거로 되돌림)"""
+
+    def __init__(self, party_count: int):
+        self.owners = set()
+        self.members = [[] for _ in range(party_count)]
+        self.jr_mask = [0] * party_count      # 파티에 들어간 (직업, 역할) 비트
+        self.last = [-1] * party_count       # 앵커(서폿)를 제외한 마지막 선택 인덱스
+        self.last_stack = []
+        self.main_supps = [0] * party_count
+        self.main_dps = [0] * party_count
+
+    def needs_main_dps(self, p: int) -> bool:
+        return self.main_supps[p] > 0 and self.main_dps[p] == 0
+
+
+class ConstraintSolver:
+    """
+    판(라운드)마다 파티를 한 명씩 직접 쌓아가는 제약 탐색기.
+    - 한 판에 유저당 캐릭터 1개만 뽑도록 구성 단계에서 보장
+    - 파티마다 최소 서폿 1명: 각 파티의 첫 자리(앵커)를 파티 내 가장 앞 순번의 서폿으로 고정
+    - 직업/역할 중복, 본캐 서폿-딜러 짝궁 규칙을 넣는 순간마다 검사
+    - 전방 검사(forward checking)로 남은 자리를 채울 수 없는 가지는 바로 잘라냄
+    """
+
+    def __init__(self, pool: CompiledPool, max_players: int, total_rounds: int, budget: SearchBudget,
+                 should_stop: Optional[Callable[[], bool]] = None,
+                 on_round: Optional[Callable[[int], None]] = None):
+        self.pool = pool
+        self.party_count = max_players // 4
+        self.max_players = max_players
+        self.total_rounds = total_rounds
+        self.pair_main = pool.pair_main
+        self.budget = budget
+        # 외부 취소 신호 (프로세스 간 이벤트 등). 호출 비용이 클 수 있어 가끔만 확인한다
+        self.should_stop = should_stop
+        # 진행 상황 알림: 처음으로 r판까지 채웠을 때 on_round(r) (되돌아가도 줄어들지 않음)
+        self.on_round = on_round
+        self.rounds_reached = 0
+
+        self.owner = pool.owner
+        self.jr_bit = pool.jr_bit
+        self.is_supp = [bool(f & F_SUPPORT) for f in pool.flags]
+        self.is_main_supp = [bool(f & F_MAIN_SUPP) for f in pool.flags]
+        self.is_main_dps = [bool(f & F_MAIN_DPS) for f in pool.flags]
+        self.supp_idx = [i for i, s in enumerate(self.is_supp) if s]
+
+        # 판을 넘어가며 증감시키는 상태 (판마다 풀을 다시 만들지 않음)
+        self.used = [False] * len(pool)
+        self.used_mask = 0
+        self.owner_left = Counter(self.owner)                                  # 유저별 남은 캐릭 수
+        self.supp_left = Counter(self.owner[i] for i in self.supp_idx)         # 유저별 남은 서폿 수
+        self.live_owners = len(self.owner_left)                                # 남은 캐릭이 있는 유저 수
+        # 실패 기록: 사용한 캐릭터 마스크 -> 실패한 가장 작은 '이전 판 첫 앵커'
+        self._failed: Dict[int, int] = {}
+
+        self.nodes = 0
+        self.status = None
+        self._deadline = 0.0
+
+    @staticmethod
+    def order_pool(snapshot: RosterSnapshot, indices: Sequence[int]) -> List[int]:
+        """
+        값 순서: 여유가 많은 유저의 캐릭터를 먼저 써서 여유가 적은 유저를 아껴둔다.
+        서폿은 판마다 파티 수만큼 필요한 가장 빡빡한 자원이라 유저별 서폿 수를 먼저 본다.
+        snapshot의 indices 캐릭터를 이 순서로 정렬한 인덱스 목록을 반환
+        """
+        owner = snapshot.owner[indices].tolist()
+        supp = ((snapshot.flags[indices] & F_SUPPORT) != 0).tolist()
+        level = snapshot.level[indices].tolist()
+        owner_counts = Counter(owner)
+        supp_counts = Counter(o for o, s in zip(owner, supp) if s)
+
+        def key(k: int):
+            o = owner[k]
+            if supp[k]:
+                return (-supp_counts[o], -owner_counts[o], -level[k])
+            return (-owner_counts[o], -supp_counts[o], -level[k])
+        return [int(indices[k]) for k in sorted(range(len(owner)), key=key)]
+
+    def solve(self) -> Optional[List[List[List[int]]]]:
+        """판별 파티 구성을 CompiledPool 인덱스로 반환"""
+        self.nodes = 0
+        self._deadline = time.monotonic() + self.budget.time_limit
+        try:
+            schedule = self._search_round(0, -1, [])
+        except BudgetExhausted:
+            self.status = BUDGET_EXHAUSTED
+            return None
+        except SearchCancelled:
+            self.status = CANCELLED
+            return None
+
+        self.status = SOLVED if schedule is not None else INFEASIBLE
+        return schedule
+
+    def _tick(self):
+        self.nodes += 1
+        if self.nodes > self.budget.max_nodes:
+            raise BudgetExhausted()
+        if self.nodes & 255 == 0 and time.monotonic() > self._deadline:
+            raise BudgetExhausted()
+        if self.should_stop and self.nodes & 4095 == 0 and self.should_stop():
+            raise SearchCancelled()
+
+    # ---------- 판 단위 ----------
+
+    def _search_round(self, r: int, prev_first_anchor: int, schedule: List):
+        if r > self.rounds_reached:
+            self.rounds_reached = r
+            if self.on_round:
+                self.on_round(r)
+        if r == self.total_rounds:
+            return schedule
+
+        # 같은 캐릭터들을 이미 써버린 상태에서 (같거나 더 느슨한 조건으로) 실패한 적이 있으면 건너뜀
+        failed_at = self._failed.get(self.used_mask)
+        if failed_at is not None and prev_first_anchor >= failed_at:
+            return None
+
+        res = None
+        if self._rounds_feasible(self.total_rounds - r):
+            st = _RoundState(self.party_count)
+            # 판 순서 대칭 제거: 판의 첫 앵커 순번이 이전 판보다 커야 함
+            res = self._place_anchor(st, r, 0, prev_first_anchor, schedule)
+
+        if res is None:
+            self._failed[self.used_mask] = min(prev_first_anchor, failed_at if failed_at is not None else prev_first_anchor)
+        return res
+
+    def _rounds_feasible(self, rounds_left: int) -> bool:
+        """남은 판 수만큼 유저/서폿 공급이 가능한지 유지 중인 카운터로 검사"""
+        # 한 판에는 서로 다른 유저 max_players 명, 서폿 party_count 명이 필요
+        if self.live_owners < self.max_players:
+            return False
+        if sum(1 for v in self.supp_left.values() if v) < self.party_count:
+            return False
+
+        # 한 유저는 한 판에 1캐릭만 가능하므로 min(보유 수, 남은 판 수)만큼만 기여
+        if sum(min(v, rounds_left) for v in self.owner_left.values()) < self.max_players * rounds_left:
+            return False
+        if sum(min(v, rounds_left) for v in self.supp_left.values()) < self.party_count * rounds_left:
+            return False
+        return True
+
+    def _set_used(self, i: int, used: bool):
+        owner = self.owner[i]
+        delta = -1 if used else 1
+        self.used[i] = used
+        self.used_mask ^= 1 << i
+        self.owner_left[owner] += delta
+        if self.is_supp[i]:
+            self.supp_left[owner] += delta
+        # 남은 캐릭이 0 <-> 1 로 바뀌는 순간에만 유저 수가 변함
+        if self.owner_left[owner] == (0 if used else 1):
+            self.live_owners += delta
+
+    def _place_anchor(self, st: _RoundState, r: int, p: int, lo: int, schedule: List):
+        if p == self.party_count:
+            return self._fill(st, r, schedule)
+
+        for i in self.supp_idx:
+            if i <= lo or self.used[i] or self.owner[i] in st.owners:
+                continue
+            self._tick()
+            self._add(st, p, i, anchor=True)
+            if self._forward_check(st, p + 1, i):
+                res = self._place_anchor(st, r, p + 1, i, schedule)
+                if res is not None:
+                    return res
+            self._remove(st, p, i, anchor=True)
+        return None
+
+    def _fill(self, st: _RoundState, r: int, schedule: List):
+        # 남은 자리가 있는 파티마다 후보를 구해 채울 수 없으면 바로 실패, 있으면 MRV(후보가 가장 적은 파티)부터 채운다
+        best_p, best_domain = -1, None
+        for p in range(self.party_count):
+            need = 4 - len(st.members[p])
+            if need == 0:
+                continue
+            domain = self._domain(st, p)
+            if len({self.owner[i] for i in domain}) < need:
+                return None
+            if self.pair_main and st.needs_main_dps(p) and not any(self.is_main_dps[i] for i in domain):
+                return None
+            if best_domain is None or len(domain) < len(best_domain):
+                best_p, best_domain = p, domain
+
+        if best_domain is None:
+            return self._complete_round(st, r, schedule)
+
+        for i in best_domain:
+            self._tick()
+            self._add(st, best_p, i, anchor=False)
+            if self._forward_check(st, self.party_count, -1):
+                res = self._fill(st, r, schedule)
+                if res is not None:
+                    return res
+            self._remove(st, best_p, i, anchor=False)
+        return None
+
+    def _complete_round(self, st: _RoundState, r: int, schedule: List):
+        chosen = [i for party in st.members for i in party]
+        for i in chosen:
+            self._set_used(i, True)
+        res = self._search_round(r + 1, st.members[0][0],
+                                 schedule + [[list(party) for party in st.members]])
+        if res is None:
+            for i in chosen:
+                self._set_used(i, False)
+        return res
+
+    # ---------- 파티 상태 ----------
+
+    def _add(self, st: _RoundState, p: int, i: int, anchor: bool):
+        st.members[p].append(i)
+        st.owners.add(self.owner[i])
+        st.jr_mask[p] |= self.jr_bit[i]
+        if not anchor:
+            st.last_stack.append(st.last[p])
+            st.last[p] = i
+        st.main_supps[p] += self.is_main_supp[i]
+        st.main_dps[p] += self.is_main_dps[i]
+
+    def _remove(self, st: _RoundState, p: int, i: int, anchor: bool):
+        st.members[p].pop()
+        st.owners.discard(self.owner[i])
+        st.jr_mask[p] &= ~self.jr_bit[i]
+        if not anchor:
+            st.last[p] = st.last_stack.pop()
+        st.main_supps[p] -= self.is_main_supp[i]
+        st.main_dps[p] -= self.is_main_dps[i]
+
+    def _domain(self, st: _RoundState, p: int) -> List[int]:
+        """파티 p의 다음 자리에 들어갈 수 있는 후보 인덱스 (값 순서대로)"""
+        anchor = st.members[p][0]
+        slots_left = 4 - len(st.members[p])
+        must_main_dps = self.pair_main and slots_left == 1 and st.needs_main_dps(p)
+        jr_mask = st.jr_mask[p]
+        domain = []
+        for i in range(st.last[p] + 1, len(self.pool)):
+            if self.used[i] or self.owner[i] in st.owners or self.jr_bit[i] & jr_mask:
+                continue
+            # 앵커보다 앞 순번의 서폿은 앵커가 되었어야 하므로 제외 (파티 내 대칭 제거)
+            if self.is_supp[i] and i < anchor:
+                continue
+            if must_main_dps and not self.is_main_dps[i]:
+                continue
+            # 마지막 자리에 본캐 서폿이 오면 짝궁 본캐 딜러를 넣을 자리가 없음
+            if self.pair_main and slots_left == 1 and self.is_main_supp[i] and not st.main_dps[p]:
+                continue
+            domain.append(i)
+        return domain
+
+    def _forward_check(self, st: _RoundState, anchored: int, last_anchor: int) -> bool:
+        """남은 자리를 채울 수 있는지 미리 확인 (파티별 후보 검사는 _fill에서)"""
+        slots_left = self.max_players - sum(len(m) for m in st.members)
+        # 이번 판에 아직 안 들어간 유저 중 남은 캐릭이 있는 유저 수 (판에 들어간 유저는 모두 남은 캐릭이 있음)
+        if self.live_owners - len(st.owners) < slots_left:
+            return False
+
+        # 앵커를 아직 못 받은 파티 수만큼 서로 다른 유저의 서폿이 남아 있어야 함
+        if anchored < self.party_count:
+            supp_owners = {self.owner[i] for i in self.supp_idx
+                           if i > last_anchor and not self.used[i] and self.owner[i] not in st.owners}
+            return len(supp_owners) >= self.party_count - anchored
+        return True
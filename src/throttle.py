@@ -0,0 +1,232 @@
+"""
+상호작용(슬래시 명령어, 버튼) 처리 순서/빈도 조절.
+    - 유저별 토큰 버킷: 명령어마다 초당 보충 개수와 최대 연속 횟수 (버튼 연타, 명령어 반복 방지)
+    - 진행 중 중복 제거: 같은 유저의 같은 명령어가 아직 처리 중이면 새 요청은 바로 거절
+    - 공정 대기열: 동시에 처리하는 수를 제한하고, 자리가 나면 유저를 돌아가며 한 명씩 들여보낸다.
+      유저별/전체 대기 수와 대기 시간에 상한이 있어 몰릴 때 코루틴이 쌓이지 않고 바로 거절된다.
+      외부 API를 기다리는 명령어(/등록)는 자리를 따로 둔다
+"""
+import asyncio
+import functools
+import inspect
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Hashable, Optional, Set, Tuple
+
+import discord
+
+from config import (INTERACTION_RATE_LIMITS, INTERACTION_CONCURRENCY, INTERACTION_QUEUE_SIZE,
+                    INTERACTION_QUEUE_PER_USER, INTERACTION_QUEUE_TIMEOUT, INTERACTION_API_CONCURRENCY)
+from metrics import INTERACTION_REJECTED
+
+
+class Throttled(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class AlreadyRunning(Exception):
+    pass
+
+
+class SchedulerBusy(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, reserve: int = 0) -> float:
+        """
+        토큰 하나를 쓰고 0을 돌려줌. 없으면 다음 토큰까지 남은 시간 (초).
+        reserve: 우선순위가 낮은 요청은 토큰을 이만큼 남겨 둘 수 있을 때만 씀
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1 + reserve:
+            self.tokens -= 1
+            return 0.0
+        return (1 + reserve - self.tokens) / self.rate
+
+    def full(self) -> bool:
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class SlotPool:
+    """
+    동시 처리 자리와 공정 대기열. 자리가 없으면 유저별로 줄을 세우고, 자리가 나면 유저를 돌아가며 한 명씩 들여보낸다
+    """
+
+    def __init__(self, concurrency: int, queue_size: int, queue_per_user: int, queue_timeout: float):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_per_user = queue_per_user
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        # 유저 -> 대기 중인 Future. 앞에서 꺼내고, 남은 게 있으면 맨 뒤로 보내 돌아가며 들여보냄
+        self._waiting: "OrderedDict[int, Deque[asyncio.Future]]" = OrderedDict()
+        self.waiting = 0
+
+    async def acquire(self, user_id: int):
+        if self.active < self.concurrency and not self.waiting:
+            self.active += 1
+            return
+        queue = self._waiting.get(user_id)
+        if self.waiting >= self.queue_size or (queue is not None and len(queue) >= self.queue_per_user):
+            raise SchedulerBusy()
+
+        fut = asyncio.get_running_loop().create_future()
+        if queue is None:
+            queue = self._waiting[user_id] = deque()
+        queue.append(fut)
+        self.waiting += 1
+        try:
+            # 자리를 넘겨받으면 release에서 active를 그대로 물려받음
+            await asyncio.wait_for(fut, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(user_id, fut)
+            raise SchedulerBusy()
+        except asyncio.CancelledError:
+            self._abandon(user_id, fut)
+            raise
+
+    def _abandon(self, user_id: int, fut: asyncio.Future):
+        if fut.done() and not fut.cancelled():
+            # 포기하는 순간 자리를 넘겨받은 경우 다음 대기자에게 넘김
+            self.release()
+            return
+        queue = self._waiting.get(user_id)
+        if queue is not None and fut in queue:
+            queue.remove(fut)
+            self.waiting -= 1
+            if not queue:
+                del self._waiting[user_id]
+
+    def release(self):
+        while self._waiting:
+            user_id, queue = next(iter(self._waiting.items()))
+            fut = queue.popleft()
+            self.waiting -= 1
+            if queue:
+                self._waiting.move_to_end(user_id)
+            else:
+                del self._waiting[user_id]
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+
+class InteractionScheduler:
+    """
+    봇 하나에 하나. 이벤트 루프 안에서만 사용 (잠금 없음).
+    외부 API를 기다리는 명령어는 'api' 자리를 따로 써서, API 백오프가 길어져도 버튼/매칭 자리를 잡아두지 않는다
+    """
+
+    MAX_BUCKETS = 10_000   # 넘으면 가득 찬(오래 안 쓴) 버킷을 정리
+
+    def __init__(self, rate_limits: Dict[str, Tuple[float, int]] = INTERACTION_RATE_LIMITS,
+                 concurrency: int = INTERACTION_CONCURRENCY, queue_size: int = INTERACTION_QUEUE_SIZE,
+                 queue_per_user: int = INTERACTION_QUEUE_PER_USER, queue_timeout: float = INTERACTION_QUEUE_TIMEOUT,
+                 api_concurrency: int = INTERACTION_API_CONCURRENCY):
+        self.rate_limits = rate_limits
+        self._buckets: Dict[Tuple[str, int], TokenBucket] = {}
+        self._inflight: Set[Hashable] = set()
+        self.pools: Dict[str, SlotPool] = {
+            'default': SlotPool(concurrency, queue_size, queue_per_user, queue_timeout),
+            'api': SlotPool(api_concurrency, queue_size, queue_per_user, queue_timeout),
+        }
+
+    @property
+    def active(self) -> int:
+        return sum(pool.active for pool in self.pools.values())
+
+    @property
+    def waiting(self) -> int:
+        return sum(pool.waiting for pool in self.pools.values())
+
+    def check_rate(self, kind: str, user_id: int):
+        """kind에 제한이 없으면 통과. 토큰이 없으면 Throttled"""
+        limit = self.rate_limits.get(kind)
+        if limit is None:
+            return
+        bucket = self._buckets.get((kind, user_id))
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_BUCKETS:
+                self._buckets = {key: b for key, b in self._buckets.items() if not b.full()}
+            bucket = self._buckets[(kind, user_id)] = TokenBucket(*limit)
+        retry_after = bucket.take()
+        if retry_after:
+            raise Throttled(retry_after)
+
+    @asynccontextmanager
+    async def run(self, kind: str, user_id: int, key: Optional[Hashable] = None, pool: str = 'default'):
+        """
+        빈도 확인 -> (key가 있으면) 중복 확인 -> pool 대기열에서 자리 얻기 순서로 통과해야 본문을 실행.
+        거절되면 Throttled / AlreadyRunning / SchedulerBusy
+        """
+        self.check_rate(kind, user_id)
+        slots = self.pools[pool]
+        if key is not None:
+            if key in self._inflight:
+                raise AlreadyRunning()
+            self._inflight.add(key)
+        try:
+            await slots.acquire(user_id)
+            try:
+                yield
+            finally:
+                slots.release()
+        finally:
+            if key is not None:
+                self._inflight.discard(key)
+
+
+async def _reject(interaction: discord.Interaction, message: str):
+    if interaction.response.is_done():
+        await interaction.followup.send(message, ephemeral=True)
+    else:
+        await interaction.response.send_message(message, ephemeral=True)
+
+
+def throttled(kind: str, dedup: bool = False, pool: str = 'default'):
+    """
+    명령어/버튼 콜백을 interaction.client.scheduler로 감싼다.
+    dedup=True면 같은 길드에서 같은 유저의 이 명령어가 처리 중일 때 새 요청을 거절.
+    외부 API 응답을 기다리는 명령어는 pool='api'
+    """
+    def decorator(func):
+        # 명령어는 (interaction, ...), 버튼/선택 메뉴 콜백 메서드는 (self, interaction, ...): 위치로 찾음
+        index = 1 if next(iter(inspect.signature(func).parameters), None) == 'self' else 0
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            interaction = args[index]
+            scheduler: Optional[InteractionScheduler] = getattr(interaction.client, 'scheduler', None)
+            if scheduler is None:
+                return await func(*args, **kwargs)
+
+            user_id = interaction.user.id
+            key = (kind, interaction.guild_id, user_id) if dedup else None
+            try:
+                async with scheduler.run(kind, user_id, key, pool):
+                    return await func(*args, **kwargs)
+            except Throttled as e:
+                INTERACTION_REJECTED.labels(kind, 'rate').inc()
+                await _reject(interaction, f"⏳ 요청이 너무 잦습니다. {math.ceil(e.retry_after)}초 후 다시 시도해주세요.")
+            except AlreadyRunning:
+                INTERACTION_REJECTED.labels(kind, 'duplicate').inc()
+                await _reject(interaction, "⏳ 이전 요청을 처리하고 있습니다. 끝난 뒤 다시 시도해주세요.")
+            except SchedulerBusy:
+                INTERACTION_REJECTED.labels(kind, 'busy').inc()
+                await _reject(interaction, "⏳ 요청이 몰려 있습니다. 잠시 후 다시 시도해주세요.")
+        return wrapper
+    return decorator
@@ -1,21 +1,339 @@
+import re
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
 import discord
-from models import GuildMember
-from database import Database
-from config import MIN_ITEM_LEVEL, ENTROPY_CLASS, ROLE_EMOJIS, FLEXIBLE_ENTROPY_CLASS
+from models import Character, GuildMember
+from database import RosterChange, CHANGE_USER, CHANGE_REMOVE
+from config import ROLE_EMOJIS
+from rules import RAID_DATA, RULES
+from pool import is_entropy_candidate
+from solver import BUDGET_EXHAUSTED, CANCELLED
+from planner import WeeklyPlan
+from service import OptimizationService, GuildQueueFull, JobProgress
+from metrics import instrument_command, profiling_enabled, stage
+from throttle import throttled
+
+
+def _entropy_label(is_entropy: bool) -> str:
+    return f"└ {'사멸' if is_entropy else '비사멸'}"
+
+
+def _entropy_style(is_entropy: bool) -> discord.ButtonStyle:
+    return discord.ButtonStyle.primary if is_entropy else discord.ButtonStyle.gray
+
+
+def _role_emoji(char: Character) -> str:
+    # 이모지 판정 로직 (매칭과 같은 규칙 표 사용)
+    if char.user_set_role == RULES.default_support_role:
+        return ROLE_EMOJIS['SUPPORT']
+    if is_entropy_candidate(char):
+        # DB의 is_entropy가 True이거나, 고정 사멸 직업군인 경우
+        return ROLE_EMOJIS['DPS_ENTROPY']
+    return ROLE_EMOJIS['DPS_HITMASTER']
+
+
+def _party_line(char: Character) -> str:
+    return f"{_role_emoji(char)} **{char.name}** | {char.job} ({char.item_level:.1f})"
+
+
+# 디스코드 임베드 한도 (임베드 하나에 필드 25개, 필드 값 1024자, 메시지 하나의 임베드 전체 6000자/10개)
+_EMBED_MAX_FIELDS = 25
+_EMBED_MAX_CHARS = 6000
+_MESSAGE_MAX_EMBEDS = 10
+_PAGE_SUFFIX_RESERVE = 16   # 푸터에 붙는 " · 12/34쪽"
+
+
+def paginate_embed(title: str, groups: List[List[Tuple[str, str]]], footer: str = "",
+                   color: int = 0x2f3136) -> List[discord.Embed]:
+    """
+    (필드 이름, 값) 묶음들을 임베드 한도 안에 들어가도록 여러 쪽으로 나눈다. 보내기 전에 길이를 미리 계산하므로
+    매칭이 끝난 뒤 한도 초과로 전송이 실패하지 않는다. 묶음(한 판)은 가능하면 같은 쪽에 두고,
+    한 쪽에 다 안 들어가는 묶음만 필드 단위로 쪼갠다
+    """
+    budget = _EMBED_MAX_CHARS - len(title) - len(footer) - _PAGE_SUFFIX_RESERVE
+    pages: List[List[Tuple[str, str]]] = []
+    page: List[Tuple[str, str]] = []
+    size = 0
+
+    def fits(n_fields: int, n_chars: int) -> bool:
+        return len(page) + n_fields <= _EMBED_MAX_FIELDS and size + n_chars <= budget
+
+    for group in groups:
+        group_size = sum(len(name) + len(value) for name, value in group)
+        if page and not fits(len(group), group_size):
+            pages.append(page)
+            page, size = [], 0
+        for name, value in group:
+            if page and not fits(1, len(name) + len(value)):
+                pages.append(page)
+                page, size = [], 0
+            page.append((name, value))
+            size += len(name) + len(value)
+    if page or not pages:
+        pages.append(page)
+
+    embeds = []
+    for number, fields in enumerate(pages, 1):
+        embed = discord.Embed(title=title, color=color)
+        for name, value in fields:
+            embed.add_field(name=name, value=value, inline=False)
+        page_text = f"{number}/{len(pages)}쪽" if len(pages) > 1 else ""
+        text = " · ".join(t for t in (footer, page_text) if t)
+        if text:
+            embed.set_footer(text=text)
+        embeds.append(embed)
+    return embeds
+
+
+def batch_embeds(embeds: List[discord.Embed]) -> List[List[discord.Embed]]:
+    """여러 임베드를 메시지 한도(10개, 합계 6000자) 안에서 메시지 단위로 묶음"""
+    batches: List[List[discord.Embed]] = []
+    size = 0
+    for embed in embeds:
+        if not batches or len(batches[-1]) >= _MESSAGE_MAX_EMBEDS or size + len(embed) > _EMBED_MAX_CHARS:
+            batches.append([])
+            size = 0
+        batches[-1].append(embed)
+        size += len(embed)
+    return batches
+
+
+def build_result_pages(raid_name: str, rounds: int, result) -> List[discord.Embed]:
+    """품앗이매칭 결과 (OptimizeResult)를 쪽 단위 임베드로. 판마다 파티별 필드"""
+    groups = [
+        [(f"Round {r_idx} - {p_idx}번 파티", "".join(_party_line(char) + "\n" for char in party))
+         for p_idx, party in enumerate(round_parties, 1)]
+        for r_idx, round_parties in enumerate(result.rounds, 1)
+    ]
+    footer = ""
+    if result.score is not None:
+        quality = "최적" if result.gap == 0 else (f"상한 대비 {result.gap:.0%} 낮음" if result.gap is not None else "")
+        cached = " · 이전 결과 재사용" if result.cached else ""
+        footer = f"점수 {result.score:.1f} · {quality} · {result.elapsed:.1f}초{cached}"
+    return paginate_embed(f"🗡️ {raid_name} ({rounds}판) 매칭 완료", groups, footer)
+
+
+def build_plan_embeds(plan: WeeklyPlan) -> List[discord.Embed]:
+    """주간 계획 결과: 요약 임베드 + 레이드별 임베드 (판마다 필드 1개, 파티는 줄바꿈으로 구분)"""
+    summary = []
+    embeds = []
+    for raid_key, rounds in plan.raids.items():
+        raid = RAID_DATA[raid_key]
+        if not rounds:
+            reason = "시간 초과" if plan.status[raid_key] in (BUDGET_EXHAUSTED, CANCELLED) else "캐릭터 부족 또는 레벨 미달"
+            summary.append(f"❌ {raid.name}: 파티를 짜지 못했습니다. ({reason})")
+            continue
+        summary.append(f"✅ {raid.name}: {len(rounds)}판")
+        groups = [[(
+            f"Round {r_idx}",
+            "\n".join(
+                f"**{p_idx}파티** " + ", ".join(f"{_role_emoji(c)}{c.name}" for c in party)
+                for p_idx, party in enumerate(round_parties, 1)
+            ),
+        )] for r_idx, round_parties in enumerate(rounds, 1)]
+        embeds.extend(paginate_embed(f"🗓️ {raid.name} ({len(rounds)}판)", groups))
+
+    used = sum(1 for raids in plan.bookings.values() if raids)
+    head = discord.Embed(title="🗓️ 주간 계획", description="\n".join(summary), color=0x2f3136)
+    head.set_footer(text=f"배정된 캐릭터 {used}개 · {plan.elapsed:.1f}초")
+    return [head] + embeds
+
+
+def _infeasible_text(result) -> str:
+    if not result.reasons:
+        return "❌ 조건에 맞는 조합을 찾을 수 없습니다. (캐릭터 부족 또는 레벨 미달)"
+    lines = ["❌ 조건에 맞는 조합을 찾을 수 없습니다."] + [f"- {reason}" for reason in result.reasons]
+    if result.max_rounds:
+        lines.append(f"이 참여자로는 최대 {result.max_rounds}판까지 시도할 수 있습니다.")
+    return "\n".join(lines)
+
+
+_SOURCE_LABELS = {'register': "등록", 'button': "버튼", 'refresh': "자동 갱신"}
+
+
+def format_change(change: RosterChange) -> str:
+    """변경 기록 한 줄: 시각, 유저, 캐릭터, 바뀐 값, 경로"""
+    when = f"<t:{int(change.created_at)}:R>"
+    source = _SOURCE_LABELS.get(change.source, change.source)
+    if change.kind == CHANGE_USER:
+        return f"{when} <@{change.owner_id}> 대표 캐릭터 **{change.data['main_char']}** ({source})"
+    if change.kind == CHANGE_REMOVE:
+        return f"{when} <@{change.owner_id}> **{change.name}** 삭제 ({source})"
+
+    data = change.data
+    parts = []
+    if 'job' in data:
+        parts.append(data['job'])
+    if 'level' in data:
+        parts.append(f"{data['level']:.2f}")
+    if 'role' in data:
+        parts.append(f"역할 {data['role']}")
+    if 'is_main' in data:
+        parts.append("본캐" if data['is_main'] else "본캐 해제")
+    if 'is_entropy' in data:
+        parts.append("사멸" if data['is_entropy'] else "비사멸")
+    return f"{when} <@{change.owner_id}> **{change.name}** {' · '.join(parts)} ({source})"
+
+
+def _progress_text(progress: JobProgress) -> str:
+    if progress.best_score is None:
+        text = f"🔎 파티 구성 중... {progress.rounds_done}/{progress.total_rounds}판"
+    else:
+        text = f"✨ 조합 개선 중... 최고 점수 {progress.best_score:.1f}"
+    return f"{text} ({progress.elapsed:.0f}초)"
+
+
+class EmbedPaginator(discord.ui.View):
+    """여러 쪽으로 나뉜 결과 임베드를 ◀ ▶ 버튼으로 넘겨 보는 View"""
+
+    def __init__(self, pages: List[discord.Embed], timeout: float = 600):
+        super().__init__(timeout=timeout)
+        self.pages = pages
+        self.index = 0
+        self.message: Optional[discord.Message] = None
+        self._sync_buttons()
+
+    def _sync_buttons(self):
+        self.prev_page.disabled = self.index == 0
+        self.next_page.disabled = self.index == len(self.pages) - 1
+        self.page_label.label = f"{self.index + 1}/{len(self.pages)}"
+
+    async def _show(self, interaction: discord.Interaction, index: int):
+        self.index = index
+        self._sync_buttons()
+        await interaction.response.edit_message(embed=self.pages[index], view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.gray)
+    async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.index - 1)
+
+    @discord.ui.button(label="1/1", style=discord.ButtonStyle.gray, disabled=True)
+    async def page_label(self, interaction: discord.Interaction, button: discord.ui.Button):
+        pass
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.gray)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.index + 1)
+
+    async def send(self, channel: discord.abc.Messageable) -> discord.Message:
+        """한 쪽이면 버튼 없이 보냄"""
+        if len(self.pages) == 1:
+            self.stop()
+            return await channel.send(embed=self.pages[0])
+        self.message = await channel.send(embed=self.pages[0], view=self)
+        return self.message
+
+    async def on_timeout(self):
+        # 만료된 버튼은 눌러도 응답이 없으므로 비활성화해 둠
+        if self.message is None:
+            return
+        for item in self.children:
+            item.disabled = True
+        try:
+            await self.message.edit(view=self)
+        except discord.HTTPException:
+            pass
+
+
+class _CharacterButton(ABC):
+    """
+    RoleButton/EntropyButton 공통 부분.
+    custom_id에 (소유자 ID, 캐릭터명)을 담아 두는 버튼. 봇이 재시작돼도 setup_hook에서 등록한 클래스로 다시 만들어진다.
+    클릭 시 상태는 DB 캐시에서 읽고, 저장은 CharacterStateWriter가 모아서 한 번에 한다.
+    """
+    prefix = ''
+
+    def __init__(self, owner_id: int, char_name: str, row: Optional[int] = None):
+        super().__init__(
+            discord.ui.Button(custom_id=f"{self.prefix}:{owner_id}:{char_name}", row=row),
+        )
+        self.owner_id = owner_id
+        self.char_name = char_name
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match[str], /):
+        return cls(int(match['owner_id']), match['name'])
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message("본인 캐릭터만 변경할 수 있습니다.", ephemeral=True)
+            return False
+        return True
+
+    @instrument_command("역할설정")
+    @throttled("역할설정")
+    async def callback(self, interaction: discord.Interaction):
+        client = interaction.client
+        member = await client.db.get_member(interaction.guild_id, self.owner_id)
+        char = member.characters.get(self.char_name) if member else None
+        if char is None:
+            await interaction.response.send_message("❌ 캐릭터 정보를 찾을 수 없습니다. /등록을 다시 해주세요.", ephemeral=True)
+            return
+
+        char = self.toggle(member, char)
+        client.role_writer.submit(interaction.guild_id, self.owner_id, char)
+
+        # UI 버튼 라벨 업데이트 후 메세지 수정
+        view = RoleSetupView.for_message(interaction.message.id, member)
+        view.refresh(char)
+        await interaction.response.edit_message(view=view)
+
+    @abstractmethod
+    def toggle(self, member: GuildMember, char: Character) -> Character:
+        """바뀐 캐릭터 기록을 member에 넣고 돌려줌"""
+
+
+class RoleButton(_CharacterButton, discord.ui.DynamicItem[discord.ui.Button], template=r'role:(?P<owner_id>[0-9]+):(?P<name>.+)'):
+    prefix = 'role'
+
+    def toggle(self, member: GuildMember, char: Character) -> Character:
+        # DPS -> Support -> Hybrid -> DPS 순환 (규칙 파일의 roles.next). 홀리나이트 딜러/딜폿은 자동 사멸
+        next_role, is_entropy = RULES.next_role(char.job, char.user_set_role)
+        if is_entropy is not None:
+            return member.update_character(char.name, user_set_role=next_role, is_entropy=is_entropy)
+        return member.update_character(char.name, user_set_role=next_role)
+
+
+class EntropyButton(_CharacterButton, discord.ui.DynamicItem[discord.ui.Button], template=r'entropy:(?P<owner_id>[0-9]+):(?P<name>.+)'):
+    prefix = 'entropy'
+
+    def toggle(self, member: GuildMember, char: Character) -> Character:
+        return member.update_character(char.name, is_entropy=not char.is_entropy)
 
 
 class RoleSetupView(discord.ui.View):
-    def __init__(self, member: GuildMember, db: Database):
+    """
+    캐릭터별 역할/사멸 버튼 메세지. 버튼 자체는 봇 재시작 후에도 동작하는 영구 버튼(RoleButton, EntropyButton)이다.
+    메세지별로 만든 view를 보관해 두고, 클릭 시 해당 캐릭터 버튼만 (종류, 캐릭터명) 인덱스로 찾아 고친다.
+    """
+    MAX_CACHED_VIEWS = 256
+    _by_message: "OrderedDict[int, RoleSetupView]" = OrderedDict()
+
+    def __init__(self, member: GuildMember):
         super().__init__(timeout=None)
-        self.db = db
         self.member = member
+        self.buttons: Dict[Tuple[str, str], discord.ui.Button] = {}
         self.create_buttons()
 
+    @classmethod
+    def for_message(cls, message_id: int, member: GuildMember) -> "RoleSetupView":
+        # 재시작 직후 등 보관된 view가 없으면 DB 캐시의 상태로 새로 만든다
+        view = cls._by_message.get(message_id)
+        if view is None:
+            view = cls._by_message[message_id] = cls(member)
+            if len(cls._by_message) > cls.MAX_CACHED_VIEWS:
+                cls._by_message.popitem(last=False)
+        else:
+            cls._by_message.move_to_end(message_id)
+        return view
+
     def create_buttons(self):
         # 유효한 캐릭터만 먼저 추출
         valid_chars = [
             (name, info) for name, info in self.member.characters.items() 
-            if info.item_level >= MIN_ITEM_LEVEL
+            if info.item_level >= RULES.min_item_level
         ]
 
         # 캐릭터당 버튼이 1개일 수도 있고(타 직업), 2개일 수도 있음(브레이커 등)
@@ -25,7 +343,7 @@ class RoleSetupView(discord.ui.View):
 
         for char_name, char_info in valid_chars:
             # 이 캐릭터가 차지할 너비 계산 (역할 버튼 1 + 사멸 버튼이 필요한 경우 1)
-            needed_width = 2 if char_info.job in FLEXIBLE_ENTROPY_CLASS else 1
+            needed_width = 2 if RULES.has_entropy_choice(char_info.job) else 1
             
             # 현재 줄에 자리가 없으면 다음 줄로 넘김
             if current_width + needed_width > 5:
@@ -35,98 +353,43 @@ class RoleSetupView(discord.ui.View):
             if current_row > 4: break # 최대 5줄 제한 도달 시 중단
 
             # 1. 역할 변경 버튼
-            btn_role = discord.ui.Button(
-                label=f"{char_name}({char_info.user_set_role})",
-                custom_id=f"role_{char_name}",
-                style=discord.ButtonStyle.secondary,
-                row=current_row
-            )
-            btn_role.callback = self.make_callback(char_name)
+            btn_role = RoleButton(self.member.discord_id, char_name, row=current_row)
+            self.buttons[('role', char_name)] = btn_role.item
             self.add_item(btn_role)
             current_width += 1
 
             # 2. 사멸 선택 버튼 (FLEXIBLE 직업군만)
-            if char_info.job in FLEXIBLE_ENTROPY_CLASS:
-                is_ent = getattr(char_info, 'is_entropy', False)
-                btn_entropy = discord.ui.Button(
-                    label=f"└ {'사멸' if is_ent else '비사멸'}",
-                    custom_id=f"entropy_{char_name}",
-                    style=discord.ButtonStyle.primary if is_ent else discord.ButtonStyle.gray,
-                    row=current_row
-                )
-                btn_entropy.callback = self.make_entropy_callback(char_name)
+            if RULES.has_entropy_choice(char_info.job):
+                btn_entropy = EntropyButton(self.member.discord_id, char_name, row=current_row)
+                self.buttons[('entropy', char_name)] = btn_entropy.item
                 self.add_item(btn_entropy)
                 current_width += 1
 
-    def make_callback(self, char_name):
-        async def callback(interaction: discord.Interaction):
-            # DPS -> Support -> Hybrid -> DPS 순환 구조
-            char = self.member.characters[char_name]
-            current = char.user_set_role
+            self.refresh(char_info)
 
-            role_map = {"딜러": "서폿", "서폿": "딜폿", "딜폿": "딜러"}
-            # 현재 값이 map에 없으면 기본값 '딜러'로 시작
-            next_role = role_map.get(current, "딜러")
+    def refresh(self, char: Character):
+        """캐릭터의 현재 역할/사멸 상태를 버튼 라벨에 반영"""
+        btn_role = self.buttons.get(('role', char.name))
+        if btn_role is not None:
+            btn_role.label = f"{char.name}({char.user_set_role})"
+            btn_role.style = discord.ButtonStyle.secondary
 
-            # 자동 사멸 판정 로직 (홀리나이트)
-            # 딜러 혹은 딜폿을 선택했는데, 해당 직업이 딜러 일 때 사멸인 직업인 경우
-            auto_entropy_classes = ['홀리나이트']
-            is_entropy = getattr(char, 'is_entropy', False)
-
-            if char.job in auto_entropy_classes:
-                is_entropy = True if next_role in ["딜러", "딜폿"] else False # 홀나 딜러/ 딜폿은 무조건 사멸
-
-            # 데이터 모델 업데이트
-            self.member.update_role(char_name, next_role)
-            char.is_entropy = is_entropy 
-            
-            # DB파일 업데이트
-            self.db.update_character_role(interaction.user.id, char_name, next_role)
-
-            # 사멸 여부도 함께 업데이트
-            self.db.update_character_entropy(interaction.user.id, char_name, is_entropy)
-
-            # UI 버튼 라벨 업데이트 후 메세지 수정
-            for item in self.children:
-                if isinstance(item, discord.ui.Button):
-                    if item.custom_id == f"role_{char_name}":
-                        item.label = f"{char_name}({next_role})"
-
-                    # 만약 브레이커/가나처럼 수동 사멸 선택 버튼이 따로 있다면 상태 업데이트
-                    if item.custom_id == f"entropy_{char_name}":
-                        # 홀리나이트 같은 경우 사멸 버튼의 가동성을 위해 자동 업데이트
-                        entropy_label = "사멸" if is_entropy else "비사멸"
-                        item.label = f"└ {entropy_label}"
-                        item.style = discord.ButtonStyle.primary if is_entropy else discord.ButtonStyle.gray
-
-
-            await interaction.response.edit_message(view=self)
-
-        return callback
-    
-    def make_entropy_callback(self, char_name):
-        async def callback(interaction: discord.Interaction):
-            char = self.member.characters[char_name]
-            new_status = not getattr(char, 'is_entropy', False)
-
-            char.is_entropy = new_status
-            self.db.update_character_entropy(interaction.user.id, char_name, new_status)
-
-            for item in self.children:
-                if isinstance(item, discord.ui.Button) and item.custom_id == f"entropy_{char_name}":
-                    item.label = f"└ {'사멸' if new_status else '비사멸'}"
-                    item.style = discord.ButtonStyle.primary if new_status else discord.ButtonStyle.gray
-
-            await interaction.response.edit_message(view=self)
-        return callback
+        # 만약 브레이커/가나처럼 수동 사멸 선택 버튼이 따로 있다면 상태 업데이트
+        btn_entropy = self.buttons.get(('entropy', char.name))
+        if btn_entropy is not None:
+            btn_entropy.label = _entropy_label(char.is_entropy)
+            btn_entropy.style = _entropy_style(char.is_entropy)
 
 class MemberSelectView(discord.ui.View):
-    def __init__(self, all_members, raid, rounds, db):
+    def __init__(self, all_members, raid, rounds, db, service: OptimizationService):
         super().__init__(timeout=300)
         self.all_members = all_members
         self.raid = raid
         self.rounds = rounds
         self.db = db
+        self.service = service
+        self.job_key = None
+        self.prompt = f"✅ **{raid.name} ({rounds}판)** 매칭 참여자를 선택해주세요."
         
         # 유저 선택 드롭다운 (ID와 본캐명을 매칭)
         options = [
@@ -146,6 +409,9 @@ class MemberSelectView(discord.ui.View):
         self.select.callback = self.select_callback
         self.add_item(self.select)
         
+    @instrument_command("품앗이매칭:선택")
+    # 중복 거절은 하지 않음: 다시 고르면 service.submit이 이전 작업을 취소하고 새로 돌림 (빈도만 제한)
+    @throttled("품앗이매칭:선택")
     async def select_callback(self, interaction: discord.Interaction):
         # 메세지를 보낸 사람만 조작 가능하게 하거나, 모두에게 공개된 채널에 결과 전송
         await interaction.response.defer()
@@ -153,40 +419,60 @@ class MemberSelectView(discord.ui.View):
         selected_ids = [int(v) for v in self.select.values]
         participating_members = [m for m in self.all_members if m.discord_id in selected_ids]
         
-        # 3. 드디어 여기서 RaidOptimizer 호출
-        from optimizer import RaidOptimizer
-        optimizer = RaidOptimizer(participating_members, self.raid.value, total_rounds = self.rounds)
-        result_rounds = optimizer.solve()
+        # 3. 드디어 여기서 RaidOptimizer 호출 (프로세스 풀에서 실행, 같은 유저가 다시 제출하면 이전 작업 취소)
+        self.job_key = (interaction.guild_id, interaction.user.id)
+        shown_progress = False
+
+        async def show_progress(progress: JobProgress):
+            # 선택 창 메시지 내용을 진행 상황으로 바꿈 (서비스가 PROGRESS_INTERVAL 간격으로만 호출)
+            nonlocal shown_progress
+            shown_progress = True
+            try:
+                await interaction.edit_original_response(content=_progress_text(progress))
+            except discord.HTTPException:
+                pass
+
+        try:
+            with stage("품앗이매칭", "optimize"):
+                result = await self.service.submit(self.job_key, interaction.guild_id, participating_members,
+                                                   self.raid.value, self.rounds,
+                                                   profile=profiling_enabled("품앗이매칭"),
+                                                   on_progress=show_progress, owner=self)
+        except GuildQueueFull:
+            await interaction.followup.send("⏳ 이 서버에서 진행 중인 매칭이 너무 많습니다. 잠시 후 다시 시도해주세요.")
+            return
+        finally:
+            if shown_progress:
+                try:
+                    await interaction.edit_original_response(content=self.prompt)
+                except discord.HTTPException:
+                    pass
+
+        if result.status == CANCELLED:
+            # 다시 고르거나 선택 창이 만료돼 취소됨 (창이 만료됐으면 토큰도 만료됐을 수 있음)
+            try:
+                await interaction.followup.send("⏹️ 매칭 작업이 취소되었습니다.", ephemeral=True)
+            except discord.HTTPException:
+                pass
+            return
+        result_rounds = result.rounds
         
         if not result_rounds:
-            await interaction.followup.send("❌ 조건에 맞는 조합을 찾을 수 없습니다. (캐릭터 부족 또는 레벨 미달)")
+            if result.status == BUDGET_EXHAUSTED:
+                await interaction.followup.send("⏱️ 탐색 한도를 초과했습니다. 판수를 줄이거나 참여 인원을 조정해 다시 시도해주세요.")
+                return
+            await interaction.followup.send(_infeasible_text(result))
             return
 
-        # 4. 결과 Embed 생성 
-        embed = discord.Embed(
-            title = f"🗡️ {self.raid.name} ({self.rounds}판) 매칭 완료",
-            color = 0x2f3136
-        )
-        
-        for r_idx, round_parties in enumerate(result_rounds, 1):
-            for p_idx, party in enumerate(round_parties, 1):
-                party_text = ""
-                for char in party:
-                    # 이모지 판정 로직 (config 활용)
-                    if char.user_set_role == '서폿':
-                        emoji = ROLE_EMOJIS['SUPPORT']
-                    elif getattr(char, 'is_entropy', False) or any(e == char.job for e in ENTROPY_CLASS):
-                        # DB의 is_entropy가 True이거나, 고정 사멸 직업군인 경우
-                        emoji = ROLE_EMOJIS['DPS_ENTROPY']
-                    else:
-                        emoji = ROLE_EMOJIS['DPS_HITMASTER']
-                        
-                    party_text += f"{emoji} **{char.name}** | {char.job} ({char.item_level:.1f})\n"
-                
-                embed.add_field(
-                    name = f"Round {r_idx} - {p_idx}번 파티",
-                    value = party_text,
-                    inline = False
-                )
+        # 4. 결과 Embed 생성 (임베드 한도를 넘으면 쪽으로 나눔)
+        with stage("품앗이매칭", "embed"):
+            paginator = EmbedPaginator(build_result_pages(self.raid.name, self.rounds, result))
+
         # 결과는 ephermeral = False로 보내서 모두가 볼 수 있게 함
-        await interaction.channel.send(embed = embed)
\ No newline at end of file
+        with stage("품앗이매칭", "send"):
+            await paginator.send(interaction.channel)
+
+    async def on_timeout(self):
+        # 선택 창이 만료되면 이 창이 제출한 매칭 작업만 정리 (같은 유저가 새 창에서 다시 제출한 작업은 그대로)
+        if self.job_key is not None:
+            self.service.cancel(self.job_key, owner=self)
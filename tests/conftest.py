@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 봇 모듈은 src/ 안에서 서로 bare import 하므로 src를 경로에 넣는다
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
@@ -0,0 +1,206 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from aiohttp import web
+
+import api as api_module
+import throttle as throttle_module
+from api import LostArkAPI
+from throttle import TokenBucket
+
+SIBLINGS = [
+    {'ServerName': '루페온', 'CharacterName': '본캐', 'CharacterLevel': 70,
+     'CharacterClassName': '바드', 'ItemAvgLevel': "1,712.50"},
+    {'ServerName': '루페온', 'CharacterName': '부캐', 'CharacterLevel': 70,
+     'CharacterClassName': '워로드', 'ItemAvgLevel': "1,680.00"},
+]
+
+
+def siblings_of(name: str):
+    """SIBLINGS와 같은 계정 구성. 다른 이름으로 조회하면 그 이름의 계정으로 돌려줌"""
+    if name in ('본캐', '부캐'):
+        return SIBLINGS
+    return [dict(SIBLINGS[0], CharacterName=name)]
+
+
+class ScriptedServer:
+    """
+    요청마다 script에서 하나씩 꺼내 응답: (상태 코드, 헤더), 'hang'(응답 안 함) 또는 'html'(200 + 점검 페이지).
+    다 쓰면 200 + 요청한 캐릭터명이 들어간 SIBLINGS
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = 0
+        self.release = asyncio.Event()
+        self._runner = None
+        self.url = ""
+
+    async def _siblings(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        step = self.script.pop(0) if self.script else (200, {})
+        if step == 'html':
+            return web.Response(text="<html>점검 중</html>", content_type='text/html')
+        if step == 'hang':
+            await self.release.wait()
+            step = (200, {})
+        status, headers = step
+        return web.json_response(siblings_of(request.match_info['name']) if status == 200 else None,
+                                 status=status, headers=headers)
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get('/characters/{name}/siblings/', self._siblings)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '127.0.0.1', 0).start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release.set()
+        await self._runner.cleanup()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """
+    api 모듈의 대기를 기록만 하고 바로 진행. 기다린 만큼 api 모듈이 보는 시계를 앞으로 돌려
+    백오프/Retry-After 계산은 실제와 같게
+    """
+    recorded = []
+    offset = 0.0
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        nonlocal offset
+        # asyncio.sleep을 통째로 바꾸므로 라이브러리의 sleep(0) 양보는 빼고 기록
+        if delay > 0:
+            recorded.append(delay)
+            offset += delay
+        await real_sleep(0)
+
+    clock = SimpleNamespace(time=lambda: time.time() + offset, monotonic=lambda: time.monotonic() + offset,
+                            perf_counter=time.perf_counter)
+    monkeypatch.setattr(api_module.asyncio, 'sleep', fake_sleep)
+    monkeypatch.setattr(api_module, 'time', clock)
+    monkeypatch.setattr(throttle_module, 'time', clock)   # 요청 예산 토큰 버킷도 같은 시계로
+    return recorded
+
+
+def run_against(script, calls, timeout: float = 5.0, **kwargs):
+    """스텁 서버를 띄우고 calls(api)를 실행해 (결과, 서버 요청 수)"""
+    async def main():
+        async with ScriptedServer(script) as server:
+            api = LostArkAPI(base_url=server.url, api_key='test', **kwargs)
+            api._client.timeout = httpx.Timeout(timeout)
+            try:
+                return await calls(api), server.requests
+            finally:
+                await api.aclose()
+    return asyncio.run(main())
+
+
+def test_success_is_cached_for_every_sibling(sleeps):
+    async def calls(api):
+        first = await api.get_siblings('본캐')
+        return first, await api.get_siblings('본캐'), await api.get_siblings('부캐')
+
+    (first, again, sibling), requests = run_against([], calls)
+    assert first == again == sibling == SIBLINGS
+    assert requests == 1
+
+
+def test_concurrent_requests_are_coalesced(sleeps):
+    async def calls(api):
+        return await asyncio.gather(*(api.get_siblings('본캐') for _ in range(5)))
+
+    results, requests = run_against([], calls)
+    assert all(r == SIBLINGS for r in results)
+    assert requests == 1
+
+
+def test_429_waits_for_retry_after(sleeps):
+    results, requests = run_against([(429, {'Retry-After': '3'})], lambda api: api.get_siblings('본캐'))
+    assert results == SIBLINGS
+    assert requests == 2
+    # 헤더의 대기 시간만큼 (지수 백오프가 아니라) 기다린 뒤 재시도
+    assert len(sleeps) == 1 and 2.5 < sleeps[0] <= 3.0
+
+
+def test_429_without_header_backs_off_exponentially(sleeps):
+    results, requests = run_against([(429, {}), (429, {})], lambda api: api.get_siblings('본캐'))
+    assert results == SIBLINGS
+    assert requests == 3
+    assert [round(s) for s in sleeps] == [1, 2]
+
+
+def test_429_gives_up_after_max_retries(sleeps):
+    script = [(429, {})] * (LostArkAPI.MAX_RETRIES + 1)
+    results, requests = run_against(script, lambda api: api.get_siblings('본캐'))
+    assert results is None
+    assert requests == LostArkAPI.MAX_RETRIES + 1
+
+
+@pytest.mark.parametrize("status", [404, 500, 503])
+def test_error_status_returns_none_without_retry(sleeps, status):
+    results, requests = run_against([(status, {})], lambda api: api.get_siblings('본캐'))
+    assert results is None
+    assert requests == 1
+    assert sleeps == []
+
+
+def test_timeout_retries_then_returns_none(sleeps):
+    script = ['hang'] * (LostArkAPI.MAX_RETRIES + 1)
+    results, requests = run_against(script, lambda api: api.get_siblings('본캐'), timeout=0.1)
+    assert results is None
+    assert requests == LostArkAPI.MAX_RETRIES + 1
+    assert sleeps == [2 ** attempt for attempt in range(LostArkAPI.MAX_RETRIES)]
+
+
+def test_timeout_then_success(sleeps):
+    results, requests = run_against(['hang'], lambda api: api.get_siblings('본캐'), timeout=0.1)
+    assert results == SIBLINGS
+    assert requests == 2
+
+
+def test_non_json_body_returns_none(sleeps):
+    results, requests = run_against(['html'], lambda api: api.get_siblings('본캐'))
+    assert results is None
+    assert requests == 1
+
+
+def test_cache_is_bounded_and_drops_expired(sleeps):
+    async def calls(api):
+        for k in range(5):
+            await api.get_siblings(f"캐릭{k}")
+        bounded = list(api._cache)
+        await api.get_siblings('캐릭3')       # 캐시에서 (최근으로)
+        await asyncio.sleep(api.cache_ttl + 1)
+        await api.get_siblings('본캐')        # 새로 넣을 때 만료된 항목은 치움
+        return bounded, list(api._cache)
+
+    (bounded, after), requests = run_against([], calls, cache_size=3)
+    assert bounded == ['캐릭2', '캐릭3', '캐릭4']
+    assert after == ['본캐', '부캐']
+    assert requests == 6
+
+
+def test_background_requests_leave_budget_for_interactive(sleeps):
+    async def calls(api):
+        await api.get_siblings('캐릭0', background=True)   # 토큰 3 -> 2
+        await api.get_siblings('캐릭1', background=True)   # 2개를 남겨야 하므로 1초 기다려 3 -> 2
+        waited = list(sleeps)
+        # 남겨 둔 토큰으로 대화형 요청은 바로 나감
+        await api.get_siblings('캐릭2')
+        await api.get_siblings('캐릭3')
+        return waited, list(sleeps)
+
+    (waited, after), requests = run_against([], calls, budget=TokenBucket(rate=1.0, burst=3), background_reserve=2)
+    assert requests == 4
+    assert len(waited) == 1 and 0.9 < waited[0] <= 1.0
+    assert after == waited
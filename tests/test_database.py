@@ -0,0 +1,154 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from config import LEGACY_GUILD_ID
+from database import Database, SCHEMA_VERSION, SOURCE_BUTTON
+from models import Character, GuildMember
+
+
+def create_v0(path):
+    """마이그레이션 도입 전 스키마 (user_version 0, 캐릭터명이 전역 PK)"""
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("CREATE TABLE users (discord_id INTEGER PRIMARY KEY, main_char TEXT)")
+        conn.execute('''CREATE TABLE characters
+                        (name TEXT PRIMARY KEY, owner_id INTEGER, job TEXT,
+                        level REAL, role TEXT, is_main INTEGER, is_entropy INTEGER)''')
+        conn.executemany("INSERT INTO users VALUES (?, ?)", [(1, '본캐A'), (2, '본캐B')])
+        conn.executemany("INSERT INTO characters VALUES (?, ?, ?, ?, ?, ?, ?)", [
+            ('본캐A', 1, '바드', 1712.5, '서폿', 1, 0),
+            ('부캐A', 1, '워로드', 1690.0, '딜러', 0, 1),
+            ('본캐B', 2, '리퍼', 1700.0, '딜러', 1, 1),
+            # 유저 행이 없는 캐릭터: 외래 키를 만족하지 못해 버려짐
+            ('주인없음', 3, '바드', 1680.0, '서폿', 1, 0),
+        ])
+    conn.close()
+
+
+def user_version(path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def with_db(path, body, **kwargs):
+    async def main():
+        db = Database(str(path), **kwargs)
+        try:
+            await db.open()
+            return await body(db)
+        finally:
+            await db.close()
+    return asyncio.run(main())
+
+
+def test_migrates_v0_roster_into_legacy_guild(tmp_path):
+    path = tmp_path / 'legacy.db'
+    create_v0(path)
+
+    async def body(db):
+        return await db.load_all_members(LEGACY_GUILD_ID), await db.roster_at(LEGACY_GUILD_ID, 0)
+
+    members, snapshot = with_db(path, body)
+    assert user_version(path) == SCHEMA_VERSION
+    by_id = {m.discord_id: m for m in members}
+    assert set(by_id) == {1, 2}
+    assert set(by_id[1].characters) == {'본캐A', '부캐A'}
+    warlord = by_id[1].characters['부캐A']
+    assert (warlord.job, warlord.item_level, warlord.user_set_role, warlord.is_main, warlord.is_entropy) == \
+        ('워로드', 1690.0, '딜러', False, True)
+    assert by_id[2].main_char_name == '본캐B'
+    # v2: 기존 로스터가 version 0 스냅숏으로 남음
+    assert {m.discord_id: set(m.characters) for m in snapshot.values()} == \
+        {m.discord_id: set(m.characters) for m in members}
+
+
+def test_migrated_db_accepts_writes_and_logs_them(tmp_path):
+    path = tmp_path / 'legacy.db'
+    create_v0(path)
+
+    async def body(db):
+        await db.update_character_states(LEGACY_GUILD_ID, [(1, '본캐A', '딜폿', False)])
+        return await db.history(LEGACY_GUILD_ID)
+
+    changes = with_db(path, body)
+    assert [(c.owner_id, c.name, c.data, c.source) for c in changes] == [(1, '본캐A', {'role': '딜폿'}, SOURCE_BUTTON)]
+
+
+def test_fresh_db_and_reopen(tmp_path):
+    path = tmp_path / 'new.db'
+    assert with_db(path, lambda db: db.guild_ids()) == []
+    assert user_version(path) == SCHEMA_VERSION
+    # 다시 열어도 마이그레이션을 또 하지 않음
+    assert with_db(path, lambda db: db.guild_ids()) == []
+    assert user_version(path) == SCHEMA_VERSION
+
+
+def test_newer_schema_is_refused(tmp_path):
+    path = tmp_path / 'future.db'
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+    conn.close()
+    with pytest.raises(RuntimeError):
+        with_db(path, lambda db: db.guild_ids())
+
+
+def test_write_during_cold_load_is_not_lost(tmp_path):
+    path = tmp_path / 'race.db'
+
+    async def body(db):
+        member = GuildMember(discord_id=1, main_char_name='본캐')
+        member.characters['본캐'] = Character(owner_id=1, name='본캐', job='바드', item_level=1700.0,
+                                             user_set_role='서폿', is_main=True)
+        await db.save_member(7, member)
+        db.invalidate_cache()
+
+        # 캐시가 빈 상태의 조회 쿼리가 끝난 직후, 그 결과를 캐시에 넣기 전에 쓰기 하나가 끝까지 진행되게 함
+        run = db._run
+        interleaved = False
+
+        async def racing_run(op, fn, *args):
+            nonlocal interleaved
+            result = await run(op, fn, *args)
+            if op == 'load_roster' and not interleaved:
+                interleaved = True
+                await db.update_character_states(7, [(1, '본캐', '딜폿', False)])
+            return result
+
+        db._run = racing_run
+        cached = await db.get_member(7, 1)
+        db._run = run
+        db.invalidate_cache()
+        return interleaved, cached.characters['본캐'].user_set_role, (await db.get_member(7, 1)).characters['본캐'].user_set_role
+
+    interleaved, cached_role, stored_role = with_db(path, body)
+    assert interleaved
+    assert stored_role == '딜폿'
+    assert cached_role == stored_role
+
+
+def test_roster_cache_evicts_least_recently_used_guild(tmp_path):
+    path = tmp_path / 'lru.db'
+
+    async def body(db):
+        for guild_id in (1, 2, 3):
+            await db.save_member(guild_id, GuildMember(discord_id=guild_id, main_char_name=f"본캐{guild_id}"))
+        db.invalidate_cache()
+
+        await db.load_all_members(1)
+        await db.load_all_members(2)
+        await db.load_all_members(1)   # 1을 최근으로
+        await db.load_all_members(3)   # 한도 2: 가장 오래 안 쓴 2가 빠짐
+        cached = list(db._rosters)
+        # 빠진 길드도 다음 조회 때 DB에서 그대로 읽힘
+        members = await db.load_all_members(2)
+        return cached, [m.discord_id for m in members], list(db._rosters)
+
+    cached, members, after = with_db(path, body, cache_guilds=2)
+    assert cached == [1, 3]
+    assert members == [2]
+    assert after == [3, 2]
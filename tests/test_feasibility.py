@@ -0,0 +1,96 @@
+import pytest
+
+from config import MAX_ROUNDS
+from feasibility import check_feasibility
+from models import Character, GuildMember
+from planner import parse_raid_rounds
+
+DPS_JOBS = ['디스트로이어', '슬레이어', '스트라이커', '배틀마스터', '인파이터', '창술사', '데빌헌터', '리퍼']
+
+
+def make_members(specs, level: float = 1720.0):
+    """specs: 유저별 [(직업, 역할), ...]"""
+    members = []
+    for u, chars in enumerate(specs):
+        member = GuildMember(discord_id=u, main_char_name=f"유저{u}캐릭0")
+        for k, (job, role) in enumerate(chars):
+            name = f"유저{u}캐릭{k}"
+            member.characters[name] = Character(owner_id=u, name=name, job=job, item_level=level,
+                                                user_set_role=role, is_main=k == 0)
+        members.append(member)
+    return members
+
+
+def balanced_roster(n_users: int, chars_per_user: int):
+    """유저마다 서폿 1캐릭 + 서로 다른 딜러 직업"""
+    return make_members([[('바드' if k == 0 else DPS_JOBS[(u + k) % len(DPS_JOBS)], '서폿' if k == 0 else '딜러')
+                          for k in range(chars_per_user)] for u in range(n_users)])
+
+
+@pytest.mark.parametrize("total_rounds", [0, -1, -5])
+def test_non_positive_rounds_rejected(total_rounds):
+    report = check_feasibility(balanced_roster(8, 3), "4막 노말", total_rounds)
+    assert not report.feasible
+    assert report.max_rounds == 0
+    assert len(report.reasons) == 1 and "1 이상" in report.reasons[0]
+
+
+def test_empty_roster():
+    report = check_feasibility([], "세르카 노말", 1)
+    assert not report.feasible
+    assert report.max_rounds == 0
+    assert report.reasons
+
+
+def test_too_few_users():
+    report = check_feasibility(balanced_roster(3, 4), "세르카 노말", 1)
+    assert not report.feasible
+    assert any("유저가 3명" in reason for reason in report.reasons)
+
+
+def test_level_filter_applies():
+    report = check_feasibility(make_members([[('바드', '서폿'), ('리퍼', '딜러')]] * 4, level=1700.0), "세르카 나메", 1)
+    assert not report.feasible
+    assert any("유저가 0명" in reason for reason in report.reasons)
+
+
+def test_missing_supports():
+    members = make_members([[(DPS_JOBS[u], '딜러')] for u in range(4)])
+    report = check_feasibility(members, "세르카 노말", 1)
+    assert not report.feasible
+    assert any("서폿" in reason for reason in report.reasons)
+
+
+def test_crowded_job_role():
+    # 8인 1판: 서폿 2명 + 딜러 6명이 모두 같은 직업이면 파티당 1명 규칙에 걸림
+    specs = [[('바드', '서폿')], [('도화가', '서폿')]] + [[('리퍼', '딜러')] for _ in range(6)]
+    report = check_feasibility(make_members(specs), "4막 노말", 1)
+    assert not report.feasible
+    assert any("리퍼/딜러" in reason for reason in report.reasons)
+
+
+def test_max_rounds_is_the_boundary():
+    members = balanced_roster(8, 3)
+    report = check_feasibility(members, "세르카 노말", 1)
+    assert report.feasible
+    assert check_feasibility(members, "세르카 노말", report.max_rounds).feasible
+    over = check_feasibility(members, "세르카 노말", report.max_rounds + 1)
+    assert not over.feasible
+    assert over.max_rounds == report.max_rounds
+
+
+
+@pytest.mark.parametrize("total_rounds", [10 ** 6, 10 ** 12])
+def test_huge_round_count_is_cheap(total_rounds):
+    # 검사 배열은 로스터 크기로만 정해져야 함 (판수만큼 만들면 메모리/시간이 폭증)
+    members = balanced_roster(8, 3)
+    report = check_feasibility(members, "세르카 노말", total_rounds)
+    assert not report.feasible
+    assert report.max_rounds == check_feasibility(members, "세르카 노말", 1).max_rounds
+    assert report.reasons
+
+
+@pytest.mark.parametrize("text", ["종막 하드=0", "종막 하드=-1", f"종막 하드={MAX_ROUNDS + 1}"])
+def test_parse_raid_rounds_bounds(text):
+    with pytest.raises(ValueError):
+        parse_raid_rounds(text)
@@ -0,0 +1,65 @@
+import random
+from itertools import combinations
+
+import pytest
+
+from models import Character
+from partition import best_partition
+from pool import CompiledPool
+from rules import RULES
+
+DPS_JOBS = sorted(set(RULES.entropy_jobs + RULES.synergy_jobs + RULES.flexible_entropy_jobs))
+
+
+def random_raid(seed: int, n_supps: int):
+    """서로 다른 유저 16명의 베히모스 공격대 (직업/역할/본캐 여부는 seed로 무작위)"""
+    rng = random.Random(seed)
+    chars = []
+    for i in range(16):
+        if i < n_supps:
+            job, role = rng.choice(RULES.support_jobs), rng.choice(['서폿', '딜폿'])
+        else:
+            job, role = rng.choice(DPS_JOBS), '딜러'
+        chars.append(Character(owner_id=i, name=f"char{i}", job=job, item_level=1700.0,
+                               user_set_role=role, is_main=rng.random() < 0.5))
+    return chars
+
+
+def brute_force_best(pool: CompiledPool, idxs):
+    """유효한 4인 파티로만 이루어진 모든 분할을 나열해 시너지 합 최댓값을 구함 (없으면 -1). 가지치기 없이 남은 인원별 메모만"""
+    memo = {}
+
+    def rest(remaining):
+        if not remaining:
+            return 0
+        if remaining in memo:
+            return memo[remaining]
+        first, others = remaining[0], remaining[1:]
+        best = -1
+        for trio in combinations(others, 3):
+            key = (first,) + trio
+            if not pool.party_valid(key):
+                continue
+            sub = rest(tuple(i for i in others if i not in trio))
+            if sub >= 0:
+                best = max(best, pool.party_score(key) + sub)
+        memo[remaining] = best
+        return best
+    return rest(tuple(idxs))
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("n_supps", [4, 6])
+def test_best_partition_matches_brute_force(seed, n_supps):
+    pool = CompiledPool(random_raid(seed, n_supps), pair_main=True)
+    idxs = range(16)
+    expected = brute_force_best(pool, idxs)
+    parties = best_partition(pool, idxs)
+
+    if expected < 0:
+        assert parties is None
+        return
+    assert sorted(i for party in parties for i in party) == list(idxs)
+    keys = [tuple(sorted(party)) for party in parties]
+    assert all(len(key) == 4 and pool.party_valid(key) for key in keys)
+    assert sum(pool.party_score(key) for key in keys) == expected
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from service import OptimizationService
+
+
+def run_jobs(service: OptimizationService, plan, release_order):
+    """
+    plan: [(길드, 작업 이름)] 순서대로 제출. 작업은 풀려날 때까지 워커를 잡고 있고,
+    release_order 순서대로 하나씩 풀어 주며 워커에서 시작된 순서를 돌려준다.
+    프로세스 대신 스레드 풀과 threading.Event로 돌려 배정 순서만 본다
+    """
+    started = []
+    gates = {name: threading.Event() for _, name in plan}
+
+    def work(cancel_event, name):
+        started.append(name)
+        gates[name].wait(5)
+        return name
+
+    async def main():
+        service._pool = ThreadPoolExecutor(max_workers=service.max_workers)
+        service._manager = SimpleNamespace(Event=threading.Event)
+        tasks = {}
+        try:
+            for guild_id, name in plan:
+                tasks[name] = asyncio.create_task(service._execute(name, guild_id, work, (name,), 5.0))
+                await asyncio.sleep(0.01)   # 제출 순서대로 대기열에 들어가게
+            await asyncio.sleep(0.05)
+            running = list(started)
+            for name in release_order:
+                gates[name].set()
+                await tasks[name]
+                await asyncio.sleep(0.05)   # 빈 워커에 다음 작업이 배정되어 시작될 때까지
+            return running, [await tasks[name] for _, name in plan]
+        finally:
+            for gate in gates.values():
+                gate.set()
+            service._pool.shutdown(wait=True)
+
+    running, results = asyncio.run(main())
+    assert results == [name for _, name in plan]
+    return running, started
+
+
+def test_free_worker_goes_to_next_guild_in_turn():
+    # 워커 1개: a1이 도는 동안 a2, a3, b1, c1이 대기. a2가 나간 뒤 길드 A는 맨 뒤로 가서 a3는 b1, c1 다음
+    service = OptimizationService(max_workers=1, max_jobs_per_guild=5, max_running_per_guild=5)
+    plan = [(1, 'a1'), (1, 'a2'), (1, 'a3'), (2, 'b1'), (3, 'c1')]
+    _, started = run_jobs(service, plan, ['a1', 'a2', 'b1', 'c1', 'a3'])
+    assert started == ['a1', 'a2', 'b1', 'c1', 'a3']
+
+
+def test_guild_cannot_take_more_than_its_running_limit():
+    # 워커 3개, 길드당 동시 실행 1개: 워커가 남아도 길드 A의 두 번째 작업은 기다리고 B는 바로 시작
+    service = OptimizationService(max_workers=3, max_jobs_per_guild=5, max_running_per_guild=1)
+    plan = [(1, 'a1'), (1, 'a2'), (1, 'a3'), (2, 'b1')]
+    running, started = run_jobs(service, plan, ['a1', 'a2', 'b1', 'a3'])
+    assert sorted(running) == ['a1', 'b1']
+    assert started == ['a1', 'b1', 'a2', 'a3']
@@ -0,0 +1,62 @@
+import pytest
+
+from optimizer import RaidOptimizer, upper_bound_gap
+from roster_gen import generate_roster
+from rules import RAID_DATA, RULES, PARTY_SIZE
+from solver import SearchBudget, SOLVED, BUDGET_EXHAUSTED
+
+
+def assert_valid_schedule(rounds, raid_key, total_rounds):
+    """매칭 결과가 규칙을 지키는지 결과 캐릭터만 보고 다시 검사"""
+    raid = RAID_DATA[raid_key]
+    assert len(rounds) == total_rounds
+    used = set()
+    for parties in rounds:
+        assert len(parties) == raid.max_players // PARTY_SIZE
+        owners = [c.owner_id for party in parties for c in party]
+        # 한 판에 유저당 캐릭터 1개
+        assert len(owners) == len(set(owners))
+        for party in parties:
+            assert len(party) == PARTY_SIZE
+            assert any(RULES.is_support_role(c.user_set_role) for c in party)
+            if RULES.unique_job_role:
+                job_roles = [(c.job, c.user_set_role) for c in party]
+                assert len(job_roles) == len(set(job_roles))
+            for c in party:
+                assert c.item_level >= raid.required_level
+                # 같은 캐릭터는 주간 한 번만
+                assert (c.owner_id, c.name) not in used
+                used.add((c.owner_id, c.name))
+
+
+@pytest.mark.parametrize("raid_key,total_rounds", [("세르카 노말", 3), ("4막 노말", 2), ("베히모스", 1)])
+def test_solve_returns_valid_schedule(raid_key, total_rounds):
+    optimizer = RaidOptimizer(generate_roster(24, seed=1), raid_key, total_rounds)
+    rounds = optimizer.solve()
+    assert optimizer.status == SOLVED
+    assert_valid_schedule(rounds, raid_key, total_rounds)
+
+
+def test_solve_best_keeps_schedule_valid():
+    optimizer = RaidOptimizer(generate_roster(24, seed=1), "4막 노말", 2)
+    rounds = optimizer.solve_best(time_limit=0.2)
+    assert optimizer.status == SOLVED
+    assert_valid_schedule(rounds, "4막 노말", 2)
+    assert optimizer.score.total <= optimizer.upper_bound
+    assert optimizer.gap is not None and 0.0 <= optimizer.gap <= 1.0
+
+
+def test_upper_bound_gap_is_clamped():
+    # 감점 때문에 점수가 음수면 (상한 - 점수) / 상한 이 1을 넘는다
+    assert upper_bound_gap(100.0, -50.0) == 1.0
+    assert upper_bound_gap(100.0, 100.0) == 0.0
+    assert upper_bound_gap(100.0, 75.0) == 0.25
+    assert upper_bound_gap(0.0, 0.0) == 0.0
+    assert upper_bound_gap(0.0, -1.0) is None
+
+
+def test_node_budget_exhausted():
+    optimizer = RaidOptimizer(generate_roster(24, seed=1), "4막 노말", 2, budget=SearchBudget(1, 10.0))
+    assert optimizer.solve() is None
+    assert optimizer.status == BUDGET_EXHAUSTED
+